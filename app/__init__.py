@@ -15,4 +15,7 @@ app = Flask(
 )
 
 # Import routes after app is created to avoid circular imports
-from app import routes
\ No newline at end of file
+from app import routes
+
+# Realtime WebSocket transport (registered only when flask-sock is installed)
+from app import realtime
@@ -0,0 +1,145 @@
+import json
+import uuid
+import struct
+import logging
+
+import cv2
+import numpy as np
+
+from detection.tiling import TileMotionGate
+from utils.helpers import process_image, build_overlay
+from utils.streaming import json_default
+
+# Get the app instance and shared detectors
+from app import app
+from app.routes import yolo_detector, license_plate_recognizer, tracker_pool
+
+logger = logging.getLogger(__name__)
+
+# flask-sock is optional; without it the realtime page falls back to HTTP POSTs
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+class RealtimeSession:
+    def __init__(self):
+        """Per-connection detection state for a realtime WebSocket client"""
+        self.detection_type = 'license_plate'
+        self.show_boxes = True
+        self.response_mode = 'image'  # 'image' or 'overlay'
+        self.source_id = None  # Camera identifier for the lane geometry cache
+        self.tracker_key = f"ws:{uuid.uuid4().hex}"  # Lane intrusion tracker in the shared pool
+        self.motion_gate = TileMotionGate()  # Static tiles of this camera for tiled vehicle detection
+        self.frames_received = 0
+        self.frames_dropped = 0
+
+    def configure(self, message: dict):
+        """Apply a JSON control message from the client"""
+        detection_type = message.get('detection_type', self.detection_type)
+        if detection_type != self.detection_type:
+            # Tracks from one detection mode are meaningless in another
+            self.close()
+            self.tracker_key = f"ws:{uuid.uuid4().hex}"
+        self.detection_type = detection_type
+        self.show_boxes = bool(message.get('show_boxes', self.show_boxes))
+        self.response_mode = message.get('response_mode', self.response_mode)
+        self.source_id = message.get('source_id', self.source_id) or None
+
+    def process(self, frame_id: int, jpeg_bytes: bytes) -> bytes:
+        """
+        Run detection on one JPEG frame
+
+        Args:
+            frame_id: Client-assigned frame id, echoed back in the response
+            jpeg_bytes: Encoded frame
+
+        Returns:
+            Binary response: uint32 header length, JSON header, then the annotated
+            JPEG (only when show_boxes is enabled in 'image' response mode)
+        """
+        image = cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return encode_response({'frame_id': frame_id, 'error': 'Failed to decode image'})
+
+        with tracker_pool.session(self.tracker_key) as lane_intrusion_detector:
+            lane_intrusion_detector.source_id = self.source_id
+            # Only the annotated image mode needs a rendered frame
+            render = self.response_mode != 'overlay' and self.show_boxes
+            result, output_image = process_image(image, self.detection_type, yolo_detector,
+                                                 license_plate_recognizer, lane_intrusion_detector,
+                                                 render=render, motion_gate=self.motion_gate)
+            overlay = build_overlay(result, self.detection_type, lane_intrusion_detector)
+        result['frame_id'] = frame_id
+        result['frames_dropped'] = self.frames_dropped
+
+        image_bytes = b''
+        if self.response_mode == 'overlay':
+            result['overlay'] = overlay
+        elif render:
+            _, buffer = cv2.imencode('.jpg', output_image)
+            image_bytes = buffer.tobytes()
+
+        return encode_response(result, image_bytes)
+
+    def close(self):
+        """Hand the session's tracker back to the pool"""
+        tracker_pool.release(self.tracker_key)
+
+def encode_response(header: dict, image_bytes: bytes = b'') -> bytes:
+    """Pack a JSON header and optional JPEG payload into one binary message"""
+    header_bytes = json.dumps(header, default=json_default, ensure_ascii=False).encode('utf-8')
+    return struct.pack('>I', len(header_bytes)) + header_bytes + image_bytes
+
+def realtime_socket(ws):
+    """
+    Realtime detection over a persistent WebSocket
+
+    Text messages are JSON control messages
+    ({"detection_type": ..., "show_boxes": ..., "response_mode": ..., "source_id": ...}).
+    Binary messages are frames: a big-endian uint32 frame id followed by JPEG bytes.
+    When frames arrive faster than they can be processed, only the newest
+    pending frame is kept and the rest are dropped.
+    """
+    session = RealtimeSession()
+    try:
+        _serve_realtime_socket(ws, session)
+    finally:
+        session.close()
+
+def _serve_realtime_socket(ws, session: RealtimeSession):
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+
+        # Drain everything that queued up while we were busy, keeping the newest frame
+        latest_frame = None
+        while message is not None:
+            if isinstance(message, str):
+                try:
+                    session.configure(json.loads(message))
+                except ValueError:
+                    logger.warning("Ignoring malformed realtime control message")
+            elif len(message) > 4:
+                session.frames_received += 1
+                if latest_frame is not None:
+                    session.frames_dropped += 1
+                latest_frame = message
+            message = ws.receive(timeout=0)
+
+        if latest_frame is None:
+            continue
+
+        frame_id = struct.unpack('>I', latest_frame[:4])[0]
+        try:
+            ws.send(session.process(frame_id, latest_frame[4:]))
+        except Exception as e:
+            logger.error(f"Error processing realtime frame: {e}")
+            ws.send(encode_response({'frame_id': frame_id, 'error': str(e)}))
+
+if Sock is not None:
+    sock = Sock(app)
+    sock.route('/ws/realtime')(realtime_socket)
+else:
+    logger.warning("flask-sock is not installed; realtime WebSocket transport disabled")
@@ -2,8 +2,9 @@ import os
 import logging
 import json
 import time
+import uuid
 from datetime import datetime
-from flask import render_template, request, jsonify, redirect, url_for, flash, session
+from flask import render_template, request, jsonify, redirect, url_for, flash, session, Response
 from werkzeug.utils import secure_filename
 import cv2
 import numpy as np
@@ -13,7 +14,15 @@ from i18n.translations import get_text
 from detection.yolo_detector import YOLODetector
 from detection.license_plate_recognition import LicensePlateRecognizer
 from detection.lane_intrusion import LaneIntrusionDetector
-from utils.helpers import process_image, save_detection_result
+from detection.lane_geometry import get_default_cache
+from detection.tiling import TileMotionGate
+from utils.helpers import process_image, process_image_batch, iter_batches, save_detection_result, build_overlay, detection_stages
+from utils.video import AnnotatedVideoWriter, SamplingStats, iter_frames, get_video_info, sampler_from_config
+from utils.parallel import iter_parallel_results, supports_sampler
+from utils.streaming import STREAM_MIMETYPES, encode_stream
+from utils.trackers import TrackerPool
+from utils.jobs import JobManager, JOB_QUEUED, JOB_RUNNING, JOB_CANCELLED, FINISHED_STATES
+import config
 
 # Get the app instance from app/__init__.py
 from app import app
@@ -25,7 +34,17 @@ logger = logging.getLogger(__name__)
 # Initialize detectors
 yolo_detector = YOLODetector()
 license_plate_recognizer = LicensePlateRecognizer()
-lane_intrusion_detector = LaneIntrusionDetector()
+
+# Lane intrusion trackers are stateful: one per realtime session or video job
+tracker_pool = TrackerPool(max_trackers=config.TRACKER_POOL_MAX_TRACKERS,
+                           idle_timeout=config.TRACKER_POOL_IDLE_TIMEOUT,
+                           max_bytes=config.TRACKER_POOL_MAX_BYTES)
+
+# Load the per-camera lane geometry at startup so known cameras skip lane estimation
+lane_geometry_cache = get_default_cache()
+
+# Decides which video frames are decoded and processed (see FRAME_SAMPLING_* in config.py)
+frame_sampler = sampler_from_config()
 
 # Create upload folder if it doesn't exist
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'uploads')
@@ -40,6 +59,56 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'mp4', 'avi'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def add_detection_items(detection_id, detection_type, result):
+    """
+    Add DetectionItem rows for a detection result to the current session
+
+    Args:
+        detection_id: ID of the DetectionResult row
+        detection_type: Type of detection ('license_plate', 'lane_intrusion' or 'combined')
+        result: Result dictionary from process_image
+
+    Returns:
+        Number of items added
+    """
+    count = 0
+    stages = detection_stages(detection_type)
+
+    if 'license_plate' in stages and 'detections' in result:
+        for item in result['detections']:
+            if 'license_plate' in item and item['license_plate']:
+                bbox = item.get('bbox', (0, 0, 0, 0))
+                detection_item = DetectionItem(
+                    detection_id=detection_id,
+                    license_plate=item['license_plate'],
+                    confidence=item.get('confidence', 0),
+                    vehicle_id=item.get('vehicle_id'),
+                    bbox_x1=bbox[0],
+                    bbox_y1=bbox[1],
+                    bbox_x2=bbox[2],
+                    bbox_y2=bbox[3]
+                )
+                db.session.add(detection_item)
+                count += 1
+
+    if 'lane_intrusion' in stages and 'intrusions' in result:
+        for item in result['intrusions']:
+            bbox = item.get('vehicle_bbox', (0, 0, 0, 0))
+            detection_item = DetectionItem(
+                detection_id=detection_id,
+                vehicle_id=item.get('vehicle_id'),
+                from_lane=item.get('from_lane'),
+                to_lane=item.get('to_lane'),
+                bbox_x1=bbox[0],
+                bbox_y1=bbox[1],
+                bbox_x2=bbox[2],
+                bbox_y2=bbox[3]
+            )
+            db.session.add(detection_item)
+            count += 1
+
+    return count
+
 @app.route('/')
 def index():
     # Set default language to Chinese if not set
@@ -107,8 +176,9 @@ def upload_file():
                                       lang=session.get('lang', 'zh'))
             else:
                 # Process image
+                # A single image has no tracking history, so it gets a fresh tracker
                 result, output_image = process_image(filepath, detection_type, yolo_detector,
-                                                   license_plate_recognizer, lane_intrusion_detector)
+                                                   license_plate_recognizer, LaneIntrusionDetector())
 
                 result_path = save_detection_result(output_image, filename, app.config['UPLOAD_FOLDER'])
                 rel_result_path = '/static/uploads/' + os.path.basename(result_path)
@@ -123,34 +193,7 @@ def upload_file():
                 db.session.flush()  # Get the ID without committing
 
                 # Add detection items
-                if detection_type == 'license_plate' and 'detections' in result:
-                    for item in result['detections']:
-                        if 'license_plate' in item and item['license_plate']:
-                            bbox = item.get('bbox', (0, 0, 0, 0))
-                            detection_item = DetectionItem(
-                                detection_id=detection.id,
-                                license_plate=item['license_plate'],
-                                confidence=item.get('confidence', 0),
-                                bbox_x1=bbox[0],
-                                bbox_y1=bbox[1],
-                                bbox_x2=bbox[2],
-                                bbox_y2=bbox[3]
-                            )
-                            db.session.add(detection_item)
-
-                elif detection_type == 'lane_intrusion' and 'intrusions' in result:
-                    for item in result['intrusions']:
-                        detection_item = DetectionItem(
-                            detection_id=detection.id,
-                            vehicle_id=item.get('vehicle_id'),
-                            from_lane=item.get('from_lane'),
-                            to_lane=item.get('to_lane'),
-                            bbox_x1=item.get('vehicle_bbox', (0, 0, 0, 0))[0],
-                            bbox_y1=item.get('vehicle_bbox', (0, 0, 0, 0))[1],
-                            bbox_x2=item.get('vehicle_bbox', (0, 0, 0, 0))[2],
-                            bbox_y2=item.get('vehicle_bbox', (0, 0, 0, 0))[3]
-                        )
-                        db.session.add(detection_item)
+                add_detection_items(detection.id, detection_type, result)
 
                 db.session.commit()
 
@@ -181,6 +224,10 @@ def api_detect():
         return jsonify({'error': 'No file selected'}), 400
 
     detection_type = request.form.get('detection_type', 'license_plate')
+    stream_format = request.values.get('stream')
+
+    if stream_format and stream_format not in STREAM_MIMETYPES:
+        return jsonify({'error': f'Unsupported stream format: {stream_format}'}), 400
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
@@ -188,42 +235,36 @@ def api_detect():
         file.save(filepath)
 
         try:
+            if filepath.endswith(('.mp4', '.avi')) and stream_format:
+                # Emit one record per processed frame instead of collecting them all
+                records = iter_api_video_records(filepath, detection_type)
+                return Response(encode_stream(records, stream_format), mimetype=STREAM_MIMETYPES[stream_format])
+
             if filepath.endswith(('.mp4', '.avi')):
                 # For API, we'll process videos frame by frame
                 results = []
-                cap = cv2.VideoCapture(filepath)
-                frame_count = 0
-
-                while cap.isOpened():
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
-
-                    frame_count += 1
-                    if frame_count % 10 != 0:  # Process every 10th frame to reduce load
-                        continue
-
-                    # Save frame temporarily
-                    temp_frame_path = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_frame_{frame_count}.jpg")
-                    cv2.imwrite(temp_frame_path, frame)
-
-                    # Process the frame
-                    result, _ = process_image(temp_frame_path, detection_type, yolo_detector,
-                                             license_plate_recognizer, lane_intrusion_detector)
-
-                    # Add frame info to result
-                    result['frame'] = frame_count
-                    results.append(result)
-
-                    # Remove temporary frame file
-                    os.remove(temp_frame_path)
-
-                cap.release()
-                return jsonify({'type': 'video', 'results': results})
+                sampling_stats = SamplingStats()
+                lane_intrusion_detector = LaneIntrusionDetector()
+                motion_gate = TileMotionGate()
+
+                # Only decode the sampled frames to reduce load
+                frames = iter_frames(filepath, sampler=frame_sampler, stats=sampling_stats)
+                for batch in iter_batches(frames, config.DETECTION_BATCH_SIZE):
+                    # Process the frames (headless: the API only returns structured results)
+                    outputs = process_image_batch([frame for _, frame in batch], detection_type, yolo_detector,
+                                                  license_plate_recognizer, lane_intrusion_detector, render=False,
+                                                  motion_gate=motion_gate)
+
+                    for (frame_count, _), (result, _) in zip(batch, outputs):
+                        # Add frame info to result
+                        result['frame'] = frame_count
+                        results.append(result)
+
+                return jsonify({'type': 'video', 'results': results, 'sampling': sampling_stats.to_dict()})
             else:
                 # Process image
                 result, output_image = process_image(filepath, detection_type, yolo_detector,
-                                                  license_plate_recognizer, lane_intrusion_detector)
+                                                  license_plate_recognizer, LaneIntrusionDetector())
 
                 # Convert output image to base64 for JSON response
                 _, buffer = cv2.imencode('.jpg', output_image)
@@ -238,114 +279,340 @@ def api_detect():
 
     return jsonify({'error': 'Invalid file type'}), 400
 
+def iter_api_video_records(video_path, detection_type):
+    """Yield frame, progress and summary stream records for a video processed in this request"""
+    total_frames = get_video_info(video_path)['total_frames']
+    sampling_stats = SamplingStats()
+    processed = 0
+    detections_count = 0
+    lane_intrusion_detector = LaneIntrusionDetector()
+    motion_gate = TileMotionGate()
+
+    frames = iter_frames(video_path, sampler=frame_sampler, stats=sampling_stats)
+    for batch in iter_batches(frames, config.DETECTION_BATCH_SIZE):
+        outputs = process_image_batch([frame for _, frame in batch], detection_type, yolo_detector,
+                                      license_plate_recognizer, lane_intrusion_detector, render=False,
+                                      motion_gate=motion_gate)
+
+        for (frame_count, _), (result, _) in zip(batch, outputs):
+            processed += 1
+            detections_count += len(result.get('detections', [])) + len(result.get('intrusions', []))
+
+            yield dict(result, type='frame', frame=frame_count)
+            yield {
+                'type': 'progress',
+                'frame': frame_count,
+                'total_frames': total_frames,
+                'progress': int((frame_count / total_frames) * 100) if total_frames else 0
+            }
+
+    yield {
+        'type': 'summary',
+        'total_frames': total_frames,
+        'processed_frames': processed,
+        'detections_count': detections_count,
+        'sampling': sampling_stats.to_dict()
+    }
+
 @app.route('/process_video', methods=['POST'])
 def process_video():
-    """Process video file frame by frame and return results"""
+    """Queue a video for background processing and return the job id"""
     filepath = request.form.get('filepath')
     detection_type = request.form.get('detection_type', 'license_plate')
+    parallel = request.form.get('parallel', str(config.VIDEO_PARALLEL_WORKERS > 0)).lower() == 'true'
 
     if not filepath:
         return jsonify({'error': 'No file path provided'}), 400
 
+    if parallel and not supports_sampler(frame_sampler):
+        logger.warning(f"Chunked processing does not support the '{frame_sampler.policy}' sampling policy; "
+                       f"processing sequentially")
+        parallel = False
+
     full_path = os.path.join('static', filepath)
 
     if not os.path.exists(full_path):
         return jsonify({'error': 'File not found'}), 404
 
     try:
-        results = []
-        detections_count = 0
+        # Find the database record for this video, creating one if the upload step was skipped
+        filename = os.path.basename(filepath)
+        detection = DetectionResult.query.filter_by(filename=filename).order_by(DetectionResult.id.desc()).first()
+        if detection is None:
+            detection = DetectionResult(
+                filename=filename,
+                detection_type=detection_type,
+                result_path='/static/uploads/' + filename
+            )
+            db.session.add(detection)
+            db.session.flush()
+
+        detection.status = JOB_QUEUED
+        detection.progress = 0
+        detection.processed_frames = 0
+        detection.error_message = None
+        db.session.commit()
 
-        cap = cv2.VideoCapture(full_path)
-        frame_count = 0
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        job = job_manager.submit(run_video_job, detection.id, full_path, detection_type,
+                                 options={'parallel': parallel, 'source_id': request.form.get('source_id')})
 
-        # Find the database record for this video
-        filename = os.path.basename(filepath)
-        detection = DetectionResult.query.filter_by(filename=filename).first()
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_count += 1
-            if frame_count % 10 != 0:  # Process every 10th frame
-                continue
-
-            # Save frame temporarily
-            temp_frame_path = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_frame_{frame_count}.jpg")
-            cv2.imwrite(temp_frame_path, frame)
-
-            # Process the frame
-            result, output_frame = process_image(temp_frame_path, detection_type, yolo_detector,
-                                         license_plate_recognizer, lane_intrusion_detector)
-
-            # Save output frame
-            result_path = os.path.join(app.config['UPLOAD_FOLDER'], f"result_frame_{frame_count}.jpg")
-            cv2.imwrite(result_path, output_frame)
-
-            # Add frame info to result
-            result['frame'] = frame_count
-            result['frame_path'] = '/static/uploads/' + os.path.basename(result_path)
-            result['progress'] = int((frame_count / total_frames) * 100)
-
-            # Save to database if we have a detection record
-            if detection:
-                if detection_type == 'license_plate' and 'detections' in result:
-                    for item in result['detections']:
-                        if 'license_plate' in item and item['license_plate']:
-                            detections_count += 1
-                            bbox = item.get('bbox', (0, 0, 0, 0))
-                            detection_item = DetectionItem(
-                                detection_id=detection.id,
-                                license_plate=item['license_plate'],
-                                confidence=item.get('confidence', 0),
-                                bbox_x1=bbox[0],
-                                bbox_y1=bbox[1],
-                                bbox_x2=bbox[2],
-                                bbox_y2=bbox[3]
-                            )
-                            db.session.add(detection_item)
-
-                elif detection_type == 'lane_intrusion' and 'intrusions' in result:
-                    for item in result['intrusions']:
-                        detections_count += 1
-                        detection_item = DetectionItem(
-                            detection_id=detection.id,
-                            vehicle_id=item.get('vehicle_id'),
-                            from_lane=item.get('from_lane'),
-                            to_lane=item.get('to_lane'),
-                            bbox_x1=item.get('vehicle_bbox', (0, 0, 0, 0))[0],
-                            bbox_y1=item.get('vehicle_bbox', (0, 0, 0, 0))[1],
-                            bbox_x2=item.get('vehicle_bbox', (0, 0, 0, 0))[2],
-                            bbox_y2=item.get('vehicle_bbox', (0, 0, 0, 0))[3]
-                        )
-                        db.session.add(detection_item)
-
-            results.append(result)
-
-            # Remove temporary frame file
-            os.remove(temp_frame_path)
-
-        cap.release()
-
-        # Commit any database changes
-        if detection:
-            db.session.commit()
+        # Only touch job_id here; the worker may already be updating the rest of the row
+        DetectionResult.query.filter_by(id=detection.id).update({'job_id': job.job_id})
+        db.session.commit()
 
         return jsonify({
             'success': True,
-            'results': results,
-            'total_frames': total_frames,
-            'processed_frames': frame_count,
-            'detections_count': detections_count
-        })
+            'job_id': job.job_id,
+            'detection_id': detection.id,
+            'status_url': url_for('job_status', job_id=job.job_id),
+            'results_url': url_for('job_results', job_id=job.job_id),
+            'cancel_url': url_for('cancel_job', job_id=job.job_id),
+            'stream_url': url_for('stream_job', job_id=job.job_id),
+            'stream_results': config.VIDEO_STREAM_RESULTS
+        }), 202
 
     except Exception as e:
         logger.error(f"Video processing error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def run_video_job(job):
+    """Process a video frame by frame on a job worker"""
+    video_info = get_video_info(job.video_path)
+    job.total_frames = video_info['total_frames']
+    job_manager.persist(job)
+
+    if job.options.get('parallel'):
+        # Chunks run in worker processes with their own detectors; results arrive in frame order
+        results = iter_parallel_results(job.video_path, job.detection_type, frame_sampler,
+                                        num_workers=config.VIDEO_PARALLEL_WORKERS or None,
+                                        source_id=job.options.get('source_id'))
+    else:
+        job.sampling_stats = SamplingStats()
+        results = iter_video_results(job.video_path, job.detection_type, job.sampling_stats,
+                                     tracker_key=f"job:{job.job_id}", source_id=job.options.get('source_id'))
+
+    # All annotated frames of the job go into one video with a frame index sidecar,
+    # placed at their source times so it plays at source speed under every policy
+    source_fps = video_info['fps'] or 25
+    writer = AnnotatedVideoWriter(os.path.join(app.config['UPLOAD_FOLDER'], f"result_{job.job_id}"),
+                                  fps=max(1.0, frame_sampler.output_fps(source_fps)))
+
+    try:
+        for result, output_frame in results:
+            job.check_cancelled()
+
+            result['video_time'] = writer.write(result['frame'], output_frame, (result['frame'] - 1) / source_fps)
+            result['progress'] = int((result['frame'] / job.total_frames) * 100) if job.total_frames else 0
+
+            # Save detection items as we go so partial results survive a cancel or crash
+            # (they are committed with the next progress persist)
+            job.detections_count += add_detection_items(job.detection_id, job.detection_type, result)
+
+            job.processed_frames += 1  # Sampled frames, not the source frame number
+            job.progress = min(result['progress'], 99)
+            job.add_result(result)
+            job_manager.persist(job, force=False)
+    finally:
+        results.close()
+        tracker_pool.release(f"job:{job.job_id}")
+
+        # Also finalises the partial video of a cancelled or failed job
+        outputs = writer.close()
+        if outputs:
+            job.outputs = {
+                'video_url': '/static/uploads/' + os.path.basename(outputs['video_path']),
+                'index_url': '/static/uploads/' + os.path.basename(outputs['index_path'])
+            }
+
+def iter_video_results(video_path, detection_type, sampling_stats=None, tracker_key=None, source_id=None):
+    """Process a video frame by frame in the current thread, yielding (result, output_frame) tuples"""
+    # The video keeps its own tracker from the pool for as long as it is being read
+    with tracker_pool.session(tracker_key or f"video:{uuid.uuid4().hex}") as lane_intrusion_detector:
+        # Lanes of a known camera come from the lane geometry cache
+        lane_intrusion_detector.source_id = source_id
+        motion_gate = TileMotionGate()
+        # Only decode the sampled frames, and detect vehicles a batch of frames at a time
+        frames = iter_frames(video_path, sampler=frame_sampler, stats=sampling_stats)
+        for batch in iter_batches(frames, config.DETECTION_BATCH_SIZE):
+            outputs = process_image_batch([frame for _, frame in batch], detection_type, yolo_detector,
+                                          license_plate_recognizer, lane_intrusion_detector,
+                                          motion_gate=motion_gate)
+
+            for (frame_count, _), (result, output_frame) in zip(batch, outputs):
+                # Add frame info to result
+                result['frame'] = frame_count
+                yield result, output_frame
+
+def persist_job(job):
+    """
+    Store job state on its DetectionResult row and pick up cancellations from other workers
+
+    Also commits the DetectionItems added to the session since the last call,
+    on every path.
+    """
+    try:
+        detection = db.session.get(DetectionResult, job.detection_id)
+        if detection is None:
+            logger.warning(f"DetectionResult {job.detection_id} of job {job.job_id} not found")
+        elif detection.status == JOB_CANCELLED and job.status == JOB_RUNNING:
+            job.cancel()
+        else:
+            detection.job_id = job.job_id
+            detection.status = job.status
+            detection.progress = job.progress
+            detection.processed_frames = job.processed_frames
+            detection.total_frames = job.total_frames
+            detection.error_message = job.error
+            if job.outputs.get('video_url'):
+                detection.result_path = job.outputs['video_url']
+        db.session.commit()
+    except Exception:
+        # Leave the session usable for the job's next frames
+        db.session.rollback()
+        raise
+
+job_manager = JobManager(app, max_workers=config.VIDEO_JOB_WORKERS, persist_fn=persist_job,
+                         result_window=config.JOB_RESULT_WINDOW,
+                         persist_interval=config.JOB_PERSIST_INTERVAL,
+                         persist_every=config.JOB_PERSIST_EVERY_FRAMES)
+
+def detection_job_status(detection):
+    """Build a job status payload from a persisted DetectionResult row"""
+    return {
+        'job_id': detection.job_id,
+        'detection_id': detection.id,
+        'detection_type': detection.detection_type,
+        'status': detection.status,
+        'progress': detection.progress or 0,
+        'processed_frames': detection.processed_frames or 0,
+        'total_frames': detection.total_frames or 0,
+        'detections_count': len(detection.items),
+        'results_available': bool(detection.items),  # /jobs/<id>/results serves the stored items
+        'outputs': {'video_url': detection.result_path} if detection.job_id and detection.job_id in (detection.result_path or '') else {},
+        'error': detection.error_message
+    }
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report the progress of a video processing job"""
+    job = job_manager.get(job_id)
+    if job is not None:
+        return jsonify(job.to_dict())
+
+    # The job may be running in another worker process; fall back to the database
+    detection = DetectionResult.query.filter_by(job_id=job_id).first()
+    if detection is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(detection_job_status(detection))
+
+@app.route('/jobs/<job_id>/results')
+def job_results(job_id):
+    """
+    Return the per-frame results of a job, starting at the given offset
+
+    A running job only keeps its most recent JOB_RESULT_WINDOW frame results;
+    when older ones were requested, 'offset' is that of the first result still
+    kept and 'dropped' counts the frames skipped. Their detections are
+    persisted: ?source=items (or any job no longer in memory) returns the
+    stored DetectionItems instead, with offsets counting items.
+    """
+    offset = request.args.get('offset', 0, type=int)
+
+    job = job_manager.get(job_id)
+    if job is not None and request.args.get('source') != 'items':
+        start, results = job.get_results(offset)
+        return jsonify({
+            'job_id': job_id,
+            'status': job.status,
+            'offset': start,
+            'dropped': start - offset,
+            'next_offset': start + len(results),
+            'results': results,
+            'items_url': url_for('job_results', job_id=job_id, source='items')
+        })
+
+    detection = DetectionResult.query.filter_by(job_id=job_id).first()
+    if detection is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    # Frame results only live (briefly) in the worker that ran the job; report the stored items instead
+    items = [{
+        'license_plate': item.license_plate,
+        'confidence': item.confidence,
+        'vehicle_id': item.vehicle_id,
+        'from_lane': item.from_lane,
+        'to_lane': item.to_lane,
+        'bbox': (item.bbox_x1, item.bbox_y1, item.bbox_x2, item.bbox_y2)
+    } for item in detection.items[offset:]]
+
+    return jsonify({
+        'job_id': job_id,
+        'status': detection.status,
+        'offset': offset,
+        'next_offset': offset + len(items),
+        'items': items
+    })
+
+@app.route('/jobs/<job_id>/stream')
+def stream_job(job_id):
+    """Stream a job's frame results, progress and final summary as NDJSON or Server-Sent Events"""
+    stream_format = request.args.get('format', 'ndjson')
+    offset = request.args.get('offset', 0, type=int)
+
+    if stream_format not in STREAM_MIMETYPES:
+        return jsonify({'error': f'Unsupported stream format: {stream_format}'}), 400
+
+    job = job_manager.get(job_id)
+    if job is not None:
+        records = iter_job_records(job, offset)
+    else:
+        # Not running in this worker process; report the stored state as a single summary
+        detection = DetectionResult.query.filter_by(job_id=job_id).first()
+        if detection is None:
+            return jsonify({'error': 'Job not found'}), 404
+        records = [dict(detection_job_status(detection), type='summary')]
+
+    return Response(encode_stream(records, stream_format), mimetype=STREAM_MIMETYPES[stream_format],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def iter_job_records(job, offset=0):
+    """Yield stream records for a job as its results come in"""
+    last_progress = None
+
+    while True:
+        # A reader too slow for the job's result window skips the dropped frames
+        offset, results = job.wait_for_update(offset, timeout=1.0)
+        for i, result in enumerate(results):
+            yield dict(result, type='frame', offset=offset + i)
+        offset += len(results)
+
+        status = job.to_dict()
+        progress = (status['status'], status['progress'])
+        if progress != last_progress:
+            yield dict(status, type='progress')
+            last_progress = progress
+
+        if job.status in FINISHED_STATES and offset >= job.results_total:
+            yield dict(job.to_dict(), type='summary')
+            return
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    detection = DetectionResult.query.filter_by(job_id=job_id).first()
+    cancelled = job_manager.cancel(job_id)
+
+    if detection is None and not cancelled:
+        return jsonify({'error': 'Job not found'}), 404
+
+    # Mark the row as well, so the job stops even if another worker process is running it
+    if detection is not None and detection.status not in FINISHED_STATES:
+        detection.status = JOB_CANCELLED
+        db.session.commit()
+
+    return jsonify({'success': True, 'job_id': job_id})
+
 @app.route('/history')
 def detection_history():
     """Display detection history from the database"""
@@ -369,7 +636,8 @@ def realtime():
     """Real-time detection page"""
     return render_template('realtime.html',
                           title=get_text('realtime_detection', session.get('lang', 'zh')),
-                          lang=session.get('lang', 'zh'))
+                          lang=session.get('lang', 'zh'),
+                          response_mode=config.REALTIME_RESPONSE_MODE)
 
 @app.route('/process_realtime', methods=['POST'])
 def process_realtime():
@@ -381,6 +649,10 @@ def process_realtime():
     image_data = request.form['image_data']
     detection_type = request.form.get('detection_type', 'license_plate')
     show_boxes = request.form.get('show_boxes', 'true').lower() == 'true'
+    # 'image' returns the annotated frame, 'overlay' only the structured overlay for client-side drawing
+    response_mode = request.form.get('response_mode', 'image')
+    # Identifies the camera, so its lanes can be taken from the lane geometry cache
+    source_id = request.form.get('source_id') or None
 
     # Remove data URL prefix
     if image_data.startswith('data:image/jpeg;base64,'):
@@ -395,9 +667,23 @@ def process_realtime():
         if image is None:
             return jsonify({'error': 'Failed to decode image'}), 400
 
+        # Each browser session keeps its own tracks and lanes per detection type
+        if 'tracker_id' not in session:
+            session['tracker_id'] = uuid.uuid4().hex
+        tracker_key = f"realtime:{session['tracker_id']}:{detection_type}"
+
         # Process the image
-        result, output_image = process_image(image, detection_type, yolo_detector,
-                                           license_plate_recognizer, lane_intrusion_detector)
+        with tracker_pool.session(tracker_key) as lane_intrusion_detector:
+            lane_intrusion_detector.source_id = source_id
+            # Overlay clients draw for themselves, so nothing is rendered on the server
+            result, output_image = process_image(image, detection_type, yolo_detector,
+                                               license_plate_recognizer, lane_intrusion_detector,
+                                               render=response_mode != 'overlay')
+
+            if response_mode == 'overlay':
+                # The browser already has the frame, so skip re-encoding it
+                result['overlay'] = build_overlay(result, detection_type, lane_intrusion_detector)
+                return jsonify(result)
 
         # Convert output image to base64
         _, buffer = cv2.imencode('.jpg', output_image)
@@ -461,35 +747,7 @@ def save_capture():
         if detection_data:
             try:
                 data = json.loads(detection_data)
-
-                if detection_type == 'license_plate' and 'detections' in data:
-                    for item in data['detections']:
-                        if 'license_plate' in item and item['license_plate']:
-                            bbox = item.get('bbox', (0, 0, 0, 0))
-                            detection_item = DetectionItem(
-                                detection_id=detection.id,
-                                license_plate=item['license_plate'],
-                                confidence=item.get('confidence', 0),
-                                bbox_x1=bbox[0],
-                                bbox_y1=bbox[1],
-                                bbox_x2=bbox[2],
-                                bbox_y2=bbox[3]
-                            )
-                            db.session.add(detection_item)
-
-                elif detection_type == 'lane_intrusion' and 'intrusions' in data:
-                    for item in data['intrusions']:
-                        detection_item = DetectionItem(
-                            detection_id=detection.id,
-                            vehicle_id=item.get('vehicle_id'),
-                            from_lane=item.get('from_lane'),
-                            to_lane=item.get('to_lane'),
-                            bbox_x1=item.get('vehicle_bbox', (0, 0, 0, 0))[0],
-                            bbox_y1=item.get('vehicle_bbox', (0, 0, 0, 0))[1],
-                            bbox_x2=item.get('vehicle_bbox', (0, 0, 0, 0))[2],
-                            bbox_y2=item.get('vehicle_bbox', (0, 0, 0, 0))[3]
-                        )
-                        db.session.add(detection_item)
+                add_detection_items(detection.id, detection_type, data)
             except Exception as e:
                 logger.error(f"Error processing detection data: {e}")
 
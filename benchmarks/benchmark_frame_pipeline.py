@@ -0,0 +1,107 @@
+"""
+Benchmark the video frame pipeline: temp JPEG round-trip vs in-memory frames
+
+Usage:
+    python benchmarks/benchmark_frame_pipeline.py [video_path] [--interval N] [--policy frames|time|keyframe]
+
+If no video is given, a synthetic clip is generated in a temporary directory.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import logging
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection.yolo_detector import YOLODetector
+from detection.license_plate_recognition import LicensePlateRecognizer
+from detection.lane_intrusion import LaneIntrusionDetector
+from utils.helpers import process_image
+from utils.video import FrameSampler, iter_frames
+
+def make_synthetic_clip(path, num_frames=1500, width=1280, height=720, fps=25):
+    """Write a synthetic clip with a few moving rectangles"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+    for i in range(num_frames):
+        frame = background.copy()
+        for k in range(4):
+            x = (i * (3 + k) + k * 200) % (width - 120)
+            y = height // 2 + (k - 2) * 80
+            cv2.rectangle(frame, (x, y), (x + 120, y + 60), (40 + 50 * k, 200, 255 - 50 * k), -1)
+        writer.write(frame)
+    writer.release()
+
+def run_temp_jpeg(video_path, detection_type, interval, detectors, temp_dir):
+    """Baseline: write each sampled frame to disk and read it back"""
+    cap = cv2.VideoCapture(video_path)
+    frame_count = 0
+    processed = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        if frame_count % interval != 0:
+            continue
+        temp_frame_path = os.path.join(temp_dir, f"temp_frame_{frame_count}.jpg")
+        cv2.imwrite(temp_frame_path, frame)
+        process_image(temp_frame_path, detection_type, *detectors)
+        os.remove(temp_frame_path)
+        processed += 1
+    cap.release()
+    return frame_count, processed
+
+def run_in_memory(video_path, detection_type, sampler, detectors):
+    """Streaming pipeline: frames go straight from the decoder to the detectors"""
+    frame_count = 0
+    processed = 0
+    for frame_count, frame in iter_frames(video_path, sampler=sampler):
+        process_image(frame, detection_type, *detectors)
+        processed += 1
+    return frame_count, processed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', nargs='?', help='Path to a (long) video clip')
+    parser.add_argument('--interval', type=int, default=10, help='Process every n-th frame')
+    parser.add_argument('--policy', default='frames', choices=FrameSampler.POLICIES, help='Sampling policy for the in-memory run')
+    parser.add_argument('--interval-ms', type=float, default=400, help="Sampling interval for the 'time' policy")
+    parser.add_argument('--detection-type', default='license_plate', choices=['license_plate', 'lane_intrusion'])
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = args.video
+        if video_path is None:
+            video_path = os.path.join(temp_dir, 'synthetic.mp4')
+            print("Generating synthetic clip...")
+            make_synthetic_clip(video_path)
+
+        detectors = (YOLODetector(), LicensePlateRecognizer(), LaneIntrusionDetector())
+
+        start = time.perf_counter()
+        frames, processed = run_temp_jpeg(video_path, args.detection_type, args.interval, detectors, temp_dir)
+        baseline = time.perf_counter() - start
+
+        detectors = (YOLODetector(), LicensePlateRecognizer(), LaneIntrusionDetector())
+
+        start = time.perf_counter()
+        sampler = FrameSampler(args.policy, args.interval, args.interval_ms)
+        _, processed_mem = run_in_memory(video_path, args.detection_type, sampler, detectors)
+        in_memory = time.perf_counter() - start
+
+    print(f"Video: {video_path} ({frames} frames, interval {args.interval}, {processed} processed)")
+    print(f"temp JPEG round-trip: {baseline:.2f}s  {frames / baseline:8.1f} frames/s  {processed / baseline:8.1f} processed/s")
+    print(f"in-memory ({args.policy:8s}): {in_memory:.2f}s  {frames / in_memory:8.1f} frames/s  {processed_mem / in_memory:8.1f} processed/s")
+    print(f"speedup: {baseline / in_memory:.2f}x")
+
+if __name__ == '__main__':
+    main()
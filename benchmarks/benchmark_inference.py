@@ -0,0 +1,88 @@
+"""
+Benchmark vehicle detection latency per inference backend on the CPU
+
+Usage:
+    python benchmarks/benchmark_inference.py [--model models/yolov8n.onnx]
+        [--backends demo opencv onnxruntime] [--batch-sizes 1 4 8] [--frames 32]
+        [--threads 0] [--video path/to/video.mp4] [--tiled [--tile-workers 0]]
+
+Frames come from --video when given (so the detections are realistic),
+otherwise from random noise at 1280x720 (3840x2160 with --tiled). Backends
+that cannot be loaded (missing model file or runtime) are reported and
+skipped. --tiled times tiled inference (config.TILED_INFERENCE) with every
+tile run, i.e. without motion-based tile skipping.
+"""
+import os
+import sys
+import time
+import argparse
+from itertools import islice
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from detection.yolo_detector import YOLODetector
+from utils.helpers import iter_batches
+from utils.video import iter_frames
+
+def load_frames(video_path, count, width=1280, height=720, seed=0):
+    """Read count frames from a video, or make random ones"""
+    if video_path:
+        frames = [frame for _, frame in islice(iter_frames(video_path), count)]
+        if frames:
+            return frames
+        print(f"could not read frames from {video_path}, using random frames")
+
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(count)]
+
+def time_backend(detector, frames, batch_size, warmup=2):
+    """Milliseconds per frame and mean vehicles per frame at a batch size"""
+    for batch in list(iter_batches(frames, batch_size))[:warmup]:
+        detector.detect_vehicles_batch(batch)
+
+    vehicles = 0
+    start = time.perf_counter()
+    for batch in iter_batches(frames, batch_size):
+        vehicles += sum(len(detections) for detections in detector.detect_vehicles_batch(batch))
+    elapsed = time.perf_counter() - start
+    return elapsed / len(frames) * 1000, vehicles / len(frames)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=config.YOLO_MODEL, help='Exported YOLOv8 ONNX model')
+    parser.add_argument('--backends', nargs='+', default=['demo', 'opencv', 'onnxruntime'], help='Backends to compare')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8], help='Frames per inference call')
+    parser.add_argument('--frames', type=int, default=32, help='Frames timed per measurement')
+    parser.add_argument('--threads', type=int, default=config.INFERENCE_INTRA_OP_THREADS,
+                        help='Intra-op threads (0 = runtime default)')
+    parser.add_argument('--video', help='Video to take the frames from')
+    parser.add_argument('--tiled', action='store_true', help='Use tiled inference')
+    parser.add_argument('--tile-workers', type=int, default=config.TILE_WORKERS,
+                        help='Threads running tile batches with --tiled (0 = calling thread)')
+    args = parser.parse_args()
+
+    config.INFERENCE_INTRA_OP_THREADS = args.threads
+    config.TILED_INFERENCE = args.tiled
+    config.TILE_WORKERS = args.tile_workers
+    width, height = (3840, 2160) if args.tiled else (1280, 720)
+    frames = load_frames(args.video, args.frames, width, height)
+    tiling = f", tiled ({args.tile_workers or 'no'} tile workers)" if args.tiled else ''
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, model {args.model}, "
+          f"threads {args.threads or 'default'}{tiling}")
+    print(f"{'backend':>12} {'batch':>6} {'ms/frame':>10} {'fps':>8} {'vehicles':>9}")
+
+    for name in args.backends:
+        detector = YOLODetector(model_path=args.model, backend=name)
+        if detector.backend_name != name:
+            print(f"{name:>12} {'unavailable (see log)':>35}")
+            continue
+
+        for batch_size in args.batch_sizes:
+            ms_per_frame, vehicles = time_backend(detector, frames, batch_size)
+            print(f"{name:>12} {batch_size:>6} {ms_per_frame:>10.2f} {1000 / max(ms_per_frame, 1e-6):>8.1f} {vehicles:>9.1f}")
+
+if __name__ == '__main__':
+    main()
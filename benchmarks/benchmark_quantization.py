@@ -0,0 +1,124 @@
+"""
+Compare the INT8 model against the FP32 model: latency, throughput and detection agreement
+
+Usage:
+    python benchmarks/benchmark_quantization.py --clips benchmarks/clips
+        [--fp32 models/yolov8n.onnx] [--int8 models/yolov8n.int8.onnx]
+        [--backend onnxruntime] [--frame-interval 10] [--batch-size 4]
+
+The clip set is a local directory of .mp4/.avi files, sampled every
+--frame-interval frames, so repeated runs see exactly the same frames.
+Agreement treats the FP32 detections as reference: an INT8 vehicle counts
+as matching when it has the same class and IoU >= --iou with an FP32 one.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from detection.tracking import iou_matrix, assign_matches
+from detection.yolo_detector import YOLODetector
+from utils.helpers import iter_batches
+from utils.video import iter_frames
+
+def load_clip_frames(clips_dir, frame_interval):
+    """Sampled frames of every clip in the directory, in name order"""
+    frames = []
+    for name in sorted(os.listdir(clips_dir)):
+        if name.lower().endswith(('.mp4', '.avi')):
+            frames.extend(frame for _, frame in iter_frames(os.path.join(clips_dir, name), frame_interval))
+    return frames
+
+def run_detector(detector, frames, batch_size):
+    """Detections per frame and the elapsed seconds (after one warm-up batch)"""
+    detector.detect_vehicles_batch(frames[:batch_size])
+
+    detections = []
+    start = time.perf_counter()
+    for batch in iter_batches(frames, batch_size):
+        detections.extend(detector.detect_vehicles_batch(batch))
+    return detections, time.perf_counter() - start
+
+def agreement(reference, candidate, iou_threshold):
+    """Match two detection lists frame by frame"""
+    matched = reference_total = candidate_total = 0
+    ious, confidence_deltas = [], []
+
+    for ref_frame, cand_frame in zip(reference, candidate):
+        reference_total += len(ref_frame)
+        candidate_total += len(cand_frame)
+        if not ref_frame or not cand_frame:
+            continue
+
+        overlaps = iou_matrix([det['bbox'] for det in cand_frame], [det['bbox'] for det in ref_frame])
+
+        # Boxes of different classes never match
+        same_class = (np.array([det['class_id'] for det in cand_frame])[:, None]
+                      == np.array([det['class_id'] for det in ref_frame])[None, :])
+        overlaps = np.where(same_class, overlaps, 0.0)
+
+        for cand_idx, ref_idx in assign_matches(overlaps, iou_threshold - 1e-9):
+            matched += 1
+            ious.append(overlaps[cand_idx, ref_idx])
+            confidence_deltas.append(cand_frame[cand_idx]['confidence'] - ref_frame[ref_idx]['confidence'])
+
+    precision = matched / candidate_total if candidate_total else 1.0
+    recall = matched / reference_total if reference_total else 1.0
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'mean_iou': float(np.mean(ious)) if ious else 0.0,
+        'mean_confidence_delta': float(np.mean(confidence_deltas)) if confidence_deltas else 0.0,
+        'reference_vehicles': reference_total,
+        'candidate_vehicles': candidate_total
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', required=True, help='Directory with the benchmark clips')
+    parser.add_argument('--fp32', default=config.YOLO_MODEL, help='FP32 ONNX model')
+    parser.add_argument('--int8', default=config.YOLO_INT8_MODEL, help='INT8 ONNX model')
+    parser.add_argument('--backend', default='onnxruntime', help='Inference backend for both models')
+    parser.add_argument('--frame-interval', type=int, default=10, help='Use every n-th frame of each clip')
+    parser.add_argument('--batch-size', type=int, default=config.DETECTION_BATCH_SIZE, help='Frames per inference call')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU for two detections to agree')
+    args = parser.parse_args()
+
+    frames = load_clip_frames(args.clips, args.frame_interval)
+    if not frames:
+        print(f"no clips found in {args.clips}")
+        return 1
+
+    results = {}
+    for precision, model_path in (('fp32', args.fp32), ('int8', args.int8)):
+        detector = YOLODetector(model_path=model_path, backend=args.backend, precision=precision)
+        if detector.backend is None:
+            print(f"could not load the {precision} model {model_path} with {args.backend} (see log)")
+            return 1
+        results[precision] = run_detector(detector, frames, args.batch_size)
+
+    print(f"{len(frames)} frames, {args.backend} backend, batch size {args.batch_size}, "
+          f"threads {config.INFERENCE_INTRA_OP_THREADS or 'default'}")
+    print(f"{'model':>6} {'ms/frame':>10} {'fps':>8} {'vehicles':>9}")
+    for precision, (detections, elapsed) in results.items():
+        ms_per_frame = elapsed / len(frames) * 1000
+        print(f"{precision:>6} {ms_per_frame:>10.2f} {1000 / ms_per_frame:>8.1f} "
+              f"{sum(len(frame) for frame in detections):>9}")
+
+    speedup = results['fp32'][1] / results['int8'][1]
+    stats = agreement(results['fp32'][0], results['int8'][0], args.iou)
+    print(f"\nint8 speedup: {speedup:.2f}x")
+    print(f"agreement with fp32 (IoU >= {args.iou}): precision {stats['precision']:.3f}, "
+          f"recall {stats['recall']:.3f}, F1 {stats['f1']:.3f}")
+    print(f"matched boxes: mean IoU {stats['mean_iou']:.3f}, "
+          f"mean confidence change {stats['mean_confidence_delta']:+.3f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark track matching: nested-loop greedy IoU vs vectorized IoU matrix + assignment
+
+Usage:
+    python benchmarks/benchmark_tracking.py [--counts 10 50 100 250 500] [--repeat 20]
+
+Each run matches N detections against N slightly moved vehicles from the
+previous frame, as track_vehicles does once per processed frame.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import tracking
+from detection.tracking import iou_matrix, assign_matches
+
+def make_frames(count, width=3840, height=2160, seed=0):
+    """Create two frames of boxes where every vehicle moved a few pixels"""
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(40, 160, (count, 2))
+    x1 = rng.integers(0, width - 160, count)
+    y1 = rng.integers(0, height - 160, count)
+    prev = np.stack([x1, y1, x1 + sizes[:, 0], y1 + sizes[:, 1]], axis=1)
+    current = prev + rng.integers(-8, 9, (count, 1))
+
+    prev_detections = [{'bbox': tuple(int(v) for v in box), 'id': i + 1} for i, box in enumerate(prev)]
+    detections = [{'bbox': tuple(int(v) for v in box)} for box in rng.permutation(current)]
+    return detections, prev_detections
+
+def calculate_iou(bbox1, bbox2):
+    """Calculate Intersection over Union for two bounding boxes (the original scalar version)"""
+    x1_1, y1_1, x2_1, y2_1 = bbox1
+    x1_2, y1_2, x2_2, y2_2 = bbox2
+
+    # Calculate intersection area
+    x_left = max(x1_1, x1_2)
+    y_top = max(y1_1, y1_2)
+    x_right = min(x2_1, x2_2)
+    y_bottom = min(y2_1, y2_2)
+
+    if x_right < x_left or y_bottom < y_top:
+        return 0.0
+
+    intersection_area = (x_right - x_left) * (y_bottom - y_top)
+
+    # Calculate union area
+    bbox1_area = (x2_1 - x1_1) * (y2_1 - y1_1)
+    bbox2_area = (x2_2 - x1_2) * (y2_2 - y1_2)
+
+    union_area = bbox1_area + bbox2_area - intersection_area
+
+    return intersection_area / union_area if union_area > 0 else 0
+
+def match_nested_loop(detections, prev_detections, threshold=0.3):
+    """The original per-pair matching loop, kept here as the baseline"""
+    matched_prev_ids = set()
+    matches = 0
+    for det in detections:
+        best_match = None
+        best_iou = threshold
+        for prev_det in prev_detections:
+            if prev_det['id'] in matched_prev_ids:
+                continue
+            iou = calculate_iou(det['bbox'], prev_det['bbox'])
+            if iou > best_iou:
+                best_iou = iou
+                best_match = prev_det
+        if best_match:
+            matched_prev_ids.add(best_match['id'])
+            matches += 1
+    return matches
+
+def match_vectorized(detections, prev_detections, threshold=0.3):
+    """IoU matrix plus global assignment, as used by track_vehicles"""
+    ious = iou_matrix([det['bbox'] for det in detections], [prev['bbox'] for prev in prev_detections])
+    return len(assign_matches(ious, threshold))
+
+def time_it(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 50, 100, 250, 500], help='Objects per frame')
+    parser.add_argument('--repeat', type=int, default=20, help='Repetitions per measurement')
+    args = parser.parse_args()
+
+    hungarian_available = tracking.linear_sum_assignment is not None
+
+    print(f"assignment: {'Hungarian (scipy)' if hungarian_available else 'greedy (scipy not installed)'}")
+    print(f"{'objects':>8} {'nested ms':>10} {'vector ms':>10} {'speedup':>8} {'matches':>15}")
+    for count in args.counts:
+        detections, prev_detections = make_frames(count)
+        baseline, baseline_matches = time_it(lambda: match_nested_loop(detections, prev_detections), args.repeat)
+        vectorized, vectorized_matches = time_it(lambda: match_vectorized(detections, prev_detections), args.repeat)
+        print(f"{count:>8} {baseline:>10.2f} {vectorized:>10.2f} {baseline / vectorized:>7.1f}x "
+              f"{baseline_matches:>7}/{vectorized_matches:<7}")
+
+if __name__ == '__main__':
+    main()
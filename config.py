@@ -18,13 +18,83 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
 # YOLOv8 settings
-YOLO_MODEL = 'yolov8n.pt'  # Default model
+YOLO_BACKEND = os.environ.get('YOLO_BACKEND', 'demo')  # 'onnxruntime', 'opencv' (OpenCV DNN) or 'demo' (no model)
+YOLO_MODEL = os.environ.get('YOLO_MODEL', os.path.join(BASE_DIR, 'models', 'yolov8n.onnx'))  # Exported with: yolo export model=yolov8n.pt format=onnx dynamic=True
+YOLO_PRECISION = os.environ.get('YOLO_PRECISION', 'fp32')  # 'fp32' (YOLO_MODEL) or 'int8' (YOLO_INT8_MODEL)
+YOLO_INT8_MODEL = os.environ.get('YOLO_INT8_MODEL', os.path.join(BASE_DIR, 'models', 'yolov8n.int8.onnx'))  # Made by quantize_model.py; best run with onnxruntime
+YOLO_INPUT_SIZE = 640  # Network input size (square, letterboxed)
+YOLO_NMS_IOU_THRESHOLD = 0.45  # Overlap above which duplicate vehicle boxes are suppressed
+INFERENCE_INTRA_OP_THREADS = int(os.environ.get('INFERENCE_INTRA_OP_THREADS', 0))  # Threads inside one operator (0 = runtime default)
+INFERENCE_INTER_OP_THREADS = int(os.environ.get('INFERENCE_INTER_OP_THREADS', 0))  # Threads across operators, ONNX Runtime only (> 0 enables parallel execution; 0 = sequential)
+
+# Inference resolution: longest image side each stage works at (None = full resolution).
+# Coordinates are mapped back to the full frame, and plate OCR still crops full-resolution pixels;
+# vehicle detection always runs at YOLO_INPUT_SIZE.
+INFERENCE_MAX_SIDE_LANES = 960  # Lane line detection (Canny + Hough)
+INFERENCE_MAX_SIDE_PLATES = 1280  # Full-frame license plate search (Canny + contours)
+DETECTION_BATCH_SIZE = int(os.environ.get('DETECTION_BATCH_SIZE', 4))  # Video frames per vehicle detection call
+
+# Tiled vehicle detection for 4K and panoramic cameras: overlapping full-resolution
+# tiles plus one downscaled whole-frame pass, merged with cross-tile NMS
+TILED_INFERENCE = os.environ.get('TILED_INFERENCE', 'false').lower() == 'true'  # Off by default; needs a model backend
+TILE_SIZE = YOLO_INPUT_SIZE  # Tile side in frame pixels (tiles of YOLO_INPUT_SIZE are not resized)
+TILE_OVERLAP = 0.2  # Overlap between neighbouring tiles, as a fraction of TILE_SIZE
+TILE_MIN_FRAME_SIDE = 1920  # Frames with a shorter longest side get the single downscaled pass only
+TILE_BATCH_SIZE = 8  # Tiles per inference call
+TILE_WORKERS = int(os.environ.get('TILE_WORKERS', 0))  # Threads running tile batches concurrently (0 = calling thread)
+TILE_REGION = None  # (x1, y1, x2, y2) as fractions of the frame; tiles outside it are skipped (None = whole frame)
+TILE_MOTION_THRESHOLD = 0.002  # Fraction of changed pixels below which a tile reuses its last detections
+TILE_MAX_SKIP = 10  # Frames a static tile may reuse its detections before it runs again
 
 # License plate recognition settings
 MIN_PLATE_CONFIDENCE = 0.4  # Minimum confidence for license plate recognition
 
 # Lane intrusion detection settings
 MIN_VEHICLE_CONFIDENCE = 0.5  # Minimum confidence for vehicle detection
+LANE_TRACKER = os.environ.get('LANE_TRACKER', 'kalman')  # Tracker backend: 'kalman' (motion model) or 'iou' (frame-to-frame)
+TRACK_HISTORY_LENGTH = 30  # Positions kept per track (drawing uses the last 10)
+TRACK_EXPIRY_FRAMES = 30  # Processed frames without a sighting before a track's history is dropped
+MAX_TRACKED_OBJECTS = 1000  # Tracks kept per detector; the least recently seen are dropped first
+INTRUSION_LOG_SIZE = 1000  # Intrusion events kept per detector
+TRACK_SPILL_PATH = os.environ.get('TRACK_SPILL_PATH')  # JSON lines file for expired tracks and old intrusions (unset = discard)
+DEFAULT_LANE_COUNT = 3  # Lanes between the road edges when no inner lane markings are found
+LANE_MAX_BOUNDARIES = 8  # Maximum lane boundary lines kept by automatic lane detection
+LANE_BOUNDARY_GAP = 0.05  # Gap (fraction of the width) between bottom crossings that separates two boundaries
+LANE_MIN_BOUNDARY_SUPPORT = 0.2  # Minimum weighted segment length of a boundary, as a fraction of the height
+LANE_FIT_RESIDUAL_SCALE = 10.0  # Residual (pixels) at which a segment's weight is halved in the robust fit
+LANE_MASK_SCALE = 4  # Downsampling factor of the lane label mask used for lane lookup
+LANE_OVERLAY_FILL_ALPHA = 0.0  # Opacity of the lane fill in annotated frames (0 = outlines only)
+LANE_CACHE_PATH = os.environ.get('LANE_CACHE_PATH', os.path.join(BASE_DIR, 'data', 'lane_geometry.json'))  # Lane geometry per camera ('' = disabled)
+LANE_DRIFT_CHECK_INTERVAL = 50  # Frames between checks whether the camera view has shifted
+LANE_DRIFT_THRESHOLD = 0.5  # Edge similarity below which lanes are re-estimated
+LANE_REESTIMATE_INTERVAL = 600  # Seconds after which lanes are re-estimated anyway
+
+# Video processing settings
+FRAME_SAMPLING_POLICY = os.environ.get('FRAME_SAMPLING_POLICY', 'frames')  # 'frames', 'time', 'keyframe' or 'motion'
+FRAME_SAMPLING_INTERVAL = 10  # Process every n-th frame ('frames' and 'keyframe' policies)
+FRAME_SAMPLING_INTERVAL_MS = 400  # Process one frame per interval of video time ('time' policy)
+# Keyframe spacing in frames (None = read from the video, or one second where the backend can't tell).
+# 'keyframe' sampling only skips decoding whole GOPs, so it saves most with an interval that is a multiple of it
+FRAME_SAMPLING_KEYFRAME_INTERVAL = None
+MOTION_MIN_INTERVAL = 2  # Fastest sampling interval under motion ('motion' policy)
+MOTION_MAX_INTERVAL = 30  # Slowest sampling interval on static scenes ('motion' policy)
+MOTION_THRESHOLD = 0.01  # Fraction of changed pixels that counts as motion
+VIDEO_JOB_WORKERS = int(os.environ.get('VIDEO_JOB_WORKERS', 2))  # Worker threads for background video jobs
+JOB_RESULT_WINDOW = 200  # Most recent frame results a video job keeps in memory for polling and streaming
+JOB_PERSIST_INTERVAL = 2.0  # Seconds between progress writes of a video job to the database
+JOB_PERSIST_EVERY_FRAMES = 50  # Processed frames after which progress is written anyway
+VIDEO_PARALLEL_WORKERS = int(os.environ.get('VIDEO_PARALLEL_WORKERS', 0))  # Processes per video in chunked mode (0 = sequential)
+# Have the web UI stream job results instead of polling. A stream holds its server worker for the
+# whole job, so only enable this with a threaded or gevent gunicorn worker class (e.g. --threads 8)
+VIDEO_STREAM_RESULTS = os.environ.get('VIDEO_STREAM_RESULTS', 'false').lower() == 'true'
+
+# Default realtime response mode: 'overlay' (client draws the boxes) or 'image' (server returns an annotated JPEG)
+REALTIME_RESPONSE_MODE = os.environ.get('REALTIME_RESPONSE_MODE', 'overlay')
+
+# Tracker pool settings (one lane intrusion tracker per realtime session or video job)
+TRACKER_POOL_MAX_TRACKERS = int(os.environ.get('TRACKER_POOL_MAX_TRACKERS', 256))  # Trackers kept before LRU eviction
+TRACKER_POOL_IDLE_TIMEOUT = 300  # Seconds before an unused tracker is dropped
+TRACKER_POOL_MAX_BYTES = 64 * 1024 * 1024  # Approximate memory cap over all trackers
 
 # Flask settings
 DEBUG = True
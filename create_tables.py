@@ -20,10 +20,28 @@ try:
             filename VARCHAR(255) NOT NULL,
             detection_type VARCHAR(50) NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            result_path VARCHAR(255)
+            result_path VARCHAR(255),
+            job_id VARCHAR(32),
+            status VARCHAR(20),
+            progress INTEGER DEFAULT 0,
+            processed_frames INTEGER DEFAULT 0,
+            total_frames INTEGER DEFAULT 0,
+            error_message TEXT
         )
     """)
     
+    # Add job state columns to tables created before background processing existed
+    cur.execute("""
+        ALTER TABLE detection_result
+            ADD COLUMN IF NOT EXISTS job_id VARCHAR(32),
+            ADD COLUMN IF NOT EXISTS status VARCHAR(20),
+            ADD COLUMN IF NOT EXISTS progress INTEGER DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS processed_frames INTEGER DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS total_frames INTEGER DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS error_message TEXT
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS ix_detection_result_job_id ON detection_result (job_id)")
+    
     # Create the detection_item table
     cur.execute("""
         CREATE TABLE IF NOT EXISTS detection_item (
@@ -0,0 +1,134 @@
+import logging
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class FrameContext:
+    __slots__ = ('image', 'factors', '_gray', '_blurred', '_edges', '_resized', '_scaled')
+
+    def __init__(self, image: np.ndarray, factors: Tuple[float, float] = (1.0, 1.0)):
+        """
+        Derived views of one frame, computed on first use and shared by all detectors
+
+        Create one context per frame and pass it to every stage, so the grey
+        image, blurred image, edge maps and downscaled copies are each computed
+        once. The returned arrays are shared: treat them as read-only.
+
+        Args:
+            image: BGR (or already grey) frame
+            factors: (x, y) size of one pixel of image in original frame pixels;
+                set by scaled() for reduced-resolution contexts
+        """
+        self.image = image
+        self.factors = factors
+        self._gray = None
+        self._blurred: Dict[int, np.ndarray] = {}
+        self._edges: Dict[Tuple[int, int, int], np.ndarray] = {}
+        self._resized: Dict[Tuple[int, int], np.ndarray] = {}
+        self._scaled: Dict[int, 'FrameContext'] = {}
+
+    @classmethod
+    def of(cls, image: np.ndarray, context: Optional['FrameContext'] = None) -> 'FrameContext':
+        """Return the given context, or a new one for the image when called without one"""
+        if context is not None and context.image is image:
+            return context
+        return cls(image)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.image.shape
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Grey-level frame"""
+        if self._gray is None:
+            if self.image.ndim == 3:
+                self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+            else:
+                self._gray = self.image
+        return self._gray
+
+    def blurred(self, ksize: int = 5) -> np.ndarray:
+        """Grey-level frame smoothed with a ksize x ksize Gaussian"""
+        blurred = self._blurred.get(ksize)
+        if blurred is None:
+            blurred = cv2.GaussianBlur(self.gray, (ksize, ksize), 0)
+            self._blurred[ksize] = blurred
+        return blurred
+
+    def edges(self, low: int = 50, high: int = 150, blur: int = 5) -> np.ndarray:
+        """
+        Canny edge map of the frame
+
+        Args:
+            low: Lower hysteresis threshold
+            high: Upper hysteresis threshold
+            blur: Gaussian kernel size applied first (0 = edges of the unblurred grey frame)
+        """
+        key = (low, high, blur)
+        edges = self._edges.get(key)
+        if edges is None:
+            source = self.blurred(blur) if blur else self.gray
+            edges = cv2.Canny(source, low, high)
+            self._edges[key] = edges
+        return edges
+
+    def resized(self, size: Tuple[int, int]) -> np.ndarray:
+        """Grey-level frame resized to size (width, height) with area interpolation"""
+        resized = self._resized.get(size)
+        if resized is None:
+            resized = cv2.resize(self.gray, size, interpolation=cv2.INTER_AREA)
+            self._resized[size] = resized
+        return resized
+
+    @property
+    def scale(self) -> float:
+        """Size of this context's image relative to the original frame (1.0 = full resolution)"""
+        return 1.0 / max(self.factors)
+
+    def scaled(self, max_side: Optional[int]) -> 'FrameContext':
+        """
+        Context of the frame downscaled so its longest side is at most max_side
+
+        This is the inference-resolution policy: a stage runs on the scaled
+        context and maps its coordinates back with to_original. Frames that
+        are already small enough (or max_side None/0) return this context.
+
+        Args:
+            max_side: Longest side in pixels of the stage's working resolution
+
+        Returns:
+            FrameContext of the downscaled frame (memoized per max_side)
+        """
+        h, w = self.image.shape[:2]
+        if not max_side or max(h, w) <= max_side:
+            return self
+
+        scaled = self._scaled.get(max_side)
+        if scaled is None:
+            ratio = max_side / max(h, w)
+            size = (max(1, int(round(w * ratio))), max(1, int(round(h * ratio))))
+            factors = (self.factors[0] * w / size[0], self.factors[1] * h / size[1])
+            # Resize the colour frame unless the full-size grey frame exists anyway,
+            # so a 4K frame is never converted to grey at full size just for this
+            source = self._gray if self._gray is not None else self.image
+            scaled = FrameContext(cv2.resize(source, size, interpolation=cv2.INTER_AREA), factors)
+            self._scaled[max_side] = scaled
+        return scaled
+
+    def to_original(self, coords) -> np.ndarray:
+        """
+        Map coordinates of this context's image to original frame pixels
+
+        Args:
+            coords: Array whose last axis holds (x, y) pairs, e.g. boxes (N, 4)
+                as (x1, y1, x2, y2) or polygon points (N, 2)
+
+        Returns:
+            Float array of the same shape in original frame coordinates
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        return coords * np.tile(self.factors, coords.shape[-1] // 2)
@@ -0,0 +1,197 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ONNX Runtime is optional: the OpenCV DNN backend only needs opencv-python
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float = 0.45) -> np.ndarray:
+    """
+    Greedy non-maximum suppression
+
+    Args:
+        boxes: Array (N, 4) of (x1, y1, x2, y2) boxes
+        scores: Array (N,) of confidences
+        iou_threshold: Overlap above which the lower scoring box is dropped
+
+    Returns:
+        Indices of the kept boxes, highest score first
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes.T
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(-scores, kind='stable')
+
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+
+        # Overlap of the best box with all remaining ones in one step
+        w = np.maximum(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0)
+        h = np.maximum(np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0)
+        inter = w * h
+        iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+def batched_nms(boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray,
+                iou_threshold: float = 0.45) -> np.ndarray:
+    """Class-aware NMS: boxes of different classes never suppress each other"""
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Shift each class into its own coordinate range so one NMS pass handles all classes
+    offsets = class_ids.astype(np.float32)[:, None] * (boxes.max() + 1)
+    return nms(boxes + offsets, scores, iou_threshold)
+
+def decode_yolov8(output: np.ndarray, class_ids: Sequence[int], conf_threshold: float,
+                  iou_threshold: float = 0.45) -> List[Dict[str, np.ndarray]]:
+    """
+    Decode raw YOLOv8 detection output
+
+    Args:
+        output: Array (N, 4 + num_classes, num_anchors) of (cx, cy, w, h, class scores...)
+        class_ids: Classes to keep; the other class columns are never looked at
+        conf_threshold: Minimum class score
+        iou_threshold: IoU threshold of the class-aware NMS
+
+    Returns:
+        One dict per image with 'boxes' (M, 4) in network input pixels,
+        'scores' (M,) and 'class_ids' (M,)
+    """
+    class_ids = np.asarray(class_ids)
+    decoded = []
+
+    for prediction in output:
+        # Only the classes of interest, as (num_anchors, len(class_ids))
+        class_scores = prediction[4 + class_ids].T
+        best = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(best)), best]
+
+        candidates = scores >= conf_threshold
+        cx, cy, w, h = prediction[:4, candidates]
+        boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        scores = scores[candidates]
+        labels = class_ids[best[candidates]]
+
+        keep = batched_nms(boxes, scores, labels, iou_threshold)
+        decoded.append({'boxes': boxes[keep], 'scores': scores[keep], 'class_ids': labels[keep]})
+
+    return decoded
+
+class OnnxRuntimeBackend:
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        """
+        Run an ONNX model with ONNX Runtime on the CPU
+
+        Args:
+            model_path: Path to the .onnx file
+            intra_op_threads: Threads used inside one operator (0 = runtime default)
+            inter_op_threads: Threads used across independent operators; > 0 switches to
+                parallel execution (0 = sequential execution)
+        """
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is not installed")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads > 0:
+            # Inter-op threads are only used by the parallel executor; the default
+            # sequential mode runs one operator at a time and ignores the setting
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+            options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+
+        # Models exported with a fixed batch dimension are run one frame at a time
+        batch_dim = model_input.shape[0]
+        self.max_batch = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        """Run a (N, 3, H, W) float32 batch and return the first model output"""
+        step = self.max_batch or len(tensor)
+        outputs = [self.session.run(None, {self.input_name: tensor[i:i + step]})[0]
+                   for i in range(0, len(tensor), step)]
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+class OpenCVDNNBackend:
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        """
+        Run an ONNX model with the OpenCV DNN module on the CPU
+
+        Args:
+            model_path: Path to the .onnx file
+            intra_op_threads: Threads of OpenCV's parallel loops (0 = OpenCV default)
+            inter_op_threads: Unused; OpenCV DNN runs layers one after another
+        """
+        if intra_op_threads:
+            # Process-wide setting: also applies to resize, Canny etc.
+            cv2.setNumThreads(intra_op_threads)
+
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.max_batch = None  # Set to 1 once the graph turns out to have a fixed batch size
+        self._lock = threading.Lock()  # A cv2.dnn.Net must not run on two threads at once
+
+    def _forward(self, tensor: np.ndarray) -> np.ndarray:
+        self.net.setInput(tensor)
+        return self.net.forward()
+
+    def run(self, tensor: np.ndarray) -> np.ndarray:
+        """Run a (N, 3, H, W) float32 batch and return the model output"""
+        with self._lock:
+            return self._run(tensor)
+
+    def _run(self, tensor: np.ndarray) -> np.ndarray:
+        if self.max_batch is None and len(tensor) > 1:
+            try:
+                return self._forward(tensor)
+            except cv2.error:
+                logger.info("ONNX graph has a fixed batch size, running frames one by one")
+                self.max_batch = 1
+
+        if len(tensor) == 1:
+            return self._forward(tensor)
+        return np.concatenate([self._forward(tensor[i:i + 1]) for i in range(len(tensor))])
+
+# Inference backends by name; 'demo' is the model-free placeholder detector
+BACKENDS = {
+    'onnxruntime': OnnxRuntimeBackend,
+    'opencv': OpenCVDNNBackend
+}
+
+def create_backend(name: str, model_path: str, **kwargs):
+    """
+    Create an inference backend by name
+
+    Args:
+        name: 'onnxruntime' or 'opencv'
+        model_path: Path to the .onnx file
+        **kwargs: Passed to the backend constructor
+
+    Returns:
+        Backend instance with a run(tensor) -> output method
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {name}")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+    return BACKENDS[name](model_path, **kwargs)
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+from detection.frame_context import FrameContext
+
+logger = logging.getLogger(__name__)
+
+# Resolution of the edge signature used to detect camera movement
+SIGNATURE_SIZE = (64, 36)
+
+def edge_signature(image, context: Optional[FrameContext] = None) -> np.ndarray:
+    """
+    Compute a small binary edge map that summarises the static structure of a view
+
+    Args:
+        image: BGR image
+        context: FrameContext of the image, to reuse its downscaled copy
+
+    Returns:
+        Boolean array of shape SIGNATURE_SIZE[::-1]
+    """
+    # Shrink from the lane inference resolution, never from a full-resolution grey frame
+    scaled = FrameContext.of(image, context).scaled(config.INFERENCE_MAX_SIDE_LANES)
+    small = scaled.resized(SIGNATURE_SIZE)
+    edges = cv2.Canny(small, 50, 150)
+
+    # Dilate so small shifts from vibration do not count as a new view
+    return cv2.dilate(edges, np.ones((3, 3), np.uint8)) > 0
+
+def signature_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Intersection over union of two edge signatures (1.0 = same view)"""
+    union = np.count_nonzero(a | b)
+    if union == 0:
+        return 1.0
+    return np.count_nonzero(a & b) / union
+
+def _pack_signature(signature: np.ndarray) -> str:
+    return np.packbits(signature).tobytes().hex()
+
+def _unpack_signature(packed: str) -> np.ndarray:
+    bits = np.unpackbits(np.frombuffer(bytes.fromhex(packed), dtype=np.uint8))
+    count = SIGNATURE_SIZE[0] * SIGNATURE_SIZE[1]
+    return bits[:count].astype(bool).reshape(SIGNATURE_SIZE[1], SIGNATURE_SIZE[0])
+
+class LaneGeometry:
+    __slots__ = ('lanes', 'signature', 'updated')
+
+    def __init__(self, lanes: List[np.ndarray], signature: Optional[np.ndarray], updated: float):
+        """
+        Lane polygons of one camera view
+
+        Args:
+            lanes: Lane polygons
+            signature: Edge signature of the frame the lanes were estimated on
+            updated: Time of the estimate (seconds since the epoch)
+        """
+        self.lanes = lanes
+        self.signature = signature
+        self.updated = updated
+
+class LaneGeometryCache:
+    def __init__(self, path: str):
+        """
+        Lane geometry per camera, persisted to a JSON file
+
+        Entries are keyed by source id and resolution, so a camera that changes
+        its resolution gets its lanes estimated again.
+
+        Args:
+            path: JSON file the cache is loaded from and saved to
+        """
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def make_key(source_id: str, frame_shape: Tuple[int, ...]) -> str:
+        h, w = frame_shape[:2]
+        return f"{source_id}:{w}x{h}"
+
+    def load(self):
+        """Load the cache file, if it exists"""
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+            entries = {}
+            for key, entry in data.items():
+                lanes = [np.array(lane, dtype=np.int32) for lane in entry['lanes']]
+                signature = _unpack_signature(entry['signature']) if entry.get('signature') else None
+                entries[key] = LaneGeometry(lanes, signature, entry.get('updated', 0))
+
+            with self._lock:
+                self._entries = entries
+            logger.info(f"Loaded lane geometry for {len(entries)} camera views from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading lane geometry cache {self.path}: {e}")
+
+    def save(self):
+        """Write the cache file atomically"""
+        with self._lock:
+            data = {
+                key: {
+                    'lanes': [np.asarray(lane).tolist() for lane in entry.lanes],
+                    'signature': _pack_signature(entry.signature) if entry.signature is not None else None,
+                    'updated': entry.updated
+                }
+                for key, entry in self._entries.items()
+            }
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving lane geometry cache {self.path}: {e}")
+
+    def get(self, source_id: str, frame_shape: Tuple[int, ...]) -> Optional[LaneGeometry]:
+        with self._lock:
+            return self._entries.get(self.make_key(source_id, frame_shape))
+
+    def put(self, source_id: str, frame_shape: Tuple[int, ...], geometry: LaneGeometry):
+        """Store the lanes of a camera view and persist the cache"""
+        with self._lock:
+            self._entries[self.make_key(source_id, frame_shape)] = geometry
+        self.save()
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> Optional[LaneGeometryCache]:
+    """Return the process-wide cache at config.LANE_CACHE_PATH (None if disabled)"""
+    global _default_cache
+    if not config.LANE_CACHE_PATH:
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LaneGeometryCache(config.LANE_CACHE_PATH)
+        return _default_cache
+
+# Re-estimation runs off the frame path, one at a time, at low priority
+_estimator = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lane-estimator')
+
+def submit_estimate(estimate_fn, image) -> Any:
+    """
+    Estimate lanes for an image in the background
+
+    Args:
+        estimate_fn: Function (image, context=FrameContext) -> lane polygons
+        image: Frame to estimate on (copied, so the caller may reuse its buffer)
+
+    Returns:
+        Future resolving to a LaneGeometry
+    """
+    image = image.copy()
+
+    def run():
+        # One context for both, so the frame is converted to grey only once
+        context = FrameContext(image)
+        return LaneGeometry(estimate_fn(image, context=context), edge_signature(image, context), time.time())
+
+    return _estimator.submit(run)
@@ -2,147 +2,423 @@ import cv2
 import numpy as np
 import logging
 import time
+from collections import OrderedDict, deque
+
+import config
+from detection.frame_context import FrameContext
+from detection.tracking import TrackHistory, create_tracker, create_spill
+from detection.lane_geometry import LaneGeometry, edge_signature, signature_similarity, get_default_cache, submit_estimate
 
 logger = logging.getLogger(__name__)
 
+def fit_lane_boundaries(lines, h, w, residual_scale=None):
+    """
+    Cluster Hough segments into lane boundary lines
+    
+    Segments are parametrised as x = a*y + b, grouped by where they cross the
+    bottom of the image, and each group is fitted with a length-weighted,
+    outlier-robust least squares line. Everything runs on the whole (N, 1, 4)
+    segment array at once.
+    
+    Args:
+        lines: Output of cv2.HoughLinesP, shape (N, 1, 4)
+        h: Image height
+        w: Image width
+        residual_scale: Residual (pixels) at which a segment's weight is halved
+            (defaults to LANE_FIT_RESIDUAL_SCALE, which is in full-resolution pixels)
+        
+    Returns:
+        List of (x at the bottom, x at the top) per boundary, sorted left to right
+    """
+    segments = np.asarray(lines, dtype=np.float64).reshape(-1, 4)
+    x1, y1, x2, y2 = segments.T
+    dx, dy = x2 - x1, y2 - y1
+    
+    # Drop near-horizontal segments (|dy/dx| < 0.3), which are not lane markings
+    steep = np.abs(dy) >= 0.3 * np.abs(dx)
+    steep &= dy != 0
+    if not steep.any():
+        return []
+    x1, y1, x2, y2, dx, dy = (v[steep] for v in (x1, y1, x2, y2, dx, dy))
+    
+    length = np.hypot(dx, dy)
+    slope = dx / dy  # dx per unit of y
+    x_bottom = x1 + slope * (h - y1)
+    
+    # 1-D clustering of the bottom crossings: a gap wider than the threshold starts a new boundary
+    order = np.argsort(x_bottom)
+    gaps = np.diff(x_bottom[order]) > config.LANE_BOUNDARY_GAP * w
+    labels = np.empty(len(order), dtype=np.intp)
+    labels[order] = np.concatenate([[0], np.cumsum(gaps)])
+    count = labels.max() + 1
+    
+    # Each segment contributes both endpoints, weighted by its length
+    xs = np.concatenate([x1, x2])
+    ys = np.concatenate([y1, y2])
+    point_labels = np.concatenate([labels, labels])
+    weights = np.concatenate([length, length])
+    
+    def fit(weights):
+        sw = np.bincount(point_labels, weights, count)
+        swy = np.bincount(point_labels, weights * ys, count)
+        swx = np.bincount(point_labels, weights * xs, count)
+        swyy = np.bincount(point_labels, weights * ys * ys, count)
+        swxy = np.bincount(point_labels, weights * xs * ys, count)
+        denominator = sw * swyy - swy * swy
+        a = np.divide(sw * swxy - swy * swx, denominator, out=np.zeros(count), where=np.abs(denominator) > 1e-9)
+        b = (swx - a * swy) / np.maximum(sw, 1e-9)
+        return a, b, sw
+    
+    a, b, _ = fit(weights)
+    
+    # One Cauchy reweighting step to suppress segments that do not belong to the boundary
+    residuals = xs - (a[point_labels] * ys + b[point_labels])
+    residual_scale = residual_scale or config.LANE_FIT_RESIDUAL_SCALE
+    a, b, support = fit(weights / (1 + (residuals / residual_scale) ** 2))
+    
+    # Keep boundaries with enough total segment length, at most LANE_MAX_BOUNDARIES of them
+    keep = np.flatnonzero(support >= config.LANE_MIN_BOUNDARY_SUPPORT * h)
+    keep = keep[np.argsort(-support[keep])][:config.LANE_MAX_BOUNDARIES]
+    
+    bottoms = a[keep] * h + b[keep]
+    tops = b[keep]
+    order = np.argsort(bottoms)
+    return [(float(bottoms[i]), float(tops[i])) for i in order]
+
+def estimate_lanes(image, method='auto', context=None):
+    """
+    Estimate lane regions in an image
+    
+    Args:
+        image: Input image
+        method: 'auto' for automatic detection, 'manual' for predefined lanes
+        context: FrameContext of the image, to reuse its edge map
+        
+    Returns:
+        List of lane polygons
+    """
+    h, w = image.shape[:2]
+    
+    if method == 'auto':
+        try:
+            # Lines are found at the lane inference resolution; pixel lengths scale with it
+            scaled = FrameContext.of(image, context).scaled(config.INFERENCE_MAX_SIDE_LANES)
+            scale = scaled.scale
+            scaled_h, scaled_w = scaled.shape[:2]
+            
+            # Canny edges of the blurred grey frame (shared with other stages)
+            edges = scaled.edges(50, 150, blur=5)
+            
+            # Apply Hough line transform
+            lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=max(1, int(50 * scale)),
+                                    minLineLength=100 * scale, maxLineGap=50 * scale)
+            
+            if lines is None:
+                logger.warning("No lines detected in the image, using manual method")
+                return estimate_lanes(image, 'manual')
+            
+            boundaries = fit_lane_boundaries(lines, scaled_h, scaled_w,
+                                             residual_scale=config.LANE_FIT_RESIDUAL_SCALE * scale)
+            
+            if len(boundaries) < 2:
+                logger.warning("Insufficient lane lines detected, using manual method")
+                return estimate_lanes(image, 'manual')
+            
+            # Only the road edges were found: split the road evenly, as before
+            if len(boundaries) == 2:
+                (bottom_left, top_left), (bottom_right, top_right) = boundaries
+                count = config.DEFAULT_LANE_COUNT
+                steps = np.arange(count + 1) / count
+                boundaries = list(zip(bottom_left + steps * (bottom_right - bottom_left),
+                                      top_left + steps * (top_right - top_left)))
+            
+            # One lane between each pair of neighbouring boundaries, mapped back to the full frame
+            lane_regions = [
+                np.rint(scaled.to_original([
+                    [bottom_a, scaled_h],
+                    [bottom_b, scaled_h],
+                    [top_b, 0],
+                    [top_a, 0]
+                ])).astype(np.int32)
+                for (bottom_a, top_a), (bottom_b, top_b) in zip(boundaries, boundaries[1:])
+            ]
+            
+            return lane_regions
+        
+        except Exception as e:
+            logger.error(f"Error in automatic lane detection: {e}")
+            logger.warning("Falling back to manual lane definition")
+            return estimate_lanes(image, 'manual')
+    
+    else:  # manual method
+        # Define simple lanes dividing the image into 3 vertical sections
+        lane_width = w // 3
+        
+        lane_regions = [
+            np.array([[0, h], [lane_width, h], [lane_width, 0], [0, 0]], dtype=np.int32),
+            np.array([[lane_width, h], [2*lane_width, h], [2*lane_width, 0], [lane_width, 0]], dtype=np.int32),
+            np.array([[2*lane_width, h], [w, h], [w, 0], [2*lane_width, 0]], dtype=np.int32)
+        ]
+        
+        return lane_regions
+
 class LaneIntrusionDetector:
-    def __init__(self):
-        """Initialize lane intrusion detector"""
+    # Default BGR colors of the lanes in annotated frames
+    LANE_COLORS = [
+        (0, 255, 0),    # Green
+        (0, 255, 255),  # Yellow
+        (0, 0, 255)     # Red
+    ]
+    
+    def __init__(self, tracker=None, spill=None, source_id=None, lane_cache=None):
+        """
+        Initialize lane intrusion detector
+        
+        Track history and the intrusion log are bounded (see TRACK_* and
+        INTRUSION_LOG_SIZE in config.py), so long-running feeds do not grow
+        without limit.
+        
+        Args:
+            tracker: Tracker backend name ('iou' or 'kalman') or tracker instance;
+                defaults to config.LANE_TRACKER
+            spill: Optional TrackSpill that receives expired tracks and intrusion
+                events dropped from the log; defaults to config.TRACK_SPILL_PATH
+            source_id: Camera or source identifier; lanes of known sources are
+                loaded from the lane geometry cache instead of being estimated
+            lane_cache: LaneGeometryCache to use; defaults to config.LANE_CACHE_PATH
+        """
+        if tracker is None or isinstance(tracker, str):
+            tracker = create_tracker(tracker or config.LANE_TRACKER)
+        self.tracker = tracker  # Assigns track IDs to the vehicles of each frame
+        self.spill = spill if spill is not None else create_spill(config.TRACK_SPILL_PATH)
         self.prev_detections = []
-        self.detection_history = {}  # Vehicle tracking history
-        self.next_id = 1  # ID counter for tracked vehicles
-        self.lane_regions = []  # List of lane polygons
-        self.intrusion_log = []  # Log of intrusion events
+        self.detection_history = OrderedDict()  # Vehicle ID -> TrackHistory, least recently seen first
+        self.frame_index = 0  # Number of frames tracked so far
+        self.lane_regions = []  # List of lane polygons (setting new ones invalidates the lane mask and recorded lane indices)
+        self.intrusion_log = deque(maxlen=config.INTRUSION_LOG_SIZE)  # Most recent intrusion events
+        self.source_id = source_id
+        self.lane_cache = lane_cache if lane_cache is not None else get_default_cache()
+        # Edge signature of the view the lanes were estimated on and the time of
+        # the estimate (both None for lanes set from outside)
+        self._lane_signature = None
+        self._lanes_updated = None
+        self._frames_since_drift_check = 0
+        self._pending_estimate = None  # Background re-estimation in progress
+    
+    @property
+    def lane_regions(self):
+        return self._lane_regions
+    
+    @lane_regions.setter
+    def lane_regions(self, lanes):
+        previous = getattr(self, '_lane_regions', None)
+        changed = previous is None or not self._same_lanes(previous, lanes)
+        self._lane_regions = lanes
+        self._lane_signature = None  # Lanes set from outside have no signature; see _apply_geometry
+        self._lanes_updated = None
+        if not changed:
+            return
+        
+        self._lane_mask = None  # Rebuilt for the new lanes on the next frame
+        self._mask_shape = None
+        self._lane_integrals = None
+        self._lane_overlay = None  # Cached lane drawing, see build_lane_overlay
+        
+        # Lane indices recorded under the old lanes mean nothing under the new ones
+        # (a re-estimate can add, drop or reorder lanes), so lane changes are only
+        # compared within one geometry
+        for history in self.detection_history.values():
+            history.forget_lanes()
+    
+    @staticmethod
+    def _same_lanes(lanes_a, lanes_b):
+        return len(lanes_a) == len(lanes_b) and all(np.array_equal(a, b) for a, b in zip(lanes_a, lanes_b))
+    
+    @property
+    def lane_mask_nbytes(self):
+        """Memory held by the lane mask and its integral images"""
+        if self._lane_mask is None:
+            return 0
+        return self._lane_mask.nbytes + (self._lane_integrals.nbytes if self._lane_integrals is not None else 0)
+    
+    @property
+    def lane_overlay_nbytes(self):
+        """Memory held by the cached lane overlay and its blend buffer"""
+        if self._lane_overlay is None:
+            return 0
+        return sum(value.nbytes for value in self._lane_overlay.values() if isinstance(value, np.ndarray))
+    
+    def build_lane_mask(self, frame_shape):
+        """
+        Rasterize the lanes into a label mask for vectorized lane lookup
+        
+        Each mask pixel holds the index of the lane covering it (255 = no lane),
+        at 1/LANE_MASK_SCALE of the frame resolution. Per-lane integral images are
+        built alongside so box footprint occupancy is O(1) per box and lane.
+        
+        Args:
+            frame_shape: (height, width) of the frames the lanes belong to
+        """
+        h, w = frame_shape[:2]
+        scale = config.LANE_MASK_SCALE
+        mask = np.full((-(-h // scale), -(-w // scale)), 255, dtype=np.uint8)
+        
+        # Fill in reverse so that, like the polygon test, the lowest lane index wins overlaps
+        for i in reversed(range(len(self.lane_regions))):
+            lane = np.round(self.lane_regions[i] / scale).astype(np.int32)
+            cv2.fillPoly(mask, [lane], i)
+        
+        self._lane_mask = mask
+        self._mask_shape = (h, w)
+        self._lane_integrals = np.stack([cv2.integral((mask == i).astype(np.uint8))
+                                         for i in range(len(self.lane_regions))]) if self.lane_regions else None
+    
+    def _mask_coords(self, xs, ys):
+        """Map frame coordinates to (clipped) lane mask indices"""
+        scale = config.LANE_MASK_SCALE
+        mask_h, mask_w = self._lane_mask.shape
+        cols = np.clip(np.asarray(xs) // scale, 0, mask_w - 1).astype(np.intp)
+        rows = np.clip(np.asarray(ys) // scale, 0, mask_h - 1).astype(np.intp)
+        return rows, cols
+    
+    def assign_vehicles_to_lanes(self, vehicle_bboxes):
+        """
+        Determine the lane of every vehicle at once from the lane mask
+        
+        Args:
+            vehicle_bboxes: List of vehicle bounding boxes (x1, y1, x2, y2)
+            
+        Returns:
+            List of lane indices (-1 if not in any lane)
+        """
+        if self._lane_mask is None or not len(vehicle_bboxes):
+            return [self.assign_vehicle_to_lane(bbox) for bbox in vehicle_bboxes]
+        
+        boxes = np.asarray(vehicle_bboxes, dtype=np.int64).reshape(-1, 4)
+        
+        # Bottom center point of each vehicle
+        rows, cols = self._mask_coords(boxes[:, 0] + (boxes[:, 2] - boxes[:, 0]) // 2, boxes[:, 3])
+        labels = self._lane_mask[rows, cols].astype(np.int64)
+        labels[labels == 255] = -1
+        return labels.tolist()
     
-    def define_lanes(self, image, method='auto'):
+    def lane_occupancy(self, vehicle_bboxes):
+        """
+        Calculate which fraction of each vehicle's box footprint lies in each lane
+        
+        Args:
+            vehicle_bboxes: List of vehicle bounding boxes (x1, y1, x2, y2)
+            
+        Returns:
+            N x L array of fractions (rows sum to at most 1), or None without a lane mask
+        """
+        if self._lane_integrals is None or not len(vehicle_bboxes):
+            return None
+        
+        boxes = np.asarray(vehicle_bboxes, dtype=np.int64).reshape(-1, 4)
+        top, left = self._mask_coords(boxes[:, 0], boxes[:, 1])
+        bottom, right = self._mask_coords(boxes[:, 2], boxes[:, 3])
+        bottom, right = bottom + 1, right + 1  # Integral images are exclusive at the far edge
+        
+        integrals = self._lane_integrals
+        counts = (integrals[:, bottom, right] - integrals[:, top, right]
+                  - integrals[:, bottom, left] + integrals[:, top, left])
+        areas = (bottom - top) * (right - left)
+        return (counts / np.maximum(areas, 1)).T
+    
+    def define_lanes(self, image, method='auto', context=None):
         """
         Define lane regions in the image
         
         Args:
             image: Input image
             method: 'auto' for automatic detection, 'manual' for predefined lanes
+            context: FrameContext of the image
             
         Returns:
             List of lane polygons
         """
-        h, w = image.shape[:2]
+        self.lane_regions = estimate_lanes(image, method, context)
+        return self.lane_regions
+    
+    def load_or_define_lanes(self, image, context=None):
+        """
+        Use the cached lanes of this source, or estimate and cache them
         
-        if method == 'auto':
-            try:
-                # Convert to grayscale
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                
-                # Apply Gaussian blur
-                blur = cv2.GaussianBlur(gray, (5, 5), 0)
-                
-                # Apply Canny edge detection
-                edges = cv2.Canny(blur, 50, 150)
-                
-                # Apply Hough line transform
-                lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=50, minLineLength=100, maxLineGap=50)
-                
-                if lines is None:
-                    logger.warning("No lines detected in the image, using manual method")
-                    return self.define_lanes(image, 'manual')
-                
-                # Group lines by slope (to separate left and right lane lines)
-                left_lines = []
-                right_lines = []
-                for line in lines:
-                    x1, y1, x2, y2 = line[0]
-                    if x2 - x1 == 0:  # Avoid division by zero
-                        continue
-                    
-                    slope = (y2 - y1) / (x2 - x1)
-                    
-                    # Filter out horizontal lines
-                    if abs(slope) < 0.3:
-                        continue
-                    
-                    if slope < 0:
-                        left_lines.append(line[0])
-                    else:
-                        right_lines.append(line[0])
-                
-                if not left_lines or not right_lines:
-                    logger.warning("Insufficient lane lines detected, using manual method")
-                    return self.define_lanes(image, 'manual')
-                
-                # Average left and right lines
-                def average_lines(lines):
-                    x1_sum, y1_sum, x2_sum, y2_sum = 0, 0, 0, 0
-                    for x1, y1, x2, y2 in lines:
-                        x1_sum += x1
-                        y1_sum += y1
-                        x2_sum += x2
-                        y2_sum += y2
-                    n = len(lines)
-                    return [int(x1_sum/n), int(y1_sum/n), int(x2_sum/n), int(y2_sum/n)]
-                
-                left_line = average_lines(left_lines)
-                right_line = average_lines(right_lines)
-                
-                # Create lane polygons from the lines
-                x1_left, y1_left, x2_left, y2_left = left_line
-                x1_right, y1_right, x2_right, y2_right = right_line
-                
-                # Extend lines to the bottom of the image
-                if y1_left != y2_left:
-                    slope_left = (x2_left - x1_left) / (y2_left - y1_left)
-                    x1_left_ext = int(x1_left + slope_left * (h - y1_left))
-                    x2_left_ext = int(x2_left + slope_left * (0 - y2_left))
-                else:
-                    x1_left_ext, x2_left_ext = x1_left, x2_left
-                
-                if y1_right != y2_right:
-                    slope_right = (x2_right - x1_right) / (y2_right - y1_right)
-                    x1_right_ext = int(x1_right + slope_right * (h - y1_right))
-                    x2_right_ext = int(x2_right + slope_right * (0 - y2_right))
-                else:
-                    x1_right_ext, x2_right_ext = x1_right, x2_right
-                
-                # Define lane regions (assuming 3 lanes for now)
-                lane_width = (x1_right_ext - x1_left_ext) // 3
-                
-                self.lane_regions = [
-                    np.array([
-                        [x1_left_ext, h],
-                        [x1_left_ext + lane_width, h],
-                        [x2_left_ext + lane_width, 0],
-                        [x2_left_ext, 0]
-                    ], dtype=np.int32),
-                    np.array([
-                        [x1_left_ext + lane_width, h],
-                        [x1_left_ext + 2*lane_width, h],
-                        [x2_left_ext + 2*lane_width, 0],
-                        [x2_left_ext + lane_width, 0]
-                    ], dtype=np.int32),
-                    np.array([
-                        [x1_left_ext + 2*lane_width, h],
-                        [x1_right_ext, h],
-                        [x2_right_ext, 0],
-                        [x2_left_ext + 2*lane_width, 0]
-                    ], dtype=np.int32)
-                ]
-                
-                return self.lane_regions
-            
-            except Exception as e:
-                logger.error(f"Error in automatic lane detection: {e}")
-                logger.warning("Falling back to manual lane definition")
-                return self.define_lanes(image, 'manual')
+        Args:
+            image: Current frame
+            context: FrameContext of the frame
+        """
+        cached = None
+        if self.lane_cache is not None and self.source_id:
+            cached = self.lane_cache.get(self.source_id, image.shape)
+        
+        if cached is not None:
+            self._apply_geometry(cached)
+            return
+        
+        context = FrameContext.of(image, context)
+        self.define_lanes(image, context=context)
+        geometry = LaneGeometry(self.lane_regions, edge_signature(image, context), time.time())
+        self._apply_geometry(geometry)
+        if self.lane_cache is not None and self.source_id:
+            self.lane_cache.put(self.source_id, image.shape, geometry)
+    
+    def _apply_geometry(self, geometry):
+        self.lane_regions = geometry.lanes
+        self._lane_signature = geometry.signature
+        self._lanes_updated = geometry.updated
+    
+    def update_lanes(self, image, context=None):
+        """
+        Re-estimate the lanes in the background when the view drifted or the estimate is old
         
-        else:  # manual method
-            # Define simple lanes dividing the image into 3 vertical sections
-            lane_width = w // 3
-            
-            self.lane_regions = [
-                np.array([[0, h], [lane_width, h], [lane_width, 0], [0, 0]], dtype=np.int32),
-                np.array([[lane_width, h], [2*lane_width, h], [2*lane_width, 0], [lane_width, 0]], dtype=np.int32),
-                np.array([[2*lane_width, h], [w, h], [w, 0], [2*lane_width, 0]], dtype=np.int32)
-            ]
+        Every LANE_DRIFT_CHECK_INTERVAL frames, the frame's edge signature is compared
+        with that of the frame the lanes were estimated on. A finished re-estimate
+        is applied at the start of the next frame. Lanes set from outside without
+        a source_id (e.g. shared by a parallel run) are kept as they are, so all
+        users of the shared lanes see the same geometry.
+        
+        Args:
+            image: Current frame
+            context: FrameContext of the frame
+        """
+        if self._lane_signature is None and not self.source_id:
+            return
+        
+        if self._pending_estimate is not None:
+            if not self._pending_estimate.done():
+                return
             
-            return self.lane_regions
+            try:
+                geometry = self._pending_estimate.result()
+                self._apply_geometry(geometry)
+                if self.lane_cache is not None and self.source_id:
+                    self.lane_cache.put(self.source_id, image.shape, geometry)
+            except Exception as e:
+                logger.error(f"Error re-estimating lanes: {e}")
+            self._pending_estimate = None
+            return
+        
+        self._frames_since_drift_check += 1
+        if self._frames_since_drift_check < config.LANE_DRIFT_CHECK_INTERVAL:
+            return
+        self._frames_since_drift_check = 0
+        
+        # Lanes set from outside for a known source have no signature yet
+        signature = edge_signature(image, context)
+        if self._lane_signature is None or self._lanes_updated is None:
+            self._lane_signature = signature
+            self._lanes_updated = time.time()
+            return
+        
+        similarity = signature_similarity(signature, self._lane_signature)
+        drifted = similarity < config.LANE_DRIFT_THRESHOLD
+        stale = time.time() - self._lanes_updated > config.LANE_REESTIMATE_INTERVAL
+        if drifted or stale:
+            if drifted:
+                logger.info(f"View of source {self.source_id} changed (edge similarity {similarity:.2f}), re-estimating lanes")
+            self._pending_estimate = submit_estimate(estimate_lanes, image)
     
     def assign_vehicle_to_lane(self, vehicle_bbox):
         """
@@ -169,121 +445,75 @@ class LaneIntrusionDetector:
         """
         Track vehicles across frames to detect lane changes
         
+        Track IDs come from the tracker backend (see detection/tracking.py).
+        
         Args:
             detections: List of vehicle detections with bounding boxes
             
         Returns:
             Updated detections with tracking IDs and lane assignments
         """
-        if not self.prev_detections:
-            # First frame, assign new IDs to all vehicles
-            for i, det in enumerate(detections):
-                vehicle_id = self.next_id
-                self.next_id += 1
-                
-                lane_idx = self.assign_vehicle_to_lane(det['bbox'])
-                
-                detections[i]['id'] = vehicle_id
-                detections[i]['lane'] = lane_idx
-                
-                # Initialize tracking history
-                self.detection_history[vehicle_id] = {
-                    'timestamps': [time.time()],
-                    'positions': [det['bbox']],
-                    'lanes': [lane_idx]
-                }
-            
-            self.prev_detections = detections
-            return detections
+        # Match current detections with existing tracks
+        track_ids = self.tracker.update([det['bbox'] for det in detections])
         
-        # Match current detections with previous ones based on IOU
         updated_detections = []
-        matched_prev_ids = set()
         
-        for det in detections:
-            best_match = None
-            best_iou = 0.3  # IOU threshold
-            
-            for prev_det in self.prev_detections:
-                if prev_det['id'] in matched_prev_ids:
-                    continue
-                
-                iou = self.calculate_iou(det['bbox'], prev_det['bbox'])
-                
-                if iou > best_iou:
-                    best_iou = iou
-                    best_match = prev_det
-            
-            if best_match:
-                # Match found, update track
-                vehicle_id = best_match['id']
-                matched_prev_ids.add(vehicle_id)
-                
-                lane_idx = self.assign_vehicle_to_lane(det['bbox'])
-                
-                det['id'] = vehicle_id
-                det['lane'] = lane_idx
-                
-                # Update tracking history
-                if vehicle_id in self.detection_history:
-                    self.detection_history[vehicle_id]['timestamps'].append(time.time())
-                    self.detection_history[vehicle_id]['positions'].append(det['bbox'])
-                    self.detection_history[vehicle_id]['lanes'].append(lane_idx)
-                else:
-                    # Shouldn't happen, but handle it anyway
-                    self.detection_history[vehicle_id] = {
-                        'timestamps': [time.time()],
-                        'positions': [det['bbox']],
-                        'lanes': [lane_idx]
-                    }
-            else:
-                # New vehicle
-                vehicle_id = self.next_id
-                self.next_id += 1
-                
-                lane_idx = self.assign_vehicle_to_lane(det['bbox'])
-                
-                det['id'] = vehicle_id
-                det['lane'] = lane_idx
-                
-                # Initialize tracking history
-                self.detection_history[vehicle_id] = {
-                    'timestamps': [time.time()],
-                    'positions': [det['bbox']],
-                    'lanes': [lane_idx]
-                }
+        bboxes = [det['bbox'] for det in detections]
+        lanes = self.assign_vehicles_to_lanes(bboxes)
+        occupancy = self.lane_occupancy(bboxes)
+        
+        for i, (det, vehicle_id, lane_idx) in enumerate(zip(detections, track_ids, lanes)):
+            if occupancy is not None:
+                det['lane_occupancy'] = [round(float(fraction), 3) for fraction in occupancy[i]]
             
+            det['id'] = vehicle_id
+            det['lane'] = lane_idx
             updated_detections.append(det)
         
-        self.prev_detections = updated_detections
+        self.record_tracks(updated_detections)
         return updated_detections
     
-    def calculate_iou(self, bbox1, bbox2):
-        """Calculate Intersection over Union for two bounding boxes"""
-        x1_1, y1_1, x2_1, y2_1 = bbox1
-        x1_2, y1_2, x2_2, y2_2 = bbox2
-        
-        # Calculate intersection area
-        x_left = max(x1_1, x1_2)
-        y_top = max(y1_1, y1_2)
-        x_right = min(x2_1, x2_2)
-        y_bottom = min(y2_1, y2_2)
-        
-        if x_right < x_left or y_bottom < y_top:
-            return 0.0
-        
-        intersection_area = (x_right - x_left) * (y_bottom - y_top)
-        
-        # Calculate union area
-        bbox1_area = (x2_1 - x1_1) * (y2_1 - y1_1)
-        bbox2_area = (x2_2 - x1_2) * (y2_2 - y1_2)
+    def record_tracks(self, tracked_vehicles):
+        """
+        Add one frame of tracked vehicles to the track history
         
-        union_area = bbox1_area + bbox2_area - intersection_area
+        Called by track_vehicles; also lets a detector that only renders follow
+        vehicles tracked elsewhere (e.g. stitched results of a parallel run).
         
-        # Calculate IOU
-        iou = intersection_area / union_area if union_area > 0 else 0
+        Args:
+            tracked_vehicles: Vehicles with 'id', 'bbox' and 'lane'
+        """
+        timestamp = time.time()
+        self.frame_index += 1
         
-        return iou
+        for vehicle in tracked_vehicles:
+            history = self.detection_history.get(vehicle['id'])
+            if history is None:
+                history = self.detection_history[vehicle['id']] = TrackHistory(config.TRACK_HISTORY_LENGTH)
+            history.add(timestamp, self.frame_index, vehicle['bbox'], vehicle['lane'])
+            self.detection_history.move_to_end(vehicle['id'])
+        
+        self.prev_detections = tracked_vehicles
+        self.expire_tracks()
+    
+    def expire_tracks(self):
+        """Drop tracks unseen for TRACK_EXPIRY_FRAMES frames and the oldest ones over MAX_TRACKED_OBJECTS"""
+        # detection_history is ordered by last sighting, so expired tracks are at the front
+        while self.detection_history:
+            vehicle_id, history = next(iter(self.detection_history.items()))
+            expired = self.frame_index - history.last_frame >= config.TRACK_EXPIRY_FRAMES
+            if not expired and len(self.detection_history) <= config.MAX_TRACKED_OBJECTS:
+                break
+            
+            del self.detection_history[vehicle_id]
+            if self.spill is not None:
+                self.spill.write('track', dict(history.to_dict(), vehicle_id=vehicle_id))
+    
+    def log_intrusion(self, intrusion):
+        """Add an intrusion event to the bounded log, spilling the event it pushes out"""
+        if self.spill is not None and len(self.intrusion_log) == self.intrusion_log.maxlen:
+            self.spill.write('intrusion', self.intrusion_log[0])
+        self.intrusion_log.append(intrusion)
     
     def detect_lane_intrusions(self, tracked_vehicles):
         """
@@ -310,13 +540,13 @@ class LaneIntrusionDetector:
                 history = self.detection_history[vehicle_id]
                 
                 # Need at least 2 points to detect a lane change
-                if len(history['lanes']) >= 2:
-                    previous_lane = history['lanes'][-2]
+                if len(history.lanes) >= 2:
+                    previous_lane = history.lanes[-2]
                     
                     # If the lane changed, log it as an intrusion
                     if previous_lane != current_lane and previous_lane != -1 and current_lane != -1:
                         # Get timestamp of the event
-                        timestamp = history['timestamps'][-1]
+                        timestamp = history.timestamps[-1]
                         
                         intrusion = {
                             'vehicle_id': vehicle_id,
@@ -327,65 +557,154 @@ class LaneIntrusionDetector:
                         }
                         
                         intrusions.append(intrusion)
-                        self.intrusion_log.append(intrusion)
+                        self.log_intrusion(intrusion)
         
         return intrusions
     
-    def draw_lanes(self, image, lane_colors=None):
+    def get_track_points(self, vehicle_id, max_points=10):
         """
-        Draw lane markings on the image
+        Get the recent bottom-center track points of a vehicle
         
         Args:
-            image: Input image
-            lane_colors: List of BGR colors for each lane
+            vehicle_id: Tracked vehicle ID
+            max_points: Number of most recent positions to return
             
         Returns:
-            Image with lane markings
+            List of (x, y) points, oldest first
         """
-        if not self.lane_regions:
-            self.define_lanes(image)
+        if vehicle_id not in self.detection_history:
+            return []
         
-        if lane_colors is None:
-            lane_colors = [
-                (0, 255, 0),    # Green
-                (0, 255, 255),  # Yellow
-                (0, 0, 255)     # Red
-            ]
+        positions = list(self.detection_history[vehicle_id].positions)
+        return [(pos[0] + (pos[2] - pos[0]) // 2, pos[3]) for pos in positions[-max_points:]]
+    
+    def get_overlay(self, tracked_vehicles):
+        """
+        Get the lane and track geometry needed to draw this detector's overlay elsewhere
+        
+        Args:
+            tracked_vehicles: Vehicles returned by track_vehicles for the current frame
+            
+        Returns:
+            Dictionary with lane polygons and per-vehicle track points
+        """
+        return {
+            'lanes': [lane.tolist() for lane in self.lane_regions],
+            'tracks': {
+                str(vehicle['id']): [list(point) for point in self.get_track_points(vehicle['id'])]
+                for vehicle in tracked_vehicles if 'id' in vehicle
+            }
+        }
+    
+    def build_lane_overlay(self, frame_shape, lane_colors=None):
+        """
+        Render the lane markings once into a cached overlay layer
+        
+        The layer holds the lane outlines and labels (and, with
+        LANE_OVERLAY_FILL_ALPHA > 0, a lane fill), together with the masks of
+        the pixels they cover and a scratch buffer for blending the fill. It is
+        rebuilt only when the lanes, the frame size or the colors change.
+        
+        Args:
+            frame_shape: Shape of the frames the overlay is composited onto
+            lane_colors: List of BGR colors for each lane
+        """
+        lane_colors = lane_colors or self.LANE_COLORS
         
-        lane_img = image.copy()
+        h, w = frame_shape[:2]
+        layer = np.zeros((h, w, 3), dtype=np.uint8)
+        line_mask = np.zeros((h, w), dtype=np.uint8)
+        fill_layer = None
+        fill_mask = None
+        
+        if config.LANE_OVERLAY_FILL_ALPHA > 0:
+            fill_layer = np.zeros((h, w, 3), dtype=np.uint8)
+            fill_mask = np.zeros((h, w), dtype=np.uint8)
+            for i, lane in enumerate(self.lane_regions):
+                cv2.fillPoly(fill_layer, [lane], lane_colors[i % len(lane_colors)])
+                cv2.fillPoly(fill_mask, [lane], 255)
         
         for i, lane in enumerate(self.lane_regions):
             color = lane_colors[i % len(lane_colors)]
-            cv2.polylines(lane_img, [lane], True, color, 2)
+            cv2.polylines(layer, [lane], True, color, 2)
+            cv2.polylines(line_mask, [lane], True, 255, 2)
             
             # Add lane number
             moments = cv2.moments(lane)
             if moments["m00"] != 0:
                 cx = int(moments["m10"] / moments["m00"])
                 cy = int(moments["m01"] / moments["m00"])
-                cv2.putText(lane_img, f"Lane {i+1}", (cx-40, cy), 
+                cv2.putText(layer, f"Lane {i+1}", (cx-40, cy), 
                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+                cv2.putText(line_mask, f"Lane {i+1}", (cx-40, cy), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, 255, 2)
+        
+        self._lane_overlay = {
+            'key': ((h, w), tuple(map(tuple, lane_colors))),
+            'layer': layer,
+            'line_mask': line_mask.astype(bool)[:, :, None],
+            'fill_layer': fill_layer,
+            'fill_mask': fill_mask.astype(bool)[:, :, None] if fill_mask is not None else None,
+            'blend_buffer': np.empty_like(fill_layer) if fill_layer is not None else None
+        }
+    
+    def draw_lanes(self, image, lane_colors=None):
+        """
+        Draw lane markings onto the image in place
+        
+        Composites the cached lane overlay onto the frame without allocating
+        a new frame or redrawing every lane.
         
-        return lane_img
+        Args:
+            image: Image to draw on (modified in place)
+            lane_colors: List of BGR colors for each lane
+            
+        Returns:
+            The same image, with lane markings
+        """
+        if not self.lane_regions:
+            self.define_lanes(image)
+        
+        lane_colors = lane_colors or self.LANE_COLORS
+        overlay = self._lane_overlay
+        if overlay is None or overlay['key'] != (image.shape[:2], tuple(map(tuple, lane_colors))):
+            self.build_lane_overlay(image.shape, lane_colors)
+            overlay = self._lane_overlay
+        
+        if overlay['fill_layer'] is not None:
+            # Blend the lane fill into the cached buffer and copy it over the lanes
+            alpha = config.LANE_OVERLAY_FILL_ALPHA
+            blended = cv2.addWeighted(image, 1 - alpha, overlay['fill_layer'], alpha, 0, dst=overlay['blend_buffer'])
+            np.copyto(image, blended, where=overlay['fill_mask'])
+        
+        # Opaque outlines and labels on top
+        np.copyto(image, overlay['layer'], where=overlay['line_mask'])
+        return image
     
-    def process_frame(self, image, vehicle_detections):
+    def process_frame(self, image, vehicle_detections, render=True, context=None):
         """
         Process a frame to detect lane intrusions
         
         Args:
             image: Input image
             vehicle_detections: List of vehicle detections
+            render: Draw onto the frame in place; with False only tracking and
+                intrusion detection run and no image is produced
+            context: FrameContext of the frame, shared with the other detectors
             
         Returns:
-            Processed image with lane markings and intrusion alerts,
+            Processed image with lane markings and intrusion alerts (None when render is False),
             List of intrusion events
         """
-        # Define lanes if not already done
+        # Define lanes if not already done, otherwise watch for camera movement
         if not self.lane_regions:
-            self.define_lanes(image)
+            self.load_or_define_lanes(image, context)
+        else:
+            self.update_lanes(image, context)
         
-        # Draw lanes on image
-        result_img = self.draw_lanes(image)
+        # (Re)build the lane mask when the lanes or the frame size changed
+        if self._lane_mask is None or self._mask_shape != image.shape[:2]:
+            self.build_lane_mask(image.shape)
         
         # Track vehicles
         tracked_vehicles = self.track_vehicles(vehicle_detections)
@@ -393,6 +712,26 @@ class LaneIntrusionDetector:
         # Detect lane intrusions
         intrusions = self.detect_lane_intrusions(tracked_vehicles)
         
+        if not render:
+            return None, intrusions
+        
+        return self.render_frame(image, tracked_vehicles, intrusions), intrusions
+    
+    def render_frame(self, image, tracked_vehicles, intrusions):
+        """
+        Draw lanes, tracked vehicles and intrusion alerts onto the frame in place
+        
+        Args:
+            image: Frame to draw on (modified in place)
+            tracked_vehicles: Vehicles returned by track_vehicles
+            intrusions: Intrusion events returned by detect_lane_intrusions
+            
+        Returns:
+            The same image, annotated
+        """
+        # Draw lanes on image
+        result_img = self.draw_lanes(image)
+        
         # Draw vehicles and their tracks
         for vehicle in tracked_vehicles:
             x1, y1, x2, y2 = vehicle['bbox']
@@ -417,17 +756,9 @@ class LaneIntrusionDetector:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
             
             # Draw track
-            if vehicle_id in self.detection_history:
-                positions = self.detection_history[vehicle_id]['positions']
-                if len(positions) > 1:
-                    points = []
-                    for pos in positions[-10:]:  # Last 10 positions
-                        center_x = pos[0] + (pos[2] - pos[0]) // 2
-                        center_y = pos[3]  # Bottom center
-                        points.append((center_x, center_y))
-                    
-                    for i in range(1, len(points)):
-                        cv2.line(result_img, points[i-1], points[i], color, 2)
+            points = self.get_track_points(vehicle_id)
+            for i in range(1, len(points)):
+                cv2.line(result_img, points[i-1], points[i], color, 2)
         
         # Mark intrusions
         for intrusion in intrusions:
@@ -441,4 +772,4 @@ class LaneIntrusionDetector:
             cv2.putText(result_img, alert_text, (x1, y1-50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
         
-        return result_img, intrusions
+        return result_img
@@ -0,0 +1,157 @@
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+
+def tile_grid(h: int, w: int, tile_size: int, overlap: float) -> np.ndarray:
+    """
+    Cover a frame with overlapping square tiles
+
+    Tiles are spaced tile_size * (1 - overlap) apart; the last row and column
+    are aligned to the frame edge so no tile hangs over it.
+
+    Args:
+        h: Frame height
+        w: Frame width
+        tile_size: Tile side in pixels
+        overlap: Overlap between neighbouring tiles as a fraction of tile_size
+
+    Returns:
+        Int array (K, 4) of (x1, y1, x2, y2) tiles, row by row
+    """
+    step = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return np.array([0])
+        return np.unique(np.append(np.arange(0, length - tile_size, step), length - tile_size))
+
+    xs, ys = starts(w), starts(h)
+    x1, y1 = np.meshgrid(xs, ys)
+    x1, y1 = x1.ravel(), y1.ravel()
+    return np.stack([x1, y1, np.minimum(x1 + tile_size, w), np.minimum(y1 + tile_size, h)], axis=1)
+
+def tiles_in_region(tiles: np.ndarray, frame_shape: Tuple[int, ...],
+                    region: Optional[Tuple[float, float, float, float]]) -> np.ndarray:
+    """
+    Select the tiles that overlap a region of interest
+
+    Args:
+        tiles: Array (K, 4) from tile_grid
+        frame_shape: Shape of the frame
+        region: (x1, y1, x2, y2) as fractions of the frame size (None = whole frame)
+
+    Returns:
+        Boolean array (K,)
+    """
+    if region is None:
+        return np.ones(len(tiles), dtype=bool)
+
+    h, w = frame_shape[:2]
+    rx1, ry1, rx2, ry2 = np.asarray(region) * [w, h, w, h]
+    return ((tiles[:, 0] < rx2) & (tiles[:, 2] > rx1) &
+            (tiles[:, 1] < ry2) & (tiles[:, 3] > ry1))
+
+def touches_interior_edge(boxes: np.ndarray, tile_shape: Tuple[int, ...], origin: Tuple[int, int],
+                          frame_shape: Tuple[int, ...], margin: float = 2.0) -> np.ndarray:
+    """
+    Find tile boxes that touch a tile edge lying inside the frame
+
+    Tile edges on the frame border do not count, since nothing continues past them.
+
+    Args:
+        boxes: Array (M, 4) of (x1, y1, x2, y2) in tile pixels
+        tile_shape: Shape of the tile
+        origin: (x, y) of the tile in the frame
+        frame_shape: Shape of the frame
+        margin: Distance in pixels within which a box counts as touching an edge
+
+    Returns:
+        Boolean array (M,)
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    tile_h, tile_w = tile_shape[:2]
+    frame_h, frame_w = frame_shape[:2]
+    x, y = origin
+
+    return (((boxes[:, 0] <= margin) & (x > 0)) |
+            ((boxes[:, 1] <= margin) & (y > 0)) |
+            ((boxes[:, 2] >= tile_w - margin) & (x + tile_w < frame_w)) |
+            ((boxes[:, 3] >= tile_h - margin) & (y + tile_h < frame_h)))
+
+class TileMotionGate:
+    def __init__(self, threshold: Optional[float] = None, pixel_threshold: int = 25, downscale: int = 8,
+                 max_skip: Optional[int] = None):
+        """
+        Per-stream record of which tiles changed, and of each tile's last detections
+
+        A tile without motion reuses the detections it produced the last time
+        it was run, so parked vehicles in static tiles are not lost. Every tile
+        is run at least every max_skip frames. Create one gate per video or
+        camera stream and call it with the frames in order.
+
+        Args:
+            threshold: Fraction of changed pixels above which a tile counts as moving
+                (defaults to config.TILE_MOTION_THRESHOLD)
+            pixel_threshold: Grey-level difference for a pixel to count as changed
+            downscale: Downscaling factor of the comparison image
+            max_skip: Frames a static tile may reuse its detections (defaults to config.TILE_MAX_SKIP)
+        """
+        self.threshold = config.TILE_MOTION_THRESHOLD if threshold is None else threshold
+        self.pixel_threshold = pixel_threshold
+        self.downscale = downscale
+        self.max_skip = config.TILE_MAX_SKIP if max_skip is None else max_skip
+        self.reset()
+
+    def reset(self):
+        self.shape = None
+        self.reference = None
+        self.skipped = None  # Frames since each tile was last run
+        self.tile_results = {}  # Tile index -> (boxes, scores, class_ids) in frame coordinates
+
+    def moving_tiles(self, context, tiles: np.ndarray) -> np.ndarray:
+        """
+        Decide which tiles of a frame need inference
+
+        Args:
+            context: FrameContext of the frame
+            tiles: Array (K, 4) from tile_grid
+
+        Returns:
+            Boolean array (K,): True for tiles to run, False for tiles that may
+            reuse their stored detections
+        """
+        h, w = context.shape[:2]
+        if self.shape != (h, w) or self.skipped is None or len(self.skipped) != len(tiles):
+            self.reset()
+            self.shape = (h, w)
+            self.skipped = np.zeros(len(tiles), dtype=np.int64)
+
+        size = (max(1, w // self.downscale), max(1, h // self.downscale))
+        # Downscale the colour frame first, so no full-resolution grey frame is built here
+        small = cv2.GaussianBlur(context.scaled(max(size)).resized(size), (3, 3), 0)
+        reference, self.reference = self.reference, small
+
+        if reference is None:
+            moving = np.ones(len(tiles), dtype=bool)
+        else:
+            # Changed pixels per tile from one integral image of the difference mask
+            changed = (cv2.absdiff(small, reference) > self.pixel_threshold).astype(np.uint8)
+            integral = cv2.integral(changed)
+            sx, sy = size[0] / w, size[1] / h
+            x1 = np.floor(tiles[:, 0] * sx).astype(int)
+            y1 = np.floor(tiles[:, 1] * sy).astype(int)
+            x2 = np.clip(np.ceil(tiles[:, 2] * sx).astype(int), x1 + 1, size[0])
+            y2 = np.clip(np.ceil(tiles[:, 3] * sy).astype(int), y1 + 1, size[1])
+            counts = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+            moving = counts / ((x2 - x1) * (y2 - y1)) >= self.threshold
+
+        # Run static tiles that have nothing stored, or have been skipped for too long
+        stale = self.skipped >= self.max_skip
+        missing = np.array([index not in self.tile_results for index in range(len(tiles))], dtype=bool)
+        run = moving | stale | missing
+
+        self.skipped = np.where(run, 0, self.skipped + 1)
+        return run
@@ -0,0 +1,349 @@
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SciPy is optional: without it, matching falls back to a global greedy assignment
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Calculate the pairwise Intersection over Union of two sets of boxes
+
+    Args:
+        boxes_a: N boxes (x1, y1, x2, y2)
+        boxes_b: M boxes (x1, y1, x2, y2)
+
+    Returns:
+        N x M array of IoU values
+    """
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    # Broadcast to N x M intersections
+    x_left = np.maximum(a[:, None, 0], b[None, :, 0])
+    y_top = np.maximum(a[:, None, 1], b[None, :, 1])
+    x_right = np.minimum(a[:, None, 2], b[None, :, 2])
+    y_bottom = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x_right - x_left, 0, None) * np.clip(y_bottom - y_top, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+def assign_matches(scores, threshold):
+    """
+    Find the best one-to-one matching between rows and columns of a score matrix
+
+    Uses the Hungarian algorithm when SciPy is available and a global greedy
+    assignment (highest score first) otherwise. Both are independent of the
+    order of the detections.
+
+    Args:
+        scores: N x M score matrix (e.g. IoU), higher is better
+        threshold: Pairs must score strictly above this value to match
+
+    Returns:
+        List of (row, column) index pairs
+    """
+    scores = np.asarray(scores)
+    if scores.size == 0:
+        return []
+
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(scores, maximize=True)
+        keep = scores[rows, cols] > threshold
+        return list(zip(rows[keep].tolist(), cols[keep].tolist()))
+
+    # Greedy fallback: walk the candidate pairs from the highest score down
+    rows, cols = np.nonzero(scores > threshold)
+    order = np.argsort(-scores[rows, cols], kind='stable')
+    matched_rows, matched_cols, matches = set(), set(), []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row in matched_rows or col in matched_cols:
+            continue
+        matched_rows.add(row)
+        matched_cols.add(col)
+        matches.append((row, col))
+
+    return matches
+
+class IoUTracker:
+    def __init__(self, iou_threshold: float = 0.3):
+        """
+        Frame-to-frame IoU tracker
+
+        Detections continue the track of the previous frame's box they overlap
+        most. Tracks end as soon as they are missed for one processed frame.
+
+        Args:
+            iou_threshold: Minimum IoU to continue a track
+        """
+        self.iou_threshold = iou_threshold
+        self.next_id = 1
+        self._boxes = np.zeros((0, 4))
+        self._ids = []
+
+    def update(self, boxes: Sequence) -> List[int]:
+        """
+        Assign track IDs to the boxes of a new frame
+
+        Args:
+            boxes: Detected boxes (x1, y1, x2, y2)
+
+        Returns:
+            Track ID for each box, in order
+        """
+        ids = [None] * len(boxes)
+        if len(boxes) and len(self._ids):
+            for det_idx, track_idx in assign_matches(iou_matrix(boxes, self._boxes), self.iou_threshold):
+                ids[det_idx] = self._ids[track_idx]
+
+        for i, track_id in enumerate(ids):
+            if track_id is None:
+                ids[i] = self.next_id
+                self.next_id += 1
+
+        self._boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self._ids = ids
+        return ids
+
+    @property
+    def active_tracks(self) -> int:
+        return len(self._ids)
+
+class KalmanTracker:
+    # Constant-velocity model over the box state [cx, cy, w, h, vcx, vcy, vw, vh]
+    _F = np.eye(8)
+    _F[:4, 4:] = np.eye(4)
+    _Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001, 0.0001])  # Process noise
+    _R = np.diag([1.0, 1.0, 10.0, 10.0])  # Measurement noise
+    _P0 = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4, 1e4])  # Initial covariance (velocity unknown)
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 3, distance_gate: float = 0.5):
+        """
+        SORT-style tracker with a Kalman motion model
+
+        Every track's box is predicted forward one step per processed frame and
+        detections are matched against the predicted boxes, so vehicles that move
+        further than their own size between sampled frames keep their ID. Tracks
+        survive up to max_age processed frames without a detection. Detections
+        left over after IoU matching are matched by center distance (relative to
+        the track's box size) to tracks that were seen in the previous frame,
+        which catches a track's second sighting before a velocity has been
+        estimated. Tracks coasting through a miss only continue by IoU, so a
+        neighbouring vehicle cannot take over their ID.
+
+        All tracks are predicted and updated together as stacked arrays.
+
+        Args:
+            iou_threshold: Minimum IoU with a predicted box to continue a track
+            max_age: Number of consecutive missed frames before a track is dropped
+            distance_gate: Maximum center distance for the fallback match, in box sizes
+        """
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.distance_gate = distance_gate
+        self.next_id = 1
+        self._states = np.zeros((0, 8))
+        self._covariances = np.zeros((0, 8, 8))
+        self._misses = np.zeros(0, dtype=np.int32)
+        self._ids = np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def _to_state(boxes: np.ndarray) -> np.ndarray:
+        """Convert (x1, y1, x2, y2) boxes to (cx, cy, w, h)"""
+        return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                         boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]], axis=1)
+
+    @staticmethod
+    def _to_boxes(states: np.ndarray) -> np.ndarray:
+        """Convert (cx, cy, w, h, ...) states to (x1, y1, x2, y2) boxes"""
+        half_w, half_h = states[:, 2] / 2, states[:, 3] / 2
+        return np.stack([states[:, 0] - half_w, states[:, 1] - half_h,
+                         states[:, 0] + half_w, states[:, 1] + half_h], axis=1)
+
+    def _predict(self):
+        self._states = self._states @ self._F.T
+        self._states[:, 2:4] = np.maximum(self._states[:, 2:4], 1.0)
+        self._covariances = self._F @ self._covariances @ self._F.T + self._Q
+
+    def _correct(self, track_idx: np.ndarray, measurements: np.ndarray):
+        P = self._covariances[track_idx]
+        S = P[:, :4, :4] + self._R
+        K = P[:, :, :4] @ np.linalg.inv(S)
+        residual = measurements - self._states[track_idx, :4]
+        self._states[track_idx] += (K @ residual[:, :, None])[:, :, 0]
+        self._covariances[track_idx] = P - K @ P[:, :4, :]
+
+    def _distance_scores(self, measurements: np.ndarray, predicted: np.ndarray) -> np.ndarray:
+        """Similarity in [0, 1] that falls off with center distance, zero beyond the gate"""
+        distance = np.linalg.norm(measurements[:, None, :2] - predicted[None, :, :2], axis=2)
+        scale = self.distance_gate * np.sqrt(predicted[:, 2] * predicted[:, 3])
+        return np.clip(1 - distance / np.maximum(scale, 1.0)[None, :], 0, None)
+
+    def update(self, boxes: Sequence) -> List[int]:
+        """
+        Predict all tracks one frame ahead and assign track IDs to the new boxes
+
+        Args:
+            boxes: Detected boxes (x1, y1, x2, y2)
+
+        Returns:
+            Track ID for each box, in order
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        measurements = self._to_state(boxes)
+        self._predict()
+
+        track_for_det = np.full(len(boxes), -1)
+        if len(boxes) and len(self._ids):
+            predicted = self._states[:, :4]
+            for det_idx, track_idx in assign_matches(iou_matrix(boxes, self._to_boxes(predicted)), self.iou_threshold):
+                track_for_det[det_idx] = track_idx
+
+            # Second pass on what IoU left over, limited to tracks seen in the previous frame
+            free_dets = np.flatnonzero(track_for_det < 0)
+            free_tracks = np.setdiff1d(np.flatnonzero(self._misses == 0), track_for_det[track_for_det >= 0])
+            if len(free_dets) and len(free_tracks):
+                scores = self._distance_scores(measurements[free_dets], predicted[free_tracks])
+                for det_idx, track_idx in assign_matches(scores, 0.0):
+                    track_for_det[free_dets[det_idx]] = free_tracks[track_idx]
+
+        matched = track_for_det >= 0
+        if matched.any():
+            self._correct(track_for_det[matched], measurements[matched])
+
+        # Age out tracks that were not seen this frame
+        seen = np.zeros(len(self._ids), dtype=bool)
+        seen[track_for_det[matched]] = True
+        self._misses = np.where(seen, 0, self._misses + 1)
+        ids = np.zeros(len(boxes), dtype=np.int64)
+        ids[matched] = self._ids[track_for_det[matched]]
+
+        # Start tracks for unmatched detections
+        new = ~matched
+        new_ids = np.arange(self.next_id, self.next_id + new.sum())
+        self.next_id += int(new.sum())
+        ids[new] = new_ids
+
+        new_states = np.zeros((new.sum(), 8))
+        new_states[:, :4] = measurements[new]
+        self._states = np.concatenate([self._states, new_states])
+        self._covariances = np.concatenate([self._covariances, np.repeat(self._P0[None], new.sum(), axis=0)])
+        self._misses = np.concatenate([self._misses, np.zeros(new.sum(), dtype=np.int32)])
+        self._ids = np.concatenate([self._ids, new_ids])
+
+        keep = self._misses <= self.max_age
+        self._states = self._states[keep]
+        self._covariances = self._covariances[keep]
+        self._misses = self._misses[keep]
+        self._ids = self._ids[keep]
+
+        return ids.tolist()
+
+    @property
+    def active_tracks(self) -> int:
+        return len(self._ids)
+
+class TrackHistory:
+    __slots__ = ('first_seen', 'last_seen', 'last_frame', 'hits', 'timestamps', 'positions', 'lanes')
+
+    def __init__(self, max_length: int = 30):
+        """
+        Recent history of one tracked vehicle, kept in fixed-size ring buffers
+
+        Args:
+            max_length: Number of most recent observations kept
+        """
+        self.first_seen = None
+        self.last_seen = None
+        self.last_frame = 0  # Index of the processed frame the vehicle was last seen in
+        self.hits = 0  # Total observations, including those no longer buffered
+        self.timestamps = deque(maxlen=max_length)
+        self.positions = deque(maxlen=max_length)
+        self.lanes = deque(maxlen=max_length)
+
+    def add(self, timestamp: float, frame_index: int, bbox, lane: int):
+        if self.first_seen is None:
+            self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.last_frame = frame_index
+        self.hits += 1
+        self.timestamps.append(timestamp)
+        self.positions.append(bbox)
+        self.lanes.append(lane)
+
+    def forget_lanes(self):
+        """Mark the buffered lane indices as unassigned (-1), e.g. after the lanes were redefined"""
+        self.lanes = deque([-1] * len(self.lanes), maxlen=self.lanes.maxlen)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'hits': self.hits,
+            'positions': [list(position) for position in self.positions],
+            'lanes': list(self.lanes)
+        }
+
+class TrackSpill:
+    _lock = threading.Lock()  # Shared by all writers, which may append to the same file
+
+    def __init__(self, path: str):
+        """
+        Append expired tracks and old intrusion events to a JSON lines file
+
+        Args:
+            path: Output file path
+        """
+        self.path = path
+
+    def write(self, kind: str, record: Dict[str, Any]):
+        """
+        Append one record
+
+        Args:
+            kind: Record type ('track' or 'intrusion')
+            record: JSON-serialisable record
+        """
+        try:
+            line = json.dumps(dict(record, kind=kind), default=float, ensure_ascii=False)
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except Exception as e:
+            logger.error(f"Error spilling {kind} record to {self.path}: {e}")
+
+def create_spill(path: Optional[str]) -> Optional[TrackSpill]:
+    """Create a TrackSpill for path, or None when spilling is disabled"""
+    return TrackSpill(path) if path else None
+
+TRACKERS = {
+    'iou': IoUTracker,
+    'kalman': KalmanTracker
+}
+
+def create_tracker(name: str, **kwargs):
+    """
+    Create a tracker backend by name
+
+    Args:
+        name: 'iou' or 'kalman'
+        **kwargs: Passed to the tracker constructor
+
+    Returns:
+        Tracker instance with an update(boxes) -> ids method
+    """
+    if name not in TRACKERS:
+        raise ValueError(f"Unknown tracker backend: {name}")
+    return TRACKERS[name](**kwargs)
@@ -2,72 +2,313 @@ import os
 import cv2
 import numpy as np
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from detection.frame_context import FrameContext
+from detection.inference import batched_nms, create_backend, decode_yolov8
+from detection.tiling import tile_grid, tiles_in_region, touches_interior_edge
 
 logger = logging.getLogger(__name__)
 
+def letterbox_batch(images, size=(640, 640), pad_value=114):
+    """
+    Letterbox frames to the network input size and stack them into one tensor
+    
+    Each frame is resized with its aspect ratio preserved and centred on a
+    pad_value border. Colour conversion (BGR to RGB), the HWC to CHW transpose
+    and scaling to [0, 1] happen in a single pass over the whole batch.
+    
+    Args:
+        images: List of BGR frames, or a stacked (N, H, W, 3) array
+        size: Network input size (width, height)
+        pad_value: Grey level of the padding
+        
+    Returns:
+        tensor: Contiguous float32 array of shape (N, 3, height, width)
+        scales: Array (N,) of resize factors
+        offsets: Array (N, 2) of (pad_x, pad_y) in network pixels
+    """
+    width, height = size
+    count = len(images)
+    batch = np.full((count, height, width, 3), pad_value, dtype=np.uint8)
+    scales = np.empty(count, dtype=np.float32)
+    offsets = np.empty((count, 2), dtype=np.float32)
+    
+    geometry = None
+    for i, image in enumerate(images):
+        # Frames of one video share a shape, so the geometry is usually computed once
+        h, w = image.shape[:2]
+        if geometry is None or geometry[0] != (h, w):
+            scale = min(width / w, height / h)
+            new_w, new_h = int(round(w * scale)), int(round(h * scale))
+            geometry = ((h, w), scale, new_w, new_h, (width - new_w) // 2, (height - new_h) // 2)
+        _, scale, new_w, new_h, pad_x, pad_y = geometry
+        
+        batch[i, pad_y:pad_y + new_h, pad_x:pad_x + new_w] = cv2.resize(image, (new_w, new_h),
+                                                                          interpolation=cv2.INTER_LINEAR)
+        scales[i] = scale
+        offsets[i] = (pad_x, pad_y)
+    
+    tensor = np.empty((count, 3, height, width), dtype=np.float32)
+    np.multiply(batch.transpose(0, 3, 1, 2)[:, ::-1], np.float32(1 / 255), out=tensor, casting='unsafe')
+    return tensor, scales, offsets
+
+def unletterbox_boxes(boxes, scale, offset, frame_shape):
+    """
+    Map (x1, y1, x2, y2) boxes from network input pixels back to frame pixels
+    
+    Args:
+        boxes: Array (M, 4) in network input coordinates
+        scale: Resize factor of the frame (from letterbox_batch)
+        offset: (pad_x, pad_y) of the frame (from letterbox_batch)
+        frame_shape: Shape of the original frame
+        
+    Returns:
+        Array (M, 4) of clipped frame coordinates
+    """
+    h, w = frame_shape[:2]
+    boxes = (np.asarray(boxes, dtype=np.float32) - np.tile(offset, 2)) / scale
+    np.clip(boxes, 0, [w, h, w, h], out=boxes)
+    return boxes
+
 class YOLODetector:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, backend=None, precision=None):
         """
         Initialize YOLOv8 detector
         
         Args:
-            model_path: Path to custom YOLOv8 model weights (if None, uses pretrained YOLOv8n)
+            model_path: Path to an exported YOLOv8 ONNX model (defaults to the model of the precision)
+            backend: 'onnxruntime', 'opencv' or 'demo' (defaults to config.YOLO_BACKEND)
+            precision: 'fp32' (config.YOLO_MODEL) or 'int8' (config.YOLO_INT8_MODEL, made
+                by quantize_model.py); defaults to config.YOLO_PRECISION
         """
         try:
-            # Simplified implementation without requiring ultralytics
-            logger.info("Initialized simplified YOLO detector (demo mode)")
-            
             # Classes of interest for our application
             self.vehicle_classes = [2, 3, 5, 7]  # car, motorcycle, bus, truck in COCO dataset
             
+            self.backend_name = backend or config.YOLO_BACKEND
+            self.precision = precision or config.YOLO_PRECISION
+            if self.precision not in ('fp32', 'int8'):
+                raise ValueError(f"Unknown model precision: {self.precision}")
+            self.model_path = model_path or (config.YOLO_INT8_MODEL if self.precision == 'int8' else config.YOLO_MODEL)
+            self.input_size = (config.YOLO_INPUT_SIZE, config.YOLO_INPUT_SIZE)
+            self.backend = None
+            self.tile_executor = None
+            
+            if self.backend_name != 'demo':
+                self.backend = create_backend(self.backend_name, self.model_path,
+                                              intra_op_threads=config.INFERENCE_INTRA_OP_THREADS,
+                                              inter_op_threads=config.INFERENCE_INTER_OP_THREADS)
+                logger.info(f"Initialized YOLO detector with {self.backend_name} backend "
+                            f"({self.precision}, {self.model_path})")
+                
+                # Tile batches are independent inference calls, so they can overlap on a thread pool
+                if config.TILED_INFERENCE and config.TILE_WORKERS > 0:
+                    self.tile_executor = ThreadPoolExecutor(max_workers=config.TILE_WORKERS,
+                                                            thread_name_prefix='tile-inference')
+            else:
+                logger.info("Initialized simplified YOLO detector (demo mode)")
+            
         except Exception as e:
-            logger.error(f"Error initializing detector: {e}")
-            raise RuntimeError(f"Failed to initialize detector: {e}")
+            logger.error(f"Error initializing {self.backend_name} backend: {e}")
+            logger.warning("Falling back to the simplified YOLO detector (demo mode)")
+            self.backend_name = 'demo'
+            self.backend = None
+            self.tile_executor = None
     
-    def detect_vehicles(self, image):
+    def detect_vehicles(self, image, context=None, motion_gate=None):
         """
         Detect vehicles in an image
         
         Args:
             image: OpenCV image (numpy array)
+            context: FrameContext of the image (unused by the demo detector)
+            motion_gate: TileMotionGate of the image's stream, for tiled inference
             
         Returns:
             List of detected vehicles (x1, y1, x2, y2, confidence, class_id)
         """
+        contexts = [context] if context is not None else None
+        return self.detect_vehicles_batch([image], contexts, motion_gate)[0]
+    
+    def detect_vehicles_batch(self, images, contexts=None, motion_gate=None):
+        """
+        Detect vehicles in several frames with one inference call
+        
+        With config.TILED_INFERENCE, frames whose longest side reaches
+        TILE_MIN_FRAME_SIDE are also searched tile by tile (see _detect_tiled).
+        
+        Args:
+            images: List of OpenCV images, or a stacked (N, H, W, 3) array
+            contexts: Optional list of FrameContext objects, one per image
+            motion_gate: Optional TileMotionGate of the stream the frames come from
+                (in order); static tiles then reuse their previous detections
+            
+        Returns:
+            List with one list of vehicle detections per image, in input order
+        """
         try:
-            # Simplified detection using OpenCV's built-in object detector
-            # This is for demonstration purposes - would normally use YOLO
+            # The demo detector derives its boxes from the frame size alone
+            if self.backend is None:
+                return [self._demo_vehicles(image.shape) for image in images]
             
-            # Create sample detection (for demo purposes)
-            h, w = image.shape[:2]
+            if config.TILED_INFERENCE:
+                results = self._detect_tiled(images, contexts, motion_gate)
+            else:
+                # One tensor and one inference call for the whole batch
+                results = self._infer(images)
             
-            # Create some sample detections based on image size
-            detections = [
-                {
-                    'bbox': (int(w*0.2), int(h*0.4), int(w*0.5), int(h*0.9)),
-                    'confidence': 0.85,
-                    'class_id': 2  # car
-                },
-                {
-                    'bbox': (int(w*0.65), int(h*0.45), int(w*0.9), int(h*0.85)),
-                    'confidence': 0.76,
-                    'class_id': 3  # motorcycle
-                }
+            return [
+                [
+                    {
+                        'bbox': tuple(box.tolist()),
+                        'confidence': float(score),
+                        'class_id': int(class_id)
+                    }
+                    for box, score, class_id in zip(boxes.astype(int), scores, class_ids)
+                ]
+                for boxes, scores, class_ids in results
             ]
-            
-            return detections
         
         except Exception as e:
             logger.error(f"Error detecting vehicles: {e}")
-            return []
+            return [[] for _ in images]
+    
+    def _infer(self, images):
+        """
+        Run the network on a list of images
+        
+        Returns:
+            List of (boxes, scores, class_ids) arrays per image, boxes in image pixels
+        """
+        tensor, scales, offsets = letterbox_batch(images, self.input_size)
+        output = self.backend.run(tensor)
+        decoded = decode_yolov8(output, self.vehicle_classes, config.MIN_VEHICLE_CONFIDENCE,
+                                config.YOLO_NMS_IOU_THRESHOLD)
+        
+        return [(unletterbox_boxes(frame['boxes'], scale, offset, image.shape), frame['scores'], frame['class_ids'])
+                for image, scale, offset, frame in zip(images, scales, offsets, decoded)]
     
-    def detect_license_plates(self, image, vehicle_detections=None):
+    def _detect_tiled(self, images, contexts=None, motion_gate=None):
+        """
+        Tiled vehicle detection for high-resolution frames
+        
+        Every frame gets the usual downscaled whole-frame pass, which finds the
+        large vehicles. Large frames are additionally cut into overlapping
+        TILE_SIZE tiles that go through the network at full resolution, so
+        small distant vehicles survive. Tiles outside config.TILE_REGION are
+        skipped, and with a motion gate so are tiles without motion, which
+        reuse their last detections instead. Tile boxes touching a tile edge
+        inside the frame are dropped, since they are partial. All jobs of the batch run as
+        TILE_BATCH_SIZE chunks (on the tile thread pool when configured), and
+        each frame's boxes are merged with one class-aware NMS across tiles.
+        
+        Args:
+            images: List of OpenCV images
+            contexts: Optional list of FrameContext objects, one per image
+            motion_gate: Optional TileMotionGate of the frames' stream
+            
+        Returns:
+            List of (boxes, scores, class_ids) arrays per image, boxes in frame pixels
+        """
+        contexts = contexts or [None] * len(images)
+        
+        # (frame index, tile index or None for the whole frame, x offset, y offset, pixels)
+        jobs = []
+        frame_tiles = []
+        for i, (image, context) in enumerate(zip(images, contexts)):
+            jobs.append((i, None, 0, 0, image))
+            
+            h, w = image.shape[:2]
+            if max(h, w) < config.TILE_MIN_FRAME_SIDE:
+                frame_tiles.append(None)
+                continue
+            
+            tiles = tile_grid(h, w, config.TILE_SIZE, config.TILE_OVERLAP)
+            in_region = tiles_in_region(tiles, image.shape, config.TILE_REGION)
+            run = in_region.copy()
+            if motion_gate is not None:
+                run &= motion_gate.moving_tiles(FrameContext.of(image, context), tiles)
+            frame_tiles.append((in_region, run))
+            
+            # Tiles are views into the frame; letterbox_batch copies them into the tensor
+            for t in np.flatnonzero(run):
+                x1, y1, x2, y2 = tiles[t]
+                jobs.append((i, int(t), x1, y1, image[y1:y2, x1:x2]))
+        
+        chunks = [jobs[start:start + config.TILE_BATCH_SIZE]
+                  for start in range(0, len(jobs), config.TILE_BATCH_SIZE)]
+        
+        def run_chunk(chunk):
+            return self._infer([job[4] for job in chunk])
+        
+        if self.tile_executor is not None:
+            chunk_results = list(self.tile_executor.map(run_chunk, chunks))
+        else:
+            chunk_results = [run_chunk(chunk) for chunk in chunks]
+        
+        per_frame = [{} for _ in images]
+        for chunk, results in zip(chunks, chunk_results):
+            for (i, t, x, y, pixels), (boxes, scores, class_ids) in zip(chunk, results):
+                if t is not None:
+                    # A vehicle cut off by a tile edge inside the frame only yields a partial
+                    # box, whose IoU with the full box is too low for NMS to remove it. Such
+                    # vehicles are whole in a neighbouring tile or in the whole-frame pass.
+                    keep = ~touches_interior_edge(boxes, pixels.shape, (x, y), images[i].shape)
+                    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+                per_frame[i][t] = (boxes + np.array([x, y, x, y], dtype=np.float32), scores, class_ids)
+        
+        merged = []
+        for i, parts in enumerate(per_frame):
+            if frame_tiles[i] is not None and motion_gate is not None:
+                # Frames are in stream order: store the fresh tile results, then
+                # fill in the static tiles from the latest stored ones
+                in_region, run = frame_tiles[i]
+                for t in np.flatnonzero(run):
+                    motion_gate.tile_results[int(t)] = parts[int(t)]
+                for t in np.flatnonzero(in_region & ~run):
+                    if int(t) in motion_gate.tile_results:
+                        parts[int(t)] = motion_gate.tile_results[int(t)]
+            
+            boxes = np.concatenate([part[0] for part in parts.values()]).reshape(-1, 4)
+            scores = np.concatenate([part[1] for part in parts.values()])
+            class_ids = np.concatenate([part[2] for part in parts.values()])
+            keep = batched_nms(boxes, scores, class_ids, config.YOLO_NMS_IOU_THRESHOLD)
+            merged.append((boxes[keep], scores[keep], class_ids[keep]))
+        
+        return merged
+    
+    def _demo_vehicles(self, frame_shape):
+        """Sample vehicle detections placed relative to the frame size"""
+        # Simplified detection using OpenCV's built-in object detector
+        # This is for demonstration purposes - would normally use YOLO
+        
+        # Create sample detection (for demo purposes)
+        h, w = frame_shape[:2]
+        
+        # Create some sample detections based on image size
+        return [
+            {
+                'bbox': (int(w*0.2), int(h*0.4), int(w*0.5), int(h*0.9)),
+                'confidence': 0.85,
+                'class_id': 2  # car
+            },
+            {
+                'bbox': (int(w*0.65), int(h*0.45), int(w*0.9), int(h*0.85)),
+                'confidence': 0.76,
+                'class_id': 3  # motorcycle
+            }
+        ]
+    
+    def detect_license_plates(self, image, vehicle_detections=None, context=None):
         """
         Detect license plates in an image, optionally within vehicle bounding boxes
         
         Args:
             image: OpenCV image (numpy array)
             vehicle_detections: Optional list of vehicle detections to search within
+            context: FrameContext of the image, to reuse its edge map
             
         Returns:
             List of detected license plates (x1, y1, x2, y2, confidence)
@@ -111,10 +352,13 @@ class YOLODetector:
                     })
             else:
                 # If no vehicle detections provided, search the entire image using edge detection
-                # Look for rectangles with license plate-like aspect ratios
-                edges = cv2.Canny(image, 100, 200)
+                # at the plate search resolution; boxes are mapped back to the full frame
+                scaled = FrameContext.of(image, context).scaled(config.INFERENCE_MAX_SIDE_PLATES)
+                edges = scaled.edges(100, 200, blur=0)
                 contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
                 
+                # Look for rectangles with license plate-like aspect ratios
+                boxes = []
                 for contour in contours:
                     # Approximate the contour
                     peri = cv2.arcLength(contour, True)
@@ -123,18 +367,43 @@ class YOLODetector:
                     # If we have a rectangle (4 points)
                     if len(approx) == 4:
                         x, y, w, h = cv2.boundingRect(approx)
-                        aspect_ratio = w / h if h > 0 else 0
-                        
-                        # License plates typically have an aspect ratio between 2:1 and 4:1
-                        if 1.5 < aspect_ratio < 5.0 and w > 60 and h > 20:
-                            license_plate_detections.append({
-                                'bbox': (x, y, x + w, y + h),
-                                'confidence': 0.5,  # Placeholder confidence
-                                'vehicle_bbox': None
-                            })
+                        boxes.append((x, y, x + w, y + h))
+                
+                for x1, y1, x2, y2 in np.rint(scaled.to_original(boxes)).astype(int).reshape(-1, 4).tolist():
+                    w, h = x2 - x1, y2 - y1
+                    aspect_ratio = w / h if h > 0 else 0
+                    
+                    # License plates typically have an aspect ratio between 2:1 and 4:1 (sizes in full-frame pixels)
+                    if 1.5 < aspect_ratio < 5.0 and w > 60 and h > 20:
+                        license_plate_detections.append({
+                            'bbox': (x1, y1, x2, y2),
+                            'confidence': 0.5,  # Placeholder confidence
+                            'vehicle_bbox': None
+                        })
             
             return license_plate_detections
         
         except Exception as e:
             logger.error(f"Error detecting license plates: {e}")
             return []
+    
+    def detect_license_plates_batch(self, images, vehicle_detections_batch=None, contexts=None):
+        """
+        Detect license plates in several frames
+        
+        Args:
+            images: List of OpenCV images, or a stacked (N, H, W, 3) array
+            vehicle_detections_batch: Optional list with the vehicle detections of each image
+            contexts: Optional list of FrameContext objects, one per image
+            
+        Returns:
+            List with one list of license plate detections per image, in input order
+        """
+        count = len(images)
+        vehicle_detections_batch = vehicle_detections_batch or [None] * count
+        contexts = contexts or [None] * count
+        
+        # Plates are located geometrically inside the vehicle boxes, so there
+        # is no model call to share across the batch yet
+        return [self.detect_license_plates(image, vehicles, context)
+                for image, vehicles, context in zip(images, vehicle_detections_batch, contexts)]
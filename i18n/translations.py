@@ -54,6 +54,10 @@ TRANSLATIONS = {
 
         # Video processing
         'processing_frame': 'Processing Frame',
+        'parallel_processing': 'Parallel processing (use all CPU cores)',
+        'parallel_unsupported_sampling': 'Parallel processing only supports frame-count sampling; processing sequentially',
+        'frames_decoded': 'Decoded Frames',
+        'static_frames_skipped': 'Static Frames Skipped',
         'frame': 'Frame',
         'video_processing_complete': 'Video Processing Complete',
         'view_all_detections': 'View All License Plate Detections',
@@ -163,6 +167,10 @@ TRANSLATIONS = {
 
         # Video processing
         'processing_frame': '正在处理帧',
+        'parallel_processing': '并行处理（使用所有CPU核心）',
+        'parallel_unsupported_sampling': '并行处理仅支持按帧数采样，将按顺序处理',
+        'frames_decoded': '已解码帧数',
+        'static_frames_skipped': '跳过的静止帧',
         'frame': '帧',
         'video_processing_complete': '视频处理完成',
         'view_all_detections': '查看所有车牌检测结果',
@@ -13,12 +13,20 @@ class DetectionResult(db.Model):
     """
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
-    detection_type = db.Column(db.String(50), nullable=False)  # 'license_plate' or 'lane_intrusion'
+    detection_type = db.Column(db.String(50), nullable=False)  # 'license_plate', 'lane_intrusion' or 'combined'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # For storage of the result image
     result_path = db.Column(db.String(255))
 
+    # Background processing job state (videos only)
+    job_id = db.Column(db.String(32), nullable=True, index=True)
+    status = db.Column(db.String(20), nullable=True)  # 'queued', 'running', 'completed', 'failed' or 'cancelled'
+    progress = db.Column(db.Integer, default=0)
+    processed_frames = db.Column(db.Integer, default=0)
+    total_frames = db.Column(db.Integer, default=0)
+    error_message = db.Column(db.Text, nullable=True)
+
     # Relationship with detection items (license plates or intrusions)
     items = db.relationship('DetectionItem', backref='detection', cascade="all, delete-orphan")
 
@@ -0,0 +1,134 @@
+"""
+Quantize the YOLOv8 ONNX model to INT8, calibrated on frames from our own uploads
+
+Usage:
+    python quantize_model.py [--model models/yolov8n.onnx] [--output models/yolov8n.int8.onnx]
+        [--source static/uploads] [--max-frames 200] [--frames-per-video 10]
+
+Static quantization (QDQ format): weights are INT8 per channel, activations
+UINT8 with ranges calibrated on letterboxed frames from the original uploads
+(annotated result_, preview_, processed_ and realtime_ outputs are skipped).
+The detection head (/model.22/ in Ultralytics exports) stays in FP32 by
+default, since quantizing its box regression costs most of the accuracy.
+Run with YOLO_PRECISION=int8 afterwards and compare the two models with
+benchmarks/benchmark_quantization.py. Needs the onnx package in addition
+to onnxruntime.
+"""
+import os
+import sys
+import logging
+import argparse
+import tempfile
+from itertools import islice
+
+import cv2
+
+import config
+from detection.yolo_detector import letterbox_batch
+from utils.video import get_video_info, iter_frames
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+VIDEO_EXTENSIONS = ('.mp4', '.avi')
+
+# Files the apps write next to the uploads: annotated results (routes, save_detection_result),
+# video previews, Streamlit's processed images and realtime captures (save_capture, which stores
+# the canvas with the overlay drawn on it). Their drawn boxes and text would skew calibration.
+GENERATED_PREFIXES = ('result_', 'preview_', 'processed_', 'realtime_')
+
+def iter_source_frames(source_dir, frames_per_video):
+    """Yield frames from the original images and videos in a directory (videos sampled evenly)"""
+    for name in sorted(os.listdir(source_dir)):
+        if name.startswith(GENERATED_PREFIXES):
+            continue
+
+        path = os.path.join(source_dir, name)
+        extension = os.path.splitext(name)[1].lower()
+
+        if extension in IMAGE_EXTENSIONS:
+            image = cv2.imread(path)
+            if image is not None:
+                yield image
+        elif extension in VIDEO_EXTENSIONS:
+            total_frames = get_video_info(path)['total_frames']
+            interval = max(1, total_frames // frames_per_video) if total_frames else 1
+            for _, frame in islice(iter_frames(path, interval), frames_per_video):
+                yield frame
+
+class UploadCalibrationReader:
+    def __init__(self, input_name, source_dir, max_frames, frames_per_video, input_size):
+        """
+        Calibration data reader for onnxruntime.quantization.quantize_static
+
+        Frames are letterboxed exactly like YOLODetector does at inference time
+        and fed one at a time, so fixed-batch exports work too.
+        """
+        self.input_name = input_name
+        self.frames = islice(iter_source_frames(source_dir, frames_per_video), max_frames)
+        self.input_size = input_size
+        self.count = 0
+
+    def get_next(self):
+        frame = next(self.frames, None)
+        if frame is None:
+            return None
+
+        self.count += 1
+        tensor, _, _ = letterbox_batch([frame], self.input_size)
+        return {self.input_name: tensor}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=config.YOLO_MODEL, help='FP32 ONNX model')
+    parser.add_argument('--output', default=config.YOLO_INT8_MODEL, help='INT8 model to write')
+    parser.add_argument('--source', default=config.UPLOAD_DIR, help='Directory with calibration images and videos')
+    parser.add_argument('--max-frames', type=int, default=200, help='Calibration frames in total')
+    parser.add_argument('--frames-per-video', type=int, default=10, help='Frames sampled from each video')
+    parser.add_argument('--exclude-prefix', nargs='*', default=['/model.22/'],
+                        help='Keep nodes whose names start with these prefixes in FP32')
+    args = parser.parse_args()
+
+    try:
+        import onnx
+        from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+    except ImportError as e:
+        logger.error(f"Quantization needs onnx and onnxruntime: {e}")
+        return 1
+
+    if not os.path.exists(args.model):
+        logger.error(f"Model file not found: {args.model}")
+        return 1
+
+    if not os.path.isdir(args.source) or next(iter_source_frames(args.source, 1), None) is None:
+        logger.error(f"No calibration images or videos found in {args.source}")
+        return 1
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Shape inference and graph cleanup give the quantizer a better graph to work on
+        prepared_path = os.path.join(temp_dir, 'prepared.onnx')
+        quant_pre_process(args.model, prepared_path)
+
+        model = onnx.load(prepared_path)
+        input_name = model.graph.input[0].name
+        excluded = [node.name for node in model.graph.node
+                    if any(node.name.startswith(prefix) for prefix in args.exclude_prefix)]
+
+        reader = UploadCalibrationReader(input_name, args.source, args.max_frames, args.frames_per_video,
+                                         (config.YOLO_INPUT_SIZE, config.YOLO_INPUT_SIZE))
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        quantize_static(prepared_path, args.output, reader,
+                        quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8,
+                        weight_type=QuantType.QInt8,
+                        per_channel=True,
+                        calibrate_method=CalibrationMethod.MinMax,
+                        nodes_to_exclude=excluded)
+
+    logger.info(f"Wrote {args.output}: calibrated on {reader.count} frames, {len(excluded)} nodes kept in FP32")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
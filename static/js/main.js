@@ -165,6 +165,16 @@ function setupDetectionOptions() {
     }
 }
 
+// Whether a detection type runs license plate recognition ('license_plate' or 'combined')
+function runsPlateStage(detectionType) {
+    return detectionType === 'license_plate' || detectionType === 'combined';
+}
+
+// Whether a detection type runs lane intrusion detection ('lane_intrusion' or 'combined')
+function runsLaneStage(detectionType) {
+    return detectionType === 'lane_intrusion' || detectionType === 'combined';
+}
+
 // Update the description based on selected detection type
 function updateDetectionDescription(detectionType) {
     const descriptionElement = document.getElementById('detectionDescription');
@@ -176,6 +186,8 @@ function updateDetectionDescription(detectionType) {
         description = getTranslatedText('license_plate_description');
     } else if (detectionType === 'lane_intrusion') {
         description = getTranslatedText('lane_intrusion_description');
+    } else if (detectionType === 'combined') {
+        description = getTranslatedText('combined_description');
     } else {
         description = '';
     }
@@ -192,12 +204,16 @@ function updateDetectionDescription(detectionType) {
 // Setup video processing functionality
 function setupVideoProcessing() {
     const processVideoBtn = document.getElementById('processVideoBtn');
+    const cancelVideoBtn = document.getElementById('cancelVideoBtn');
     const videoResults = document.getElementById('videoResults');
     const videoProgressContainer = document.getElementById('videoProgressContainer');
     const videoProgressBar = document.getElementById('videoProgressBar');
 
     if (!processVideoBtn) return;
 
+    let pollTimeoutId = null;
+    let currentJob = null;
+
     processVideoBtn.addEventListener('click', function() {
         const filepath = this.getAttribute('data-filepath');
         const detectionType = this.getAttribute('data-detection-type');
@@ -208,8 +224,9 @@ function setupVideoProcessing() {
         videoProgressContainer.style.display = 'block';
         videoProgressBar.style.width = '0%';
         videoResults.innerHTML = '<div class="text-center mt-3"><div class="spinner-border text-primary" role="status"></div><p class="mt-2">' + getTranslatedText('processing_video') + '</p></div>';
+        processVideoBtn.disabled = true;
 
-        // Process the video via AJAX
+        // Submit the video as a background job
         const formData = new FormData();
         formData.append('filepath', filepath);
         formData.append('detection_type', detectionType);
@@ -221,112 +238,295 @@ function setupVideoProcessing() {
         .then(response => response.json())
         .then(data => {
             if (data.error) {
-                videoResults.innerHTML = '<div class="alert alert-danger">' + data.error + '</div>';
+                showVideoError(data.error);
                 return;
             }
 
-            videoResults.innerHTML = '';
+            currentJob = {
+                statusUrl: data.status_url,
+                resultsUrl: data.results_url,
+                cancelUrl: data.cancel_url,
+                streamUrl: data.stream_url,
+                detectionType: detectionType,
+                offset: 0
+            };
 
-            // Create results summary
+            videoResults.innerHTML = '';
             const summary = document.createElement('div');
+            summary.id = 'videoSummary';
             summary.classList.add('alert', 'alert-info', 'mt-3');
-            summary.innerHTML = `
-                <h4>${getTranslatedText('processing_complete')}</h4>
-                <p>${getTranslatedText('processed_frames')}: ${data.processed_frames}/${data.total_frames}</p>
-                <p>${getTranslatedText('detections_found')}: ${data.detections_count}</p>
-            `;
             videoResults.appendChild(summary);
 
-            // Show frames with detections
             const detectionsContainer = document.createElement('div');
+            detectionsContainer.id = 'videoDetections';
             detectionsContainer.classList.add('row', 'mt-3');
+            videoResults.appendChild(detectionsContainer);
+
+            if (cancelVideoBtn) {
+                cancelVideoBtn.style.display = 'inline-block';
+                cancelVideoBtn.disabled = false;
+            }
+
+            // Polling by default; streaming holds a server worker for the whole job,
+            // so the server only asks for it when it runs threaded workers
+            if (data.stream_results) {
+                streamJob();
+            } else {
+                pollJob();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            showVideoError(error.message);
+        });
+    });
+
+    if (cancelVideoBtn) {
+        cancelVideoBtn.addEventListener('click', function() {
+            if (!currentJob) return;
 
-            data.results.forEach(result => {
-                if ((result.detections && result.detections.length > 0) || (result.intrusions && result.intrusions.length > 0)) {
-                    const col = document.createElement('div');
-                    col.classList.add('col-md-6', 'mb-3');
-
-                    const card = document.createElement('div');
-                    card.classList.add('card');
-
-                    // Card header with frame info
-                    const cardHeader = document.createElement('div');
-                    cardHeader.classList.add('card-header');
-                    cardHeader.textContent = `${getTranslatedText('frame')} ${result.frame}`;
-
-                    // Card body with image and detections
-                    const cardBody = document.createElement('div');
-                    cardBody.classList.add('card-body', 'text-center');
-
-                    // Add the frame image with correct path
-                    const img = document.createElement('img');
-                    img.classList.add('img-fluid', 'rounded', 'mb-2', 'detection-image');
-                    // Ensure we use the correct static path
-                    img.src = result.frame_path.startsWith('/') ? result.frame_path : '/static/' + result.frame_path;
-                    img.onerror = function() {
-                        console.error('Failed to load image:', result.frame_path);
-                        this.alt = 'Error loading image';
-                    };
-
-                    cardBody.appendChild(img);
-
-                    // Add detection/intrusion info below the image
-                    if (detectionType === 'license_plate' && result.detections) {
-                        const detectionInfo = document.createElement('div');
-                        detectionInfo.classList.add('mt-2');
-
-                        result.detections.forEach((detection, index) => {
-                            if (detection.license_plate) {
-                                const plateDiv = document.createElement('div');
-                                plateDiv.classList.add('license-plate', 'mb-2', 'mt-2');
-                                plateDiv.textContent = detection.license_plate;
-                                
-                                const confidenceDiv = document.createElement('div');
-                                confidenceDiv.classList.add('confidence-score');
-                                confidenceDiv.textContent = `${(detection.confidence * 100).toFixed(1)}%`;
-                                
-                                detectionInfo.appendChild(plateDiv);
-                                detectionInfo.appendChild(confidenceDiv);
-                            }
-                        });
-
-                        cardBody.appendChild(detectionInfo);
+            cancelVideoBtn.disabled = true;
+            fetch(currentJob.cancelUrl, { method: 'POST' })
+            .catch(error => console.error('Error cancelling job:', error));
+        });
+    }
+
+    // Consume the job's NDJSON stream, rendering each record as it arrives
+    function streamJob() {
+        const job = currentJob;
+
+        fetch(job.streamUrl + '?format=ndjson&offset=' + job.offset)
+        .then(response => {
+            if (!response.ok || !response.body) {
+                throw new Error('Streaming not available');
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let finished = false;
+
+            function handleLine(line) {
+                if (!line.trim()) return;
+
+                const record = JSON.parse(line);
+                if (record.type === 'frame') {
+                    const col = renderFrameResult(record, job.detectionType);
+                    if (col) {
+                        document.getElementById('videoDetections').appendChild(col);
+                    }
+                    // Offsets may jump when the server dropped frames this reader had not seen
+                    job.offset = record.offset !== undefined ? record.offset + 1 : job.offset + 1;
+                } else if (record.type === 'progress') {
+                    videoProgressBar.style.width = record.progress + '%';
+                    updateVideoSummary(record);
+                } else if (record.type === 'summary') {
+                    finished = true;
+                    updateVideoSummary(record);
+                    finishJob(record);
+                } else if (record.type === 'error') {
+                    finished = true;
+                    showVideoError(record.error);
+                }
+            }
+
+            function read() {
+                return reader.read().then(({ done, value }) => {
+                    if (value) {
+                        buffer += decoder.decode(value, { stream: true });
+                        const lines = buffer.split('\n');
+                        buffer = lines.pop();
+                        lines.forEach(handleLine);
                     }
 
-                    card.appendChild(cardHeader);
-                    card.appendChild(cardBody);
-                    col.appendChild(card);
+                    if (done) {
+                        handleLine(buffer);
+                        if (!finished && currentJob === job) {
+                            // Stream closed early (e.g. proxy timeout); fall back to polling
+                            pollJob();
+                        }
+                        return;
+                    }
+
+                    return read();
+                });
+            }
+
+            return read();
+        })
+        .catch(error => {
+            console.error('Error streaming job:', error);
+            if (currentJob === job) {
+                pollJob();
+            }
+        });
+    }
+
+    // Poll job progress and fetch any new frame results
+    function pollJob() {
+        const job = currentJob;
+
+        Promise.all([
+            fetch(job.statusUrl).then(response => response.json()),
+            fetch(job.resultsUrl + '?offset=' + job.offset).then(response => response.json())
+        ])
+        .then(([status, page]) => {
+            if (status.error) {
+                showVideoError(status.error);
+                return;
+            }
+
+            const detectionsContainer = document.getElementById('videoDetections');
+            (page.results || []).forEach(result => {
+                const col = renderFrameResult(result, job.detectionType);
+                if (col) {
                     detectionsContainer.appendChild(col);
                 }
             });
-
-            if (detectionsContainer.children.length === 0) {
-                const noDetections = document.createElement('div');
-                noDetections.classList.add('alert', 'alert-warning');
-                noDetections.textContent = getTranslatedText('no_detections_found');
-                detectionsContainer.appendChild(noDetections);
+            if (page.next_offset !== undefined) {
+                job.offset = page.next_offset;
             }
 
-            videoResults.appendChild(detectionsContainer);
-            videoProgressContainer.style.display = 'none';
+            videoProgressBar.style.width = status.progress + '%';
+            updateVideoSummary(status);
+
+            if (['completed', 'failed', 'cancelled'].includes(status.status)) {
+                finishJob(status);
+            } else {
+                pollTimeoutId = setTimeout(pollJob, 1000);
+            }
         })
         .catch(error => {
-            console.error('Error:', error);
-            videoResults.innerHTML = '<div class="alert alert-danger">' + getTranslatedText('processing_error') + ': ' + error.message + '</div>';
-            videoProgressContainer.style.display = 'none';
+            console.error('Error polling job:', error);
+            pollTimeoutId = setTimeout(pollJob, 3000);
         });
+    }
 
-        // Update progress bar
-        let progress = 0;
-        const progressInterval = setInterval(function() {
-            progress += 2;
-            videoProgressBar.style.width = Math.min(progress, 100) + '%';
+    function updateVideoSummary(status) {
+        const summary = document.getElementById('videoSummary');
+        if (!summary) return;
 
-            if (progress >= 100) {
-                clearInterval(progressInterval);
+        const title = status.status === 'completed' ? getTranslatedText('processing_complete') : getTranslatedText('processing_video');
+        summary.innerHTML = `
+            <h4>${title}</h4>
+            <p>${getTranslatedText('processed_frames')}: ${status.processed_frames}/${status.total_frames}</p>
+            <p>${getTranslatedText('detections_found')}: ${status.detections_count}</p>
+        `;
+
+        if (status.sampling) {
+            summary.innerHTML += `<p class="small mb-0">${getTranslatedText('static_frames_skipped')}: ${status.sampling.frames_static}</p>`;
+        }
+    }
+
+    function finishJob(status) {
+        clearTimeout(pollTimeoutId);
+        currentJob = null;
+        processVideoBtn.disabled = false;
+        videoProgressContainer.style.display = 'none';
+        if (cancelVideoBtn) {
+            cancelVideoBtn.style.display = 'none';
+        }
+
+        // Play the annotated output video instead of loading one image per frame
+        const resultVideoContainer = document.getElementById('resultVideoContainer');
+        if (resultVideoContainer && status.outputs && status.outputs.video_url) {
+            document.getElementById('resultVideo').src = status.outputs.video_url;
+            resultVideoContainer.style.display = 'block';
+        }
+
+        const summary = document.getElementById('videoSummary');
+        if (status.status === 'failed') {
+            showVideoError(status.error);
+        } else if (status.status === 'cancelled' && summary) {
+            summary.classList.replace('alert-info', 'alert-warning');
+            summary.querySelector('h4').textContent = getTranslatedText('processing_cancelled');
+        }
+
+        const detectionsContainer = document.getElementById('videoDetections');
+        if (detectionsContainer && detectionsContainer.children.length === 0) {
+            const noDetections = document.createElement('div');
+            noDetections.classList.add('alert', 'alert-warning');
+            noDetections.textContent = getTranslatedText('no_detections_found');
+            detectionsContainer.appendChild(noDetections);
+        }
+    }
+
+    function showVideoError(message) {
+        clearTimeout(pollTimeoutId);
+        currentJob = null;
+        processVideoBtn.disabled = false;
+        videoResults.innerHTML = '<div class="alert alert-danger">' + getTranslatedText('processing_error') + ': ' + message + '</div>';
+        videoProgressContainer.style.display = 'none';
+        if (cancelVideoBtn) {
+            cancelVideoBtn.style.display = 'none';
+        }
+    }
+}
+
+// Build a result card for a processed video frame (null if the frame has no detections)
+function renderFrameResult(result, detectionType) {
+    if (!((result.detections && result.detections.length > 0) || (result.intrusions && result.intrusions.length > 0))) {
+        return null;
+    }
+
+    const col = document.createElement('div');
+    col.classList.add('col-md-6', 'mb-3');
+
+    const card = document.createElement('div');
+    card.classList.add('card');
+
+    // Card header with frame info
+    const cardHeader = document.createElement('div');
+    cardHeader.classList.add('card-header');
+    cardHeader.textContent = `${getTranslatedText('frame')} ${result.frame}`;
+
+    // Card body with detections and a link into the annotated video
+    const cardBody = document.createElement('div');
+    cardBody.classList.add('card-body', 'text-center');
+
+    if (result.video_time !== undefined) {
+        const seekBtn = document.createElement('button');
+        seekBtn.type = 'button';
+        seekBtn.classList.add('btn', 'btn-sm', 'btn-outline-primary', 'mb-2');
+        seekBtn.innerHTML = `<i class="fas fa-play me-1"></i>${getTranslatedText('show_in_video')} (${result.video_time.toFixed(1)}s)`;
+        seekBtn.addEventListener('click', function() {
+            const video = document.getElementById('resultVideo');
+            if (!video || !video.src) return;
+
+            video.currentTime = result.video_time;
+            video.pause();
+            video.scrollIntoView({ behavior: 'smooth', block: 'center' });
+        });
+        cardBody.appendChild(seekBtn);
+    }
+
+    // Add detection/intrusion info below the image
+    if (runsPlateStage(detectionType) && result.detections) {
+        const detectionInfo = document.createElement('div');
+        detectionInfo.classList.add('mt-2');
+
+        result.detections.forEach((detection, index) => {
+            if (detection.license_plate) {
+                const plateDiv = document.createElement('div');
+                plateDiv.classList.add('license-plate', 'mb-2', 'mt-2');
+                plateDiv.textContent = detection.license_plate;
+                
+                const confidenceDiv = document.createElement('div');
+                confidenceDiv.classList.add('confidence-score');
+                confidenceDiv.textContent = `${(detection.confidence * 100).toFixed(1)}%`;
+                
+                detectionInfo.appendChild(plateDiv);
+                detectionInfo.appendChild(confidenceDiv);
             }
-        }, 200);
-    });
+        });
+
+        cardBody.appendChild(detectionInfo);
+    }
+
+    card.appendChild(cardHeader);
+    card.appendChild(cardBody);
+    col.appendChild(card);
+    return col;
 }
 
 // Add realtime detection link to navbar
@@ -383,6 +583,7 @@ function initRealtimeDetection() {
     const intervalValue = document.getElementById('intervalValue');
     const autoSaveSwitch = document.getElementById('autoSaveSwitch');
     const showBoundingBoxesSwitch = document.getElementById('showBoundingBoxesSwitch');
+    const responseModeSelect = document.getElementById('responseModeSelect');
     const realtimeDetectionOptions = document.querySelectorAll('input[name="realtime_detection_type"]');
 
     // If elements don't exist, we're not on the realtime page
@@ -393,6 +594,15 @@ function initRealtimeDetection() {
     let processingIntervalId = null;
     let currentDetectionType = 'license_plate';
     let captureCount = 0;
+    let socket = null;
+    let socketFrameId = 0;
+    let framesInFlight = 0;
+    const MAX_FRAMES_IN_FLIGHT = 2;
+    // 'overlay': the server sends structured overlays that are drawn here; 'image': annotated JPEGs
+    let responseMode = responseModeSelect ? responseModeSelect.value : 'overlay';
+    let lastOverlayData = null;
+    // Latest captured camera frame, kept clean so each overlay is drawn over the frame alone
+    const frameCanvas = document.createElement('canvas');
 
     // Update interval display
     processingInterval.addEventListener('input', function() {
@@ -409,6 +619,8 @@ function initRealtimeDetection() {
     realtimeDetectionOptions.forEach(option => {
         option.addEventListener('change', function() {
             currentDetectionType = this.value;
+            lastOverlayData = null;
+            sendSocketConfig();
 
             // Clear results
             liveResults.innerHTML = '<div class="text-center p-3"><div class="spinner-border text-primary"></div><p class="mt-2">' +
@@ -416,6 +628,17 @@ function initRealtimeDetection() {
         });
     });
 
+    // Keep the WebSocket session in sync with the overlay setting
+    showBoundingBoxesSwitch.addEventListener('change', sendSocketConfig);
+
+    if (responseModeSelect) {
+        responseModeSelect.addEventListener('change', function() {
+            responseMode = this.value;
+            lastOverlayData = null;
+            sendSocketConfig();
+        });
+    }
+
     // Enumerate cameras
     async function getCameras() {
         try {
@@ -473,6 +696,7 @@ function initRealtimeDetection() {
             captureBtn.disabled = false;
 
             // Start processing
+            openSocket();
             startProcessing();
 
             // Update camera list with labels (requires permission)
@@ -506,7 +730,87 @@ function initRealtimeDetection() {
                 clearInterval(processingIntervalId);
                 processingIntervalId = null;
             }
+            closeSocket();
+        }
+    }
+
+    // Open the binary WebSocket transport; frames fall back to HTTP POSTs while it is not open
+    function openSocket() {
+        if (!('WebSocket' in window) || socket) return;
+
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        socket = new WebSocket(`${protocol}//${window.location.host}/ws/realtime`);
+        socket.binaryType = 'arraybuffer';
+        framesInFlight = 0;
+
+        socket.onopen = sendSocketConfig;
+        socket.onmessage = event => handleSocketMessage(event.data);
+        socket.onclose = () => {
+            socket = null;
+            framesInFlight = 0;
+        };
+        socket.onerror = error => {
+            console.error('Realtime WebSocket error:', error);
+        };
+    }
+
+    function closeSocket() {
+        if (socket) {
+            socket.close();
+            socket = null;
+        }
+        framesInFlight = 0;
+    }
+
+    function socketReady() {
+        return socket && socket.readyState === WebSocket.OPEN;
+    }
+
+    function sendSocketConfig() {
+        if (!socketReady()) return;
+
+        socket.send(JSON.stringify({
+            detection_type: currentDetectionType,
+            show_boxes: showBoundingBoxesSwitch.checked,
+            response_mode: responseMode,
+            source_id: cameraSelect.value
+        }));
+    }
+
+    // Send one frame as [uint32 frame id][JPEG bytes]
+    function sendFrameOverSocket() {
+        // Skip frames while the server is behind instead of queueing them
+        if (framesInFlight >= MAX_FRAMES_IN_FLIGHT) return;
+        framesInFlight++;
+
+        frameCanvas.toBlob(blob => {
+            if (!blob || !socketReady()) {
+                framesInFlight = Math.max(0, framesInFlight - 1);
+                return;
+            }
+
+            const header = new ArrayBuffer(4);
+            new DataView(header).setUint32(0, ++socketFrameId);
+            socket.send(new Blob([header, blob]));
+        }, 'image/jpeg', 0.8);
+    }
+
+    // Parse a [uint32 header length][JSON header][optional JPEG] response
+    function handleSocketMessage(buffer) {
+        // The server may drop stale frames, so one response can settle several sent frames
+        framesInFlight = 0;
+
+        const view = new DataView(buffer);
+        const headerLength = view.getUint32(0);
+        const header = new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength));
+        const data = JSON.parse(header);
+
+        const imageBytes = new Uint8Array(buffer, 4 + headerLength);
+        if (imageBytes.length > 0) {
+            data.processed_blob = new Blob([imageBytes], { type: 'image/jpeg' });
         }
+
+        handleFrameResult(data);
     }
 
     // Start processing frames
@@ -522,61 +826,171 @@ function initRealtimeDetection() {
     function processFrame() {
         if (!stream) return;
 
-        // Draw current frame to canvas
-        const context = processingCanvas.getContext('2d');
-        processingCanvas.width = cameraFeed.videoWidth;
-        processingCanvas.height = cameraFeed.videoHeight;
-        context.drawImage(cameraFeed, 0, 0, processingCanvas.width, processingCanvas.height);
+        // Capture the current frame, then show it with the latest overlay until a fresh one arrives
+        frameCanvas.width = processingCanvas.width = cameraFeed.videoWidth;
+        frameCanvas.height = processingCanvas.height = cameraFeed.videoHeight;
+        frameCanvas.getContext('2d').drawImage(cameraFeed, 0, 0, frameCanvas.width, frameCanvas.height);
+        redrawCanvas();
+
+        if (socketReady()) {
+            sendFrameOverSocket();
+            return;
+        }
 
         // Get image data
-        const imageData = processingCanvas.toDataURL('image/jpeg');
+        const imageData = frameCanvas.toDataURL('image/jpeg');
 
         // Send to server for processing
         const formData = new FormData();
         formData.append('image_data', imageData);
         formData.append('detection_type', currentDetectionType);
         formData.append('show_boxes', showBoundingBoxesSwitch.checked);
+        formData.append('response_mode', responseMode);
+        formData.append('source_id', cameraSelect.value);
 
         fetch('/process_realtime', {
             method: 'POST',
             body: formData
         })
         .then(response => response.json())
-        .then(data => {
-            if (data.error) {
-                console.error('Processing error:', data.error);
-                return;
-            }
+        .then(handleFrameResult)
+        .catch(error => {
+            console.error('Error processing frame:', error);
+        });
+    }
 
-            // Update canvas with processed image
-            if (data.processed_image) {
-                const img = new Image();
-                img.onload = function() {
-                    context.drawImage(img, 0, 0, processingCanvas.width, processingCanvas.height);
-                };
-                img.src = 'data:image/jpeg;base64,' + data.processed_image;
-            }
+    // Draw the captured frame and the latest overlay together, so no earlier boxes remain
+    function redrawCanvas() {
+        const context = processingCanvas.getContext('2d');
+        context.drawImage(frameCanvas, 0, 0);
+        drawOverlay(context, lastOverlayData);
+    }
+
+    // Show a processed frame result, from either transport
+    function handleFrameResult(data) {
+        if (data.error) {
+            console.error('Processing error:', data.error);
+            return;
+        }
+
+        // Update canvas with the overlay or the processed image
+        const context = processingCanvas.getContext('2d');
+        if (data.overlay) {
+            lastOverlayData = data;
+            redrawCanvas();
+        } else if (data.processed_blob) {
+            const url = URL.createObjectURL(data.processed_blob);
+            const img = new Image();
+            img.onload = function() {
+                context.drawImage(img, 0, 0, processingCanvas.width, processingCanvas.height);
+                URL.revokeObjectURL(url);
+            };
+            img.src = url;
+            delete data.processed_blob;
+        } else if (data.processed_image) {
+            const img = new Image();
+            img.onload = function() {
+                context.drawImage(img, 0, 0, processingCanvas.width, processingCanvas.height);
+            };
+            img.src = 'data:image/jpeg;base64,' + data.processed_image;
+        }
+
+        // Update results
+        updateLiveResults(data);
+
+        // Auto-save if enabled and detections found
+        if (autoSaveSwitch.checked && hasDetections(data)) {
+            captureCurrentFrame(data);
+        }
+    }
+
+    // Draw detection boxes, lanes and tracks from a structured overlay response
+    function drawOverlay(context, data) {
+        if (!data || !data.overlay || !showBoundingBoxesSwitch.checked) return;
+
+        const laneColors = ['rgb(0, 255, 0)', 'rgb(255, 255, 0)', 'rgb(255, 0, 0)'];
+        const laneColor = lane => lane === -1 || lane === undefined ? 'rgb(128, 128, 128)' : laneColors[lane % laneColors.length];
+
+        context.lineWidth = 2;
+        context.font = '16px sans-serif';
 
-            // Update results
-            updateLiveResults(data);
+        const drawPlates = () => {
+            (data.detections || []).forEach(detection => {
+                const [x1, y1, x2, y2] = detection.bbox;
+                context.strokeStyle = 'rgb(0, 255, 0)';
+                context.strokeRect(x1, y1, x2 - x1, y2 - y1);
 
-            // Auto-save if enabled and detections found
-            if (autoSaveSwitch.checked && hasDetections(data)) {
-                captureCurrentFrame(data);
+                if (detection.license_plate) {
+                    const textWidth = context.measureText(detection.license_plate).width;
+                    context.fillStyle = 'rgb(0, 255, 0)';
+                    context.fillRect(x1, y1 - 25, textWidth + 10, 25);
+                    context.fillStyle = 'rgb(0, 0, 0)';
+                    context.fillText(detection.license_plate, x1 + 5, y1 - 7);
+                }
+            });
+        };
+
+        if (!runsLaneStage(currentDetectionType)) {
+            (data.vehicles || []).forEach(vehicle => {
+                const [x1, y1, x2, y2] = vehicle.bbox;
+                context.strokeStyle = 'rgb(0, 0, 255)';
+                context.strokeRect(x1, y1, x2 - x1, y2 - y1);
+            });
+
+            drawPlates();
+            return;
+        }
+
+        // Lane polygons
+        data.overlay.lanes.forEach((polygon, index) => {
+            context.strokeStyle = laneColors[index % laneColors.length];
+            context.beginPath();
+            polygon.forEach(([x, y], i) => i === 0 ? context.moveTo(x, y) : context.lineTo(x, y));
+            context.closePath();
+            context.stroke();
+        });
+
+        // Tracked vehicles with IDs and track tails
+        (data.vehicles || []).forEach(vehicle => {
+            const [x1, y1, x2, y2] = vehicle.bbox;
+            const color = laneColor(vehicle.lane);
+            context.strokeStyle = color;
+            context.fillStyle = color;
+            context.strokeRect(x1, y1, x2 - x1, y2 - y1);
+            context.fillText(`ID: ${vehicle.id}`, x1, y1 - 10);
+
+            const track = data.overlay.tracks[vehicle.id] || [];
+            if (track.length > 1) {
+                context.beginPath();
+                track.forEach(([x, y], i) => i === 0 ? context.moveTo(x, y) : context.lineTo(x, y));
+                context.stroke();
             }
-        })
-        .catch(error => {
-            console.error('Error processing frame:', error);
         });
+
+        // Intrusion alerts
+        (data.intrusions || []).forEach(intrusion => {
+            const [x1, y1, x2, y2] = intrusion.vehicle_bbox;
+            context.lineWidth = 3;
+            context.strokeStyle = 'rgb(255, 0, 0)';
+            context.strokeRect(x1 - 5, y1 - 5, x2 - x1 + 10, y2 - y1 + 10);
+            context.fillStyle = 'rgb(255, 0, 0)';
+            context.fillText(`LANE INTRUSION: ${intrusion.from_lane + 1} -> ${intrusion.to_lane + 1}`, x1, y1 - 50);
+        });
+
+        // Plates on top of the tracked vehicles in combined mode
+        if (runsPlateStage(currentDetectionType)) {
+            context.lineWidth = 2;
+            drawPlates();
+        }
     }
 
     // Check if data has detections
     function hasDetections(data) {
-        if (currentDetectionType === 'license_plate') {
-            return data.detections && data.detections.some(d => d.license_plate);
-        } else {
-            return data.intrusions && data.intrusions.length > 0;
-        }
+        const hasPlates = runsPlateStage(currentDetectionType) &&
+            Boolean(data.detections && data.detections.some(d => d.license_plate));
+        const hasIntrusions = runsLaneStage(currentDetectionType) &&
+            Boolean(data.intrusions && data.intrusions.length > 0);
+        return hasPlates || hasIntrusions;
     }
 
     // Update live results display
@@ -584,7 +998,7 @@ function initRealtimeDetection() {
         // Clear previous results
         liveResults.innerHTML = '';
 
-        if (currentDetectionType === 'license_plate' && data.detections) {
+        if (runsPlateStage(currentDetectionType) && data.detections) {
             // Filter detections with license plates
             const plateDetections = data.detections.filter(d => d.license_plate);
 
@@ -615,7 +1029,9 @@ function initRealtimeDetection() {
                 noDetections.textContent = getTranslatedText('no_plates_detected');
                 liveResults.appendChild(noDetections);
             }
-        } else if (currentDetectionType === 'lane_intrusion' && data.intrusions) {
+        }
+
+        if (runsLaneStage(currentDetectionType) && data.intrusions) {
             if (data.intrusions.length > 0) {
                 // Create header
                 const header = document.createElement('h6');
@@ -755,6 +1171,9 @@ function getTranslatedText(key) {
             'unsupported_file_type': 'Unsupported file type. Please upload an image or video.',
             'processing_video': 'Processing video. This may take a few minutes...',
             'processing_complete': 'Processing Complete',
+            'processing_cancelled': 'Processing Cancelled',
+            'static_frames_skipped': 'Static frames skipped',
+            'show_in_video': 'Show in video',
             'processed_frames': 'Processed Frames',
             'detections_found': 'Detections Found',
             'frame': 'Frame',
@@ -764,6 +1183,7 @@ function getTranslatedText(key) {
             'processing_error': 'Error processing video',
             'license_plate_description': 'This mode detects and recognizes Chinese license plates in the image or video.',
             'lane_intrusion_description': 'This mode detects vehicles crossing lanes at intersections.',
+            'combined_description': 'This mode recognizes license plates and detects lane intrusions in one pass, linking plates to tracked vehicles.',
             'default_camera': 'Default Camera',
             'camera_error': 'Camera error',
             'detected_license_plates': 'Detected License Plates',
@@ -778,6 +1198,9 @@ function getTranslatedText(key) {
             'unsupported_file_type': '不支持的文件类型。请上传图像或视频。',
             'processing_video': '正在处理视频。这可能需要几分钟...',
             'processing_complete': '处理完成',
+            'processing_cancelled': '处理已取消',
+            'static_frames_skipped': '跳过的静止帧',
+            'show_in_video': '在视频中查看',
             'processed_frames': '已处理帧数',
             'detections_found': '检测到的对象',
             'frame': '帧',
@@ -787,6 +1210,7 @@ function getTranslatedText(key) {
             'processing_error': '处理视频时出错',
             'license_plate_description': '此模式检测并识别图像或视频中的中国车牌。',
             'lane_intrusion_description': '此模式检测在十字路口穿越车道的车辆。',
+            'combined_description': '此模式一次完成车牌识别和车道入侵检测，并将车牌关联到被跟踪的车辆。',
             'default_camera': '默认相机',
             'camera_error': '相机错误',
             'detected_license_plates': '检测到的车牌',
@@ -21,8 +21,12 @@ from typing import Tuple, List, Dict, Any, Optional
 from detection.yolo_detector import YOLODetector
 from detection.license_plate_recognition import LicensePlateRecognizer
 from detection.lane_intrusion import LaneIntrusionDetector
-from utils.helpers import process_image
+from detection.tiling import TileMotionGate
+from utils.helpers import process_image, process_image_batch, iter_batches
+from utils.video import FrameSampler, SamplingStats, iter_frames, get_video_info, sampler_from_config
+from utils.parallel import iter_parallel_results, supports_sampler
 from i18n.translations import get_text, TRANSLATIONS
+import config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,8 +37,7 @@ logger = logging.getLogger(__name__)
 def load_models():
     yolo_detector = YOLODetector()
     license_plate_recognizer = LicensePlateRecognizer()
-    lane_intrusion_detector = LaneIntrusionDetector()
-    return yolo_detector, license_plate_recognizer, lane_intrusion_detector
+    return yolo_detector, license_plate_recognizer
 
 # Create temporary directory for uploads if it doesn't exist
 UPLOAD_DIR = "temp_uploads"
@@ -55,10 +58,28 @@ def get_binary_file_downloader_html(bin_file, file_label='File'):
     href = f'<a href="data:application/octet-stream;base64,{b64}" download="{os.path.basename(bin_file)}">{file_label}</a>'
     return href
 
+def iter_video_results(file_path: str, detection_type: str, sampler: FrameSampler, models, parallel: bool = False,
+                       stats: Optional[SamplingStats] = None):
+    """Yield (frame_number, result, output_image) for the sampled frames of a video"""
+    if parallel:
+        # Chunks are processed in worker processes; annotated frames come back in order
+        for result, output_image in iter_parallel_results(file_path, detection_type, sampler):
+            yield result['frame'], result, output_image
+    else:
+        motion_gate = TileMotionGate()
+        frames = iter_frames(file_path, sampler=sampler, stats=stats)
+        for batch in iter_batches(frames, config.DETECTION_BATCH_SIZE):
+            outputs = process_image_batch([frame for _, frame in batch], detection_type, *models,
+                                          motion_gate=motion_gate)
+            for (frame_number, _), (result, output_image) in zip(batch, outputs):
+                yield frame_number, result, output_image
+
 def main():
     
     # Load models
-    yolo_detector, license_plate_recognizer, lane_intrusion_detector = load_models()
+    # Lane intrusion trackers are stateful, so every video or image gets a fresh one
+    # instead of a cached instance shared by all sessions
+    yolo_detector, license_plate_recognizer = load_models()
     
     # Session state initialization
     if 'language' not in st.session_state:
@@ -119,14 +140,16 @@ def main():
             if is_video:
                 st.video(file_path)
                 
+                parallel = st.checkbox(get_text('parallel_processing', lang), key="lp_parallel")
+                
                 if st.button(get_text('process_video', lang), key="process_lp_video"):
                     # Process video frame by frame
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
-                    cap = cv2.VideoCapture(file_path)
-                    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                    fps = int(cap.get(cv2.CAP_PROP_FPS))
+                    video_info = get_video_info(file_path)
+                    total_frames = video_info['total_frames']
+                    fps = int(video_info['fps'])
                     
                     # Initialize result containers
                     all_results = []
@@ -144,38 +167,26 @@ def main():
                     
                     start_time = time.time()
                     
-                    # Process every 10th frame to reduce computational load
-                    frame_interval = 10
+                    # Process every 10th frame to reduce computational load (skipped frames are not decoded)
+                    frame_sampler = sampler_from_config(10)
+                    sampling_stats = SamplingStats()
+                    if parallel and not supports_sampler(frame_sampler):
+                        st.warning(get_text('parallel_unsupported_sampling', lang))
+                        parallel = False
                     
-                    while cap.isOpened():
-                        ret, frame = cap.read()
-                        if not ret:
-                            break
-                        
-                        processed_frames += 1
-                        
+                    for processed_frames, result, output_image in iter_video_results(
+                        file_path, 
+                        'license_plate', 
+                        frame_sampler, 
+                        (yolo_detector, license_plate_recognizer, LaneIntrusionDetector()), 
+                        parallel,
+                        sampling_stats
+                    ):
                         # Update progress
-                        progress = processed_frames / total_frames
+                        progress = min(processed_frames / total_frames, 1.0) if total_frames else 0.0
                         progress_bar.progress(progress)
                         status_text.text(f"{get_text('processing_frame', lang)} {processed_frames}/{total_frames}")
                         
-                        # Only process every n-th frame
-                        if processed_frames % frame_interval != 0:
-                            continue
-                        
-                        # Save frame temporarily
-                        temp_frame_path = os.path.join(UPLOAD_DIR, f"temp_frame_{processed_frames}.jpg")
-                        cv2.imwrite(temp_frame_path, frame)
-                        
-                        # Process frame
-                        result, output_image = process_image(
-                            temp_frame_path, 
-                            'license_plate', 
-                            yolo_detector, 
-                            license_plate_recognizer, 
-                            lane_intrusion_detector
-                        )
-                        
                         # Show the latest processed frame
                         result_placeholder.image(
                             output_image, 
@@ -201,11 +212,6 @@ def main():
                         - {get_text('processed_frames', lang)}: {processed_frames}/{total_frames}
                         - {get_text('detected_plates', lang)}: {detected_plates}
                         """)
-                        
-                        # Clean up temp frame file
-                        os.remove(temp_frame_path)
-                    
-                    cap.release()
                     
                     # Final stats and results
                     st.success(get_text('video_processing_complete', lang))
@@ -215,6 +221,10 @@ def main():
                     st.write(f"- {get_text('processed_frames', lang)}: {processed_frames}")
                     st.write(f"- {get_text('detected_plates', lang)}: {detected_plates}")
                     st.write(f"- {get_text('processing_time', lang)}: {time.time() - start_time:.2f}s")
+                    if not parallel:
+                        sampling = sampling_stats.to_dict()
+                        st.write(f"- {get_text('frames_decoded', lang)}: {sampling['frames_decoded']}/{sampling['frames_read']}")
+                        st.write(f"- {get_text('static_frames_skipped', lang)}: {sampling['frames_static']}")
                     
                     # Show detections in an expander
                     with st.expander(get_text('view_all_detections', lang)):
@@ -240,7 +250,7 @@ def main():
                             'license_plate', 
                             yolo_detector, 
                             license_plate_recognizer, 
-                            lane_intrusion_detector
+                            LaneIntrusionDetector()
                         )
                         
                         # Create columns for results
@@ -321,14 +331,16 @@ def main():
             if is_video:
                 st.video(file_path)
                 
+                parallel = st.checkbox(get_text('parallel_processing', lang), key="li_parallel")
+                
                 if st.button(get_text('process_video', lang), key="process_li_video"):
                     # Process video frame by frame
                     progress_bar = st.progress(0)
                     status_text = st.empty()
                     
-                    cap = cv2.VideoCapture(file_path)
-                    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                    fps = int(cap.get(cv2.CAP_PROP_FPS))
+                    video_info = get_video_info(file_path)
+                    total_frames = video_info['total_frames']
+                    fps = int(video_info['fps'])
                     
                     # Initialize result containers
                     all_results = []
@@ -346,38 +358,26 @@ def main():
                     
                     start_time = time.time()
                     
-                    # Process every 5th frame
-                    frame_interval = 5
+                    # Process every 5th frame (skipped frames are not decoded)
+                    frame_sampler = sampler_from_config(5)
+                    sampling_stats = SamplingStats()
+                    if parallel and not supports_sampler(frame_sampler):
+                        st.warning(get_text('parallel_unsupported_sampling', lang))
+                        parallel = False
                     
-                    while cap.isOpened():
-                        ret, frame = cap.read()
-                        if not ret:
-                            break
-                        
-                        processed_frames += 1
-                        
+                    for processed_frames, result, output_image in iter_video_results(
+                        file_path, 
+                        'lane_intrusion', 
+                        frame_sampler, 
+                        (yolo_detector, license_plate_recognizer, LaneIntrusionDetector()), 
+                        parallel,
+                        sampling_stats
+                    ):
                         # Update progress
-                        progress = processed_frames / total_frames
+                        progress = min(processed_frames / total_frames, 1.0) if total_frames else 0.0
                         progress_bar.progress(progress)
                         status_text.text(f"{get_text('processing_frame', lang)} {processed_frames}/{total_frames}")
                         
-                        # Only process every n-th frame
-                        if processed_frames % frame_interval != 0:
-                            continue
-                        
-                        # Save frame temporarily
-                        temp_frame_path = os.path.join(UPLOAD_DIR, f"temp_frame_{processed_frames}.jpg")
-                        cv2.imwrite(temp_frame_path, frame)
-                        
-                        # Process frame
-                        result, output_image = process_image(
-                            temp_frame_path, 
-                            'lane_intrusion', 
-                            yolo_detector, 
-                            license_plate_recognizer, 
-                            lane_intrusion_detector
-                        )
-                        
                         # Show the latest processed frame
                         result_placeholder.image(
                             output_image, 
@@ -401,11 +401,6 @@ def main():
                         - {get_text('processed_frames', lang)}: {processed_frames}/{total_frames}
                         - {get_text('intrusion_events', lang)}: {intrusion_events}
                         """)
-                        
-                        # Clean up temp frame file
-                        os.remove(temp_frame_path)
-                    
-                    cap.release()
                     
                     # Final stats and results
                     st.success(get_text('video_processing_complete', lang))
@@ -415,6 +410,10 @@ def main():
                     st.write(f"- {get_text('processed_frames', lang)}: {processed_frames}")
                     st.write(f"- {get_text('intrusion_events', lang)}: {intrusion_events}")
                     st.write(f"- {get_text('processing_time', lang)}: {time.time() - start_time:.2f}s")
+                    if not parallel:
+                        sampling = sampling_stats.to_dict()
+                        st.write(f"- {get_text('frames_decoded', lang)}: {sampling['frames_decoded']}/{sampling['frames_read']}")
+                        st.write(f"- {get_text('static_frames_skipped', lang)}: {sampling['frames_static']}")
                     
                     # Show intrusions in an expander
                     with st.expander(get_text('view_all_intrusions', lang)):
@@ -442,7 +441,7 @@ def main():
                             'lane_intrusion', 
                             yolo_detector, 
                             license_plate_recognizer, 
-                            lane_intrusion_detector
+                            LaneIntrusionDetector()
                         )
                         
                         # Create columns for results
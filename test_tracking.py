@@ -0,0 +1,28 @@
+from detection.tracking import KalmanTracker
+
+# Two cars side by side in adjacent lanes
+LEFT_CAR = [100, 100, 200, 180]
+RIGHT_CAR = [230, 100, 330, 180]
+
+def test_missed_track_is_not_taken_over_by_neighbour():
+    tracker = KalmanTracker()
+    left_id, right_id = tracker.update([LEFT_CAR, RIGHT_CAR])
+    assert tracker.update([LEFT_CAR, RIGHT_CAR]) == [left_id, right_id]
+
+    # The left car is missed for one frame
+    assert tracker.update([RIGHT_CAR]) == [right_id]
+    assert tracker.update([LEFT_CAR, RIGHT_CAR]) == [left_id, right_id]
+
+def test_lost_track_id_is_not_reused_for_another_car():
+    tracker = KalmanTracker()
+    first_id, = tracker.update([LEFT_CAR])
+    assert tracker.update([LEFT_CAR]) == [first_id]
+    assert tracker.update([]) == []
+
+    # A different car appears next to where the lost one was
+    assert tracker.update([RIGHT_CAR]) != [first_id]
+
+if __name__ == '__main__':
+    test_missed_track_is_not_taken_over_by_neighbour()
+    test_lost_track_id_is_not_reused_for_another_car()
+    print("Tracking tests passed")
@@ -2,115 +2,293 @@ import os
 import cv2
 import numpy as np
 import logging
-from typing import Tuple, Dict, Any, List
+from typing import Tuple, Dict, Any, List, Optional, Iterable, Iterator
+
+from detection.frame_context import FrameContext
 
 logger = logging.getLogger(__name__)
 
-def process_image(image_input, detection_type: str, yolo_detector, license_plate_recognizer, lane_intrusion_detector) -> Tuple[Dict[str, Any], np.ndarray]:
+def _lane_intrusion_stage(image, context, result, detectors):
+    """Track the detected vehicles and find lane intrusions"""
+    _, _, lane_intrusion_detector = detectors
+
+    # Assigns track IDs and lanes to the vehicle detections in place
+    _, intrusions = lane_intrusion_detector.process_frame(image, result['vehicles'], render=False, context=context)
+    result['intrusions'] = intrusions
+
+def _license_plate_stage(image, context, result, detectors):
+    """Find and read license plates on the detected vehicles"""
+    yolo_detector, license_plate_recognizer, _ = detectors
+    vehicle_detections = result['vehicles']
+
+    # Detect license plates, unless a batch call already found them for this frame
+    license_plate_detections = result.get('detections')
+    if license_plate_detections is None:
+        license_plate_detections = yolo_detector.detect_license_plates(image, vehicle_detections, context=context)
+
+    # Recognize license plates
+    detections_with_plates = []
+
+    # Link plates to vehicle track IDs when the lane stage ran first
+    vehicle_ids = {vehicle['bbox']: vehicle['id'] for vehicle in vehicle_detections if 'id' in vehicle}
+
+    for i, lp_detection in enumerate(license_plate_detections):
+        x1, y1, x2, y2 = lp_detection['bbox']
+
+        # Extract license plate image
+        plate_img = image[y1:y2, x1:x2]
+
+        # Recognize text on the plate
+        plate_text, confidence = license_plate_recognizer.recognize_plate(plate_img)
+
+        # Add recognized text to detection
+        lp_detection['license_plate'] = plate_text
+        lp_detection['confidence'] = confidence
+        if lp_detection.get('vehicle_bbox') in vehicle_ids:
+            lp_detection['vehicle_id'] = vehicle_ids[lp_detection['vehicle_bbox']]
+        detections_with_plates.append(lp_detection)
+
+    result['detections'] = detections_with_plates
+
+def _render_lane_intrusion(image, result, lane_intrusion_detector):
+    """Draw lanes, tracked vehicles and intrusion alerts"""
+    lane_intrusion_detector.render_frame(image, result.get('vehicles', []), result.get('intrusions', []))
+
+def _render_license_plates(image, result, lane_intrusion_detector):
+    """Draw read license plates, and the vehicles when no lane stage drew them as tracks"""
+    plate_detections = result.get('detections', [])
+    vehicle_detections = result.get('vehicles', []) if 'intrusions' not in result else ()
+
+    for lp_detection in plate_detections:
+        x1, y1, x2, y2 = lp_detection['bbox']
+        plate_text = lp_detection['license_plate']
+        confidence = lp_detection['confidence']
+
+        # Draw bounding box and text on the image
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+        # Add background for text
+        text_size = cv2.getTextSize(plate_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
+        cv2.rectangle(image, (x1, y1 - 25), (x1 + text_size[0] + 10, y1), (0, 255, 0), -1)
+
+        # Add text
+        cv2.putText(image, plate_text, (x1 + 5, y1 - 5),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
+
+        # Add confidence
+        conf_text = f"{confidence:.2f}"
+        cv2.putText(image, conf_text, (x2 - 40, y2 + 20),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+    # Draw vehicle bounding boxes
+    for vehicle in vehicle_detections:
+        x1, y1, x2, y2 = vehicle['bbox']
+        cv2.rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 2)
+
+# Analysis stages by name. Each takes (image, context, result, detectors) and
+# adds its keys to the shared result dictionary; it must not draw on the image.
+ANALYSIS_STAGES = {
+    'lane_intrusion': _lane_intrusion_stage,
+    'license_plate': _license_plate_stage
+}
+
+# Renderers of the stages. Each takes (image, result, lane_intrusion_detector) and
+# draws the stage's results onto the image in place, after all stages have run.
+STAGE_RENDERERS = {
+    'lane_intrusion': _render_lane_intrusion,
+    'license_plate': _render_license_plates
+}
+
+# Stages run for each detection type, in order, on one shared vehicle detection.
+# They are also rendered in this order, so plates are drawn over the lane overlay.
+DETECTION_STAGES = {
+    'license_plate': ('license_plate',),
+    'lane_intrusion': ('lane_intrusion',),
+    'combined': ('lane_intrusion', 'license_plate')
+}
+
+def detection_stages(detection_type: str) -> Tuple[str, ...]:
+    """Names of the analysis stages of a detection type (empty for unknown types)"""
+    return DETECTION_STAGES.get(detection_type, ())
+
+def _read_image(image_input) -> Optional[np.ndarray]:
+    """Return the image array for a file path or array input (None if it can't be read)"""
+    # Check if input is a string (file path) or numpy array (image)
+    if isinstance(image_input, str):
+        # Read the image from file path
+        image = cv2.imread(image_input)
+        if image is None:
+            logger.error(f"Failed to read image from {image_input}")
+        return image
+    elif isinstance(image_input, np.ndarray):
+        # Input is already an image array
+        return image_input
+
+    logger.error(f"Invalid image input type: {type(image_input)}")
+    return None
+
+def _run_stages(image, context, vehicle_detections, stages, detectors, render, plate_detections=None):
+    """Run the analysis stages of one frame on its vehicle detections (and plates found beforehand)"""
+    result = {"vehicles": vehicle_detections}
+    if plate_detections is not None:
+        result['detections'] = plate_detections
+    for name in stages:
+        ANALYSIS_STAGES[name](image, context, result, detectors)
+
+    # Draw only once every stage is done with the original pixels
+    output_image = _render_stages(image, result, stages, detectors[2]) if render else None
+    return result, output_image
+
+def _render_stages(image, result, stages, lane_intrusion_detector):
+    """Draw the results of the given stages onto the image in place"""
+    for name in stages:
+        STAGE_RENDERERS[name](image, result, lane_intrusion_detector)
+    return image
+
+def process_image(image_input, detection_type: str, yolo_detector, license_plate_recognizer, lane_intrusion_detector,
+                  render: bool = True, motion_gate=None) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
     """
-    Process an image for either license plate recognition or lane intrusion detection
+    Process an image for license plate recognition, lane intrusion detection or both
+
+    Vehicles are detected once per image and shared by all stages of the
+    detection type (see DETECTION_STAGES).
 
     Args:
         image_input: Path to the image file or numpy array containing the image
-        detection_type: Type of detection ('license_plate' or 'lane_intrusion')
+        detection_type: Type of detection ('license_plate', 'lane_intrusion' or 'combined')
         yolo_detector: YOLODetector instance
         license_plate_recognizer: LicensePlateRecognizer instance
         lane_intrusion_detector: LaneIntrusionDetector instance
+        render: Draw the detections onto the image in place (an array input is
+            modified and returned as output_image); with False, nothing is drawn
+            and output_image is None
+        motion_gate: TileMotionGate of the image's stream, used by tiled vehicle
+            detection to skip static tiles (None = run every tile)
 
     Returns:
-        result: Dictionary with detection results
-        output_image: Image with detection visualizations
+        result: Dictionary with detection results ('vehicles', plus 'detections'
+            and/or 'intrusions' depending on the stages)
+        output_image: Image with detection visualizations (None when render is False)
     """
     try:
-        # Check if input is a string (file path) or numpy array (image)
-        if isinstance(image_input, str):
-            # Read the image from file path
-            image = cv2.imread(image_input)
-            if image is None:
-                logger.error(f"Failed to read image from {image_input}")
-                return {"error": "Failed to read image"}, np.zeros((100, 100, 3), dtype=np.uint8)
-        elif isinstance(image_input, np.ndarray):
-            # Input is already an image array
-            image = image_input
-        else:
-            logger.error(f"Invalid image input type: {type(image_input)}")
-            return {"error": "Invalid image input type"}, np.zeros((100, 100, 3), dtype=np.uint8)
-
-        if detection_type == 'license_plate':
-            # Detect vehicles
-            vehicle_detections = yolo_detector.detect_vehicles(image)
-
-            # Detect license plates
-            license_plate_detections = yolo_detector.detect_license_plates(image, vehicle_detections)
-
-            # Recognize license plates
-            output_image = image.copy()
-            detections_with_plates = []
-
-            for i, lp_detection in enumerate(license_plate_detections):
-                x1, y1, x2, y2 = lp_detection['bbox']
-
-                # Extract license plate image
-                plate_img = image[y1:y2, x1:x2]
-
-                # Recognize text on the plate
-                plate_text, confidence = license_plate_recognizer.recognize_plate(plate_img)
-
-                # Add recognized text to detection
-                lp_detection['license_plate'] = plate_text
-                lp_detection['confidence'] = confidence
-                detections_with_plates.append(lp_detection)
-
-                # Draw bounding box and text on the image
-                cv2.rectangle(output_image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-                # Add background for text
-                text_size = cv2.getTextSize(plate_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)[0]
-                cv2.rectangle(output_image, (x1, y1 - 25), (x1 + text_size[0] + 10, y1), (0, 255, 0), -1)
-
-                # Add text
-                cv2.putText(output_image, plate_text, (x1 + 5, y1 - 5),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 0), 2)
-
-                # Add confidence
-                conf_text = f"{confidence:.2f}"
-                cv2.putText(output_image, conf_text, (x2 - 40, y2 + 20),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-            # Draw vehicle bounding boxes
-            for vehicle in vehicle_detections:
-                x1, y1, x2, y2 = vehicle['bbox']
-                cv2.rectangle(output_image, (x1, y1), (x2, y2), (255, 0, 0), 2)
-
-            result = {
-                "detections": detections_with_plates,
-                "vehicles": vehicle_detections
-            }
-
-            return result, output_image
-
-        elif detection_type == 'lane_intrusion':
-            # Detect vehicles
-            vehicle_detections = yolo_detector.detect_vehicles(image)
-
-            # Process for lane intrusion
-            output_image, intrusions = lane_intrusion_detector.process_frame(image, vehicle_detections)
-
-            result = {
-                "vehicles": vehicle_detections,
-                "intrusions": intrusions
-            }
-
-            return result, output_image
-
-        else:
+        image = _read_image(image_input)
+        if image is None:
+            error = "Failed to read image" if isinstance(image_input, str) else "Invalid image input type"
+            return {"error": error}, np.zeros((100, 100, 3), dtype=np.uint8)
+
+        stages = detection_stages(detection_type)
+        if not stages:
             logger.error(f"Unknown detection type: {detection_type}")
             return {"error": f"Unknown detection type: {detection_type}"}, image
 
+        # Grey, blurred and edge views of the frame, computed once and shared by all stages
+        context = FrameContext(image)
+
+        # Detect vehicles once for all stages
+        vehicle_detections = yolo_detector.detect_vehicles(image, context=context, motion_gate=motion_gate)
+
+        detectors = (yolo_detector, license_plate_recognizer, lane_intrusion_detector)
+        return _run_stages(image, context, vehicle_detections, stages, detectors, render)
+
     except Exception as e:
         logger.error(f"Error processing image: {e}")
         return {"error": str(e)}, np.zeros((100, 100, 3), dtype=np.uint8)
 
+def process_image_batch(images, detection_type: str, yolo_detector, license_plate_recognizer, lane_intrusion_detector,
+                        render: bool = True, motion_gate=None) -> List[Tuple[Dict[str, Any], Optional[np.ndarray]]]:
+    """
+    Process consecutive frames with one batched vehicle detection call
+
+    Vehicles of all frames are detected at once, and so are the license plates
+    when the detection type reads them; the analysis stages then run frame by
+    frame in order, so tracking sees the frames in sequence.
+
+    Args:
+        images: List of frames (numpy arrays) in time order, or a stacked (N, H, W, 3) array
+        detection_type: Type of detection ('license_plate', 'lane_intrusion' or 'combined')
+        yolo_detector: YOLODetector instance
+        license_plate_recognizer: LicensePlateRecognizer instance
+        lane_intrusion_detector: LaneIntrusionDetector instance
+        render: Draw the detections (see process_image)
+        motion_gate: TileMotionGate of the frames' stream (see process_image)
+
+    Returns:
+        List of (result, output_image) tuples, one per frame in input order
+    """
+    stages = detection_stages(detection_type)
+    if not stages:
+        logger.error(f"Unknown detection type: {detection_type}")
+        return [({"error": f"Unknown detection type: {detection_type}"}, image) for image in images]
+
+    try:
+        contexts = [FrameContext(image) for image in images]
+        vehicle_batch = yolo_detector.detect_vehicles_batch(images, contexts=contexts, motion_gate=motion_gate)
+        plate_batch = [None] * len(contexts)
+        if 'license_plate' in stages:
+            plate_batch = yolo_detector.detect_license_plates_batch(images, vehicle_batch, contexts=contexts)
+    except Exception as e:
+        logger.error(f"Error detecting vehicles in batch: {e}")
+        return [({"error": str(e)}, np.zeros((100, 100, 3), dtype=np.uint8)) for _ in images]
+
+    detectors = (yolo_detector, license_plate_recognizer, lane_intrusion_detector)
+    outputs = []
+    for image, context, vehicle_detections, plate_detections in zip(images, contexts, vehicle_batch, plate_batch):
+        try:
+            outputs.append(_run_stages(image, context, vehicle_detections, stages, detectors, render,
+                                       plate_detections))
+        except Exception as e:
+            logger.error(f"Error processing image: {e}")
+            outputs.append(({"error": str(e)}, np.zeros((100, 100, 3), dtype=np.uint8)))
+    return outputs
+
+def render_result(image: np.ndarray, result: Dict[str, Any], detection_type: str, lane_intrusion_detector) -> np.ndarray:
+    """
+    Draw an already computed result onto its frame in place, as process_image would
+
+    Used when the analysis ran without rendering, e.g. in worker processes whose
+    track IDs are only final after stitching.
+
+    Args:
+        image: Original frame (drawn on)
+        result: Result dictionary from process_image (with final track IDs)
+        detection_type: Type of detection ('license_plate', 'lane_intrusion' or 'combined')
+        lane_intrusion_detector: LaneIntrusionDetector holding the lanes and the
+            track history to draw (see LaneIntrusionDetector.record_tracks)
+
+    Returns:
+        The annotated image
+    """
+    return _render_stages(image, result, detection_stages(detection_type), lane_intrusion_detector)
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Group an iterable into lists of up to batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def build_overlay(result: Dict[str, Any], detection_type: str, lane_intrusion_detector) -> Dict[str, Any]:
+    """
+    Build the structured overlay for a processed frame, for clients that draw it themselves
+
+    Args:
+        result: Result dictionary from process_image
+        detection_type: Type of detection ('license_plate', 'lane_intrusion' or 'combined')
+        lane_intrusion_detector: LaneIntrusionDetector instance used for the frame
+
+    Returns:
+        Dictionary with the frame's lane polygons and vehicle tracks (empty for license plates);
+        boxes, plate text and track IDs are already part of the result itself
+    """
+    if 'lane_intrusion' in detection_stages(detection_type):
+        return lane_intrusion_detector.get_overlay(result.get('vehicles', []))
+
+    return {'lanes': [], 'tracks': {}}
+
 def save_detection_result(output_image: np.ndarray, original_filename: str, output_dir: str) -> str:
     """
     Save the detection result image
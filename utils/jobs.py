@@ -0,0 +1,266 @@
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Job states (also persisted to DetectionResult.status)
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+class JobCancelled(Exception):
+    """Raised inside a job function when the job has been cancelled"""
+    pass
+
+class Job:
+    def __init__(self, job_id: str, detection_id: Optional[int], video_path: str, detection_type: str,
+                 options: Optional[Dict[str, Any]] = None, result_window: int = 200):
+        """
+        In-memory state of a background video processing job
+
+        Only the most recent result_window frame results are kept, so memory
+        does not grow with the video length. Result offsets count all results
+        of the job; readers that fall further behind skip ahead to the oldest
+        kept result (the detections themselves are persisted as DetectionItems).
+
+        Args:
+            job_id: Unique job identifier
+            detection_id: ID of the DetectionResult row the job is persisted against
+            video_path: Path to the video file
+            detection_type: Type of detection ('license_plate', 'lane_intrusion' or 'combined')
+            options: Processing options passed through to the job function
+            result_window: Number of most recent frame results kept in memory
+        """
+        self.job_id = job_id
+        self.detection_id = detection_id
+        self.video_path = video_path
+        self.detection_type = detection_type
+        self.options = options or {}
+        self.status = JOB_QUEUED
+        self.progress = 0
+        self.processed_frames = 0
+        self.total_frames = 0
+        self.detections_count = 0
+        self.error = None
+        self.results = deque(maxlen=result_window)  # Most recent per-frame results, in frame order
+        self.results_total = 0  # Results added so far, including those no longer kept
+        self.sampling_stats = None  # SamplingStats of the frame sampler, if any
+        self.outputs = {}  # URLs of files produced by the job (e.g. the annotated video)
+        self._cancel_event = threading.Event()
+        self._changed = threading.Condition()
+        self._persisted_at = None  # time.monotonic() of the last persist
+        self._persisted_results = 0  # results_total at the last persist
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.job_id)
+
+    @property
+    def results_start(self) -> int:
+        """Offset of the oldest result still kept"""
+        return self.results_total - len(self.results)
+
+    def add_result(self, result: Dict[str, Any]):
+        with self._changed:
+            self.results.append(result)
+            self.results_total += 1
+            self._changed.notify_all()
+
+    def get_results(self, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Results from offset on, as far as they are still kept
+
+        Returns:
+            Offset of the first returned result (later than offset when older
+            results were dropped), and the results
+        """
+        with self._changed:
+            return self._results_from(offset)
+
+    def _results_from(self, offset: int) -> Tuple[int, List[Dict[str, Any]]]:
+        start = max(offset, self.results_start)
+        return start, list(islice(self.results, start - self.results_start, None))
+
+    def persist_due(self, interval: float, every: int) -> bool:
+        """Whether interval seconds or every results have passed since the job was last persisted"""
+        if self._persisted_at is None:
+            return True
+        return (time.monotonic() - self._persisted_at >= interval
+                or self.results_total - self._persisted_results >= every)
+
+    def mark_persisted(self):
+        self._persisted_at = time.monotonic()
+        self._persisted_results = self.results_total
+
+    def set_status(self, status: str):
+        """Change the job status and wake up anyone waiting for updates"""
+        with self._changed:
+            self.status = status
+            self._changed.notify_all()
+
+    def wait_for_update(self, offset: int, timeout: float = 1.0) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Wait until results beyond offset are available or the job finishes
+
+        Args:
+            offset: Number of results the caller has already seen
+            timeout: Maximum time to wait in seconds
+
+        Returns:
+            Offset of the first returned result and the results after offset
+            (possibly empty), see get_results
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self.results_total > offset or self.status in FINISHED_STATES,
+                                   timeout=timeout)
+            return self._results_from(offset)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.job_id,
+            'detection_id': self.detection_id,
+            'detection_type': self.detection_type,
+            'status': self.status,
+            'progress': self.progress,
+            'processed_frames': self.processed_frames,
+            'total_frames': self.total_frames,
+            'detections_count': self.detections_count,
+            'results_available': self.results_total > 0,
+            'results_total': self.results_total,
+            'results_start': self.results_start,
+            'sampling': self.sampling_stats.to_dict() if self.sampling_stats else None,
+            'outputs': self.outputs,
+            'error': self.error
+        }
+
+class JobManager:
+    def __init__(self, app, max_workers: int = 2, persist_fn: Optional[Callable[[Job], None]] = None,
+                 max_finished_jobs: int = 100, result_window: int = 200, persist_interval: float = 2.0,
+                 persist_every: int = 50):
+        """
+        Run video processing jobs on a worker pool
+
+        Args:
+            app: Flask application (job functions run inside its app context)
+            max_workers: Number of worker threads
+            persist_fn: Optional function that stores job state, called on every state change
+                and for progress updates at most every persist_interval seconds or
+                persist_every results
+            max_finished_jobs: Number of finished jobs kept in memory for result polling
+            result_window: Frame results each job keeps in memory (see Job)
+            persist_interval: Seconds between throttled progress persists
+            persist_every: Results between throttled progress persists
+        """
+        self.app = app
+        self.persist_fn = persist_fn
+        self.max_finished_jobs = max_finished_jobs
+        self.result_window = result_window
+        self.persist_interval = persist_interval
+        self.persist_every = persist_every
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='video-job')
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, job_fn: Callable[[Job], None], detection_id: Optional[int], video_path: str,
+               detection_type: str, options: Optional[Dict[str, Any]] = None) -> Job:
+        """
+        Queue a job and return immediately
+
+        Args:
+            job_fn: Function that processes the job; called with the Job inside an app context
+            detection_id: ID of the DetectionResult row the job belongs to
+            video_path: Path to the video file
+            detection_type: Type of detection
+            options: Processing options passed through to the job function
+
+        Returns:
+            The queued Job
+        """
+        job = Job(uuid.uuid4().hex, detection_id, video_path, detection_type, options, self.result_window)
+
+        with self._lock:
+            self._prune_finished()
+            self.jobs[job.job_id] = job
+
+        self.executor.submit(self._run, job_fn, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation of a job; returns False if the job is unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return False
+
+        job.cancel()
+        return True
+
+    def _prune_finished(self):
+        """Forget the oldest finished jobs once more than max_finished_jobs are kept"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def persist(self, job: Job, force: bool = True):
+        """
+        Store the job state through persist_fn, if configured
+
+        Args:
+            job: Job to store
+            force: Store now; with False (per-frame progress), only when the
+                persist interval or result count has been reached
+        """
+        if self.persist_fn is None:
+            return
+        if not force and not job.persist_due(self.persist_interval, self.persist_every):
+            return
+
+        try:
+            self.persist_fn(job)
+        except Exception as e:
+            logger.error(f"Error persisting job {job.job_id}: {e}")
+        job.mark_persisted()
+
+    def _run(self, job_fn: Callable[[Job], None], job: Job):
+        with self.app.app_context():
+            if job.cancelled:
+                job.set_status(JOB_CANCELLED)
+                self.persist(job)
+                return
+
+            job.set_status(JOB_RUNNING)
+            self.persist(job)
+            try:
+                job_fn(job)
+                job.progress = 100
+                job.set_status(JOB_COMPLETED)
+            except JobCancelled:
+                logger.info(f"Job {job.job_id} cancelled")
+                job.set_status(JOB_CANCELLED)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {e}")
+                job.error = str(e)
+                job.set_status(JOB_FAILED)
+
+            self.persist(job)
@@ -0,0 +1,227 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Dict, Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import config
+from detection.yolo_detector import YOLODetector
+from detection.license_plate_recognition import LicensePlateRecognizer
+from detection.lane_intrusion import LaneIntrusionDetector
+from detection.tiling import TileMotionGate
+from detection.tracking import iou_matrix, assign_matches
+from utils.helpers import process_image_batch, iter_batches, detection_stages, render_result
+from utils.video import FrameSampler, iter_frames, read_frame, get_video_info
+
+logger = logging.getLogger(__name__)
+
+# Detectors owned by the current worker process (set by _init_worker)
+_worker_detectors = None
+
+def _init_worker():
+    """Create one set of detectors per worker process"""
+    global _worker_detectors
+    _worker_detectors = (YOLODetector(), LicensePlateRecognizer())
+
+def split_frame_ranges(total_frames: int, num_chunks: int, frame_interval: int) -> List[Tuple[int, Optional[int]]]:
+    """
+    Split a video into frame ranges aligned to the sampling interval
+
+    Each range (start, end) covers frame numbers start+1 .. end. Boundaries are
+    multiples of frame_interval, so the last sampled frame of one chunk is
+    exactly the frame before the first sampled frame of the next.
+
+    Args:
+        total_frames: Number of frames in the video
+        num_chunks: Requested number of chunks
+        frame_interval: Sampling interval
+
+    Returns:
+        List of (start, end) tuples; the last end is None (read to the end)
+    """
+    sampled = max(1, total_frames // frame_interval)
+    num_chunks = max(1, min(num_chunks, sampled))
+
+    bounds = sorted({(sampled * i // num_chunks) * frame_interval for i in range(num_chunks)})
+    return [(start, end) for start, end in zip(bounds, bounds[1:] + [None])]
+
+def _process_chunk(video_path: str, detection_type: str, frame_interval: int, start: int,
+                   end: Optional[int], lane_regions, return_frames: bool) -> Dict[str, Any]:
+    """
+    Process one frame range in a worker process
+
+    Chunks after the first re-process the last sampled frame of the previous
+    chunk as a warm-up frame, so their tracker starts with the vehicles that
+    were visible at the boundary. Nothing is drawn here: track IDs are only
+    final after stitching, so the original frames go back for rendering.
+    """
+    yolo_detector, license_plate_recognizer = _worker_detectors
+
+    # Fresh tracker per chunk, sharing the lanes defined for the whole video
+    lane_intrusion_detector = LaneIntrusionDetector()
+    lane_intrusion_detector.lane_regions = lane_regions
+    motion_gate = TileMotionGate()
+
+    warmup_vehicles = None
+    results = []
+    frames = []
+
+    read_from = start - frame_interval if start > 0 else 0
+    sampled = iter_frames(video_path, frame_interval, start_frame=read_from, end_frame=end)
+    for batch in iter_batches(sampled, config.DETECTION_BATCH_SIZE):
+        outputs = process_image_batch([frame for _, frame in batch], detection_type, yolo_detector,
+                                      license_plate_recognizer, lane_intrusion_detector, render=False,
+                                      motion_gate=motion_gate)
+
+        for (frame_count, frame), (result, _) in zip(batch, outputs):
+            if frame_count <= start:
+                warmup_vehicles = result.get('vehicles', [])
+                continue
+
+            result['frame'] = frame_count
+            results.append(result)
+
+            # Frames travel back JPEG-encoded to keep the IPC payload small
+            if return_frames:
+                _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+                frames.append(buffer.tobytes())
+
+    return {
+        'start': start,
+        'warmup_vehicles': warmup_vehicles,
+        'results': results,
+        'frames': frames
+    }
+
+class TrackStitcher:
+    def __init__(self):
+        """Map chunk-local track IDs to global IDs across chunk boundaries"""
+        self.next_id = 1
+        self.last_vehicles = []  # Vehicles (with global IDs) of the last merged frame
+
+    def stitch(self, chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Rewrite the track IDs of a chunk's results to global IDs
+
+        Chunks must be stitched in frame order.
+
+        Args:
+            chunk: Chunk output from _process_chunk
+
+        Returns:
+            The chunk's results with global vehicle IDs
+        """
+        id_map = {}
+
+        # The warm-up frame is the previous chunk's last frame: carry its IDs over
+        warmup = [vehicle for vehicle in chunk['warmup_vehicles'] or [] if 'id' in vehicle]
+        if warmup and self.last_vehicles:
+            ious = iou_matrix([vehicle['bbox'] for vehicle in warmup],
+                              [prev['bbox'] for prev in self.last_vehicles])
+            for warmup_idx, prev_idx in assign_matches(ious, 0.5):
+                id_map[warmup[warmup_idx]['id']] = self.last_vehicles[prev_idx]['id']
+
+        def global_id(local_id):
+            if local_id not in id_map:
+                id_map[local_id] = self.next_id
+                self.next_id += 1
+            return id_map[local_id]
+
+        for result in chunk['results']:
+            for vehicle in result.get('vehicles', []):
+                if 'id' in vehicle:
+                    vehicle['id'] = global_id(vehicle['id'])
+            for intrusion in result.get('intrusions', []):
+                intrusion['vehicle_id'] = global_id(intrusion['vehicle_id'])
+            for plate in result.get('detections', []):
+                if 'vehicle_id' in plate:
+                    plate['vehicle_id'] = global_id(plate['vehicle_id'])
+
+        if chunk['results']:
+            self.last_vehicles = chunk['results'][-1].get('vehicles', [])
+
+        return chunk['results']
+
+def supports_sampler(sampler: FrameSampler) -> bool:
+    """
+    Whether chunked mode can reproduce a sampler's frame selection
+
+    Chunks are aligned to a fixed frame interval, so only the 'frames' policy
+    is supported; callers fall back to sequential processing for the others.
+    """
+    return sampler.policy == 'frames'
+
+def iter_parallel_results(video_path: str, detection_type: str, sampler: FrameSampler,
+                          num_workers: Optional[int] = None, chunks_per_worker: int = 2,
+                          return_frames: bool = True, source_id: Optional[str] = None) -> Iterator[Tuple[Dict[str, Any], Optional[np.ndarray]]]:
+    """
+    Process a video in frame-range chunks across worker processes
+
+    Results are yielded in frame order as soon as all earlier chunks are done.
+    Each worker process has its own detector instances; lane intrusion track
+    IDs are stitched across chunk boundaries so they are globally consistent,
+    and frames are annotated here after stitching so the drawn IDs match.
+
+    Args:
+        video_path: Path to the video file
+        detection_type: Type of detection ('license_plate', 'lane_intrusion' or 'combined')
+        sampler: FrameSampler with the 'frames' policy (see supports_sampler)
+        num_workers: Number of worker processes (defaults to the CPU count)
+        chunks_per_worker: Chunks per worker, for load balancing
+        return_frames: Send the frames back from the workers and annotate them
+        source_id: Camera or source identifier for the lane geometry cache
+
+    Yields:
+        (result, output_frame) tuples in frame order; output_frame is None
+        when return_frames is False
+    """
+    if not supports_sampler(sampler):
+        raise ValueError(f"Chunked processing only supports the 'frames' sampling policy, not '{sampler.policy}'")
+
+    frame_interval = sampler.frame_interval
+    num_workers = num_workers or os.cpu_count() or 1
+    total_frames = get_video_info(video_path)['total_frames']
+    ranges = split_frame_ranges(total_frames, num_workers * chunks_per_worker, frame_interval)
+
+    # Define lanes once for the whole video so every chunk uses the same geometry
+    lane_regions = []
+    if 'lane_intrusion' in detection_stages(detection_type):
+        first_frame = read_frame(video_path)
+        if first_frame is not None:
+            lane_definer = LaneIntrusionDetector(source_id=source_id)
+            lane_definer.load_or_define_lanes(first_frame)
+            lane_regions = lane_definer.lane_regions
+
+    stitcher = TrackStitcher()
+
+    # Follows the stitched tracks to draw them, with the same lanes as the chunks
+    renderer = LaneIntrusionDetector()
+    renderer.lane_regions = lane_regions
+    renderer.spill = None  # The chunks' detectors already spill these tracks
+    executor = ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker,
+                                   mp_context=multiprocessing.get_context('spawn'))
+    try:
+        futures = [
+            executor.submit(_process_chunk, video_path, detection_type, frame_interval,
+                            start, end, lane_regions, return_frames)
+            for start, end in ranges
+        ]
+
+        for future in futures:
+            chunk = future.result()
+            frames = chunk['frames'] or [None] * len(chunk['results'])
+            for result, buffer in zip(stitcher.stitch(chunk), frames):
+                if lane_regions:
+                    renderer.record_tracks([vehicle for vehicle in result.get('vehicles', []) if 'id' in vehicle])
+
+                output_frame = None
+                if buffer is not None:
+                    frame = cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+                    output_frame = render_result(frame, result, detection_type, renderer)
+                yield result, output_frame
+    finally:
+        # Also reached when the consumer stops early (e.g. a cancelled job)
+        executor.shutdown(wait=False, cancel_futures=True)
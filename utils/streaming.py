@@ -0,0 +1,59 @@
+import json
+import logging
+from typing import Dict, Any, Iterable, Iterator
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Supported streaming formats and their MIME types
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+def json_default(obj):
+    """Convert numpy values in detection results to plain JSON types"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def encode_record(record: Dict[str, Any], fmt: str = 'ndjson') -> str:
+    """
+    Encode one stream record
+
+    Args:
+        record: Record dictionary; its 'type' key becomes the SSE event name
+        fmt: 'ndjson' (one JSON object per line) or 'sse' (Server-Sent Events)
+
+    Returns:
+        Encoded record, including the trailing delimiter
+    """
+    data = json.dumps(record, default=json_default, ensure_ascii=False)
+
+    if fmt == 'sse':
+        return f"event: {record.get('type', 'message')}\ndata: {data}\n\n"
+
+    return data + '\n'
+
+def encode_stream(records: Iterable[Dict[str, Any]], fmt: str = 'ndjson') -> Iterator[str]:
+    """
+    Encode a stream of records, turning a failure into a final error record
+
+    Args:
+        records: Iterable of record dictionaries
+        fmt: 'ndjson' or 'sse'
+
+    Yields:
+        Encoded records
+    """
+    try:
+        for record in records:
+            yield encode_record(record, fmt)
+    except Exception as e:
+        logger.error(f"Streaming error: {e}")
+        yield encode_record({'type': 'error', 'error': str(e)}, fmt)
@@ -0,0 +1,146 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, Optional
+
+from detection.lane_intrusion import LaneIntrusionDetector
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry costs used to estimate tracker memory (Python objects, not exact)
+HISTORY_ENTRY_BYTES = 200  # One timestamp + bbox tuple + lane index in detection_history
+LOG_ENTRY_BYTES = 400  # One intrusion dict in intrusion_log
+DETECTION_BYTES = 300  # One vehicle dict in prev_detections
+
+def estimate_tracker_bytes(detector: LaneIntrusionDetector) -> int:
+    """
+    Estimate the memory held by a tracker's state
+
+    Args:
+        detector: LaneIntrusionDetector instance
+
+    Returns:
+        Approximate size in bytes
+    """
+    history_entries = sum(len(history.positions) for history in detector.detection_history.values())
+    lane_bytes = (sum(lane.nbytes for lane in detector.lane_regions) + detector.lane_mask_nbytes
+                  + detector.lane_overlay_nbytes)
+
+    return (history_entries * HISTORY_ENTRY_BYTES
+            + len(detector.intrusion_log) * LOG_ENTRY_BYTES
+            + len(detector.prev_detections) * DETECTION_BYTES
+            + lane_bytes)
+
+class _PoolEntry:
+    __slots__ = ('tracker', 'lock', 'last_used', 'in_use', 'size')
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self.lock = threading.Lock()  # Serialises frames of the same session
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        self.size = 0  # Estimated bytes, measured whenever the tracker is handed back
+
+class TrackerPool:
+    def __init__(self, max_trackers: int = 256, idle_timeout: float = 300, max_bytes: Optional[int] = None,
+                 factory: Callable[[], Any] = LaneIntrusionDetector,
+                 size_fn: Callable[[Any], int] = estimate_tracker_bytes):
+        """
+        Keep one tracker per session or job, evicting idle and least recently used ones
+
+        Each key gets its own tracker, so unrelated users and videos never share
+        tracks or lane geometry. Frames of the same key are processed one at a
+        time; different keys run in parallel without a shared lock.
+
+        Args:
+            max_trackers: Maximum number of trackers kept
+            idle_timeout: Seconds after which an unused tracker is dropped
+            max_bytes: Approximate memory cap over all trackers (None = no cap)
+            factory: Creates a new tracker
+            size_fn: Estimates the memory held by a tracker
+        """
+        self.max_trackers = max_trackers
+        self.idle_timeout = idle_timeout
+        self.max_bytes = max_bytes
+        self.factory = factory
+        self.size_fn = size_fn
+        self._entries = OrderedDict()  # key -> _PoolEntry, least recently used first
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, key: str) -> Iterator[Any]:
+        """
+        Use the tracker of a key, creating it if needed
+
+        Args:
+            key: Session or job identifier
+
+        Yields:
+            The key's tracker, held exclusively until the block exits
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(self.factory())
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry.in_use += 1
+            self._evict()
+
+        try:
+            with entry.lock:
+                try:
+                    yield entry.tracker
+                finally:
+                    # Measure while still holding the tracker so nobody mutates it meanwhile
+                    entry.size = self.size_fn(entry.tracker)
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                self._evict()
+
+    def release(self, key: str):
+        """Drop the tracker of a finished session or job"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.in_use:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self):
+        """Drop idle trackers, then least recently used ones over the count or memory cap"""
+        now = time.monotonic()
+        idle = [key for key, entry in self._entries.items()
+                if not entry.in_use and now - entry.last_used > self.idle_timeout]
+        for key in idle:
+            del self._entries[key]
+
+        # Trackers in use are never evicted, so the caps are soft while many are busy
+        candidates = [key for key, entry in self._entries.items() if not entry.in_use]
+        while len(self._entries) > self.max_trackers and candidates:
+            del self._entries[candidates.pop(0)]
+
+        if self.max_bytes is None:
+            return
+
+        total = sum(entry.size for entry in self._entries.values())
+        while total > self.max_bytes and candidates:
+            key = candidates.pop(0)
+            if key in self._entries:
+                total -= self._entries.pop(key).size
+                logger.info(f"Evicted tracker {key} to stay under the memory cap")
+
+    def stats(self) -> Dict[str, Any]:
+        """Current pool size and estimated memory use"""
+        with self._lock:
+            return {
+                'trackers': len(self._entries),
+                'in_use': sum(1 for entry in self._entries.values() if entry.in_use),
+                'estimated_bytes': sum(entry.size for entry in self._entries.values())
+            }
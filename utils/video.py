@@ -0,0 +1,468 @@
+import os
+import json
+import cv2
+import logging
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+
+import config
+
+logger = logging.getLogger(__name__)
+
+class SamplingStats:
+    def __init__(self):
+        """Counters describing which frames a FrameSampler decoded and let through"""
+        self.frames_read = 0       # Frames grabbed from the capture (frames seeked over are not counted)
+        self.frames_decoded = 0    # Frames retrieved/decoded into numpy arrays
+        self.frames_processed = 0  # Frames handed on to the detectors
+        self.frames_static = 0     # Decoded frames dropped by the motion gate
+        self.motion_score_sum = 0.0
+        self.max_motion_score = 0.0
+        self.current_interval = None
+
+    def record_motion(self, score: float, moving: bool):
+        self.motion_score_sum += score
+        self.max_motion_score = max(self.max_motion_score, score)
+        if not moving:
+            self.frames_static += 1
+
+    def to_dict(self) -> dict:
+        checked = self.frames_processed + self.frames_static
+        return {
+            'frames_read': self.frames_read,
+            'frames_decoded': self.frames_decoded,
+            'frames_processed': self.frames_processed,
+            'frames_static': self.frames_static,
+            'mean_motion_score': round(self.motion_score_sum / checked, 4) if checked else 0.0,
+            'max_motion_score': round(self.max_motion_score, 4),
+            'current_interval': self.current_interval
+        }
+
+class MotionGate:
+    def __init__(self, threshold: float = 0.01, pixel_threshold: int = 25, size: Tuple[int, int] = (160, 90)):
+        """
+        Cheap frame-difference check deciding whether a frame changed enough to analyse
+
+        Args:
+            threshold: Fraction of changed pixels above which a frame counts as moving
+            pixel_threshold: Grey-level difference for a pixel to count as changed
+            size: Size (width, height) of the downscaled comparison image
+        """
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.size = size
+        self.reference = None
+
+    def score(self, frame: np.ndarray) -> float:
+        """Fraction of changed pixels against the previously checked frame (1.0 for the first frame)"""
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (3, 3), 0)
+
+        reference, self.reference = self.reference, small
+        if reference is None:
+            return 1.0
+
+        diff = cv2.absdiff(small, reference)
+        return float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+
+    def check(self, frame: np.ndarray) -> Tuple[bool, float]:
+        """
+        Check a frame for motion
+
+        Returns:
+            (moving, score) tuple
+        """
+        score = self.score(frame)
+        return score >= self.threshold, score
+
+class FrameSampler:
+    POLICIES = ('frames', 'time', 'keyframe', 'motion')
+
+    def __init__(self, policy: str = 'frames', frame_interval: int = 10, interval_ms: Optional[float] = None,
+                 keyframe_interval: Optional[int] = None, min_interval: int = 1, max_interval: int = 30,
+                 motion_threshold: float = 0.01):
+        """
+        Pick which frames of a video get decoded and processed
+
+        Skipped frames are only grabbed (demuxed) and never retrieved, so they
+        skip the colour conversion and copy into a numpy array.
+
+        Args:
+            policy: 'frames' for every n-th frame, 'time' for every interval_ms
+                milliseconds of video time, 'keyframe' for every n-th frame like
+                'frames' but seeking instead of grabbing when the next sample lies
+                past a keyframe, 'motion' for an adaptive interval gated by a MotionGate
+            frame_interval: Sampling interval in frames ('frames' and 'keyframe'),
+                starting interval for 'motion'
+            interval_ms: Sampling interval in milliseconds ('time')
+            keyframe_interval: Keyframe spacing (GOP size) in frames for the 'keyframe'
+                policy; by default it is read from the video's keyframe flags, or
+                assumed to be one second of video where the backend does not report them
+            min_interval: Smallest interval the 'motion' policy speeds up to under motion
+            max_interval: Largest interval the 'motion' policy backs off to on static scenes
+            motion_threshold: Fraction of changed pixels that counts as motion
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown sampling policy: {policy}")
+        if policy == 'time' and not interval_ms:
+            raise ValueError("The 'time' sampling policy requires interval_ms")
+
+        self.policy = policy
+        self.frame_interval = max(1, int(frame_interval))
+        self.interval_ms = interval_ms
+        self.keyframe_interval = keyframe_interval
+        self.min_interval = max(1, int(min_interval))
+        self.max_interval = max(self.min_interval, int(max_interval))
+        self.motion_threshold = motion_threshold
+
+    def output_fps(self, source_fps: float) -> float:
+        """
+        Frame rate of the sampled frames when played back in real time
+
+        For 'motion' this is the fastest rate the policy samples at; slower
+        stretches leave gaps (see AnnotatedVideoWriter.write).
+
+        Args:
+            source_fps: Frame rate of the source video
+
+        Returns:
+            Sampled frames per second of source video
+        """
+        if self.policy == 'time':
+            return min(source_fps, 1000.0 / self.interval_ms)
+        if self.policy == 'motion':
+            return source_fps / self.min_interval
+        return source_fps / self.frame_interval
+
+    def sample(self, cap, start_frame: int = 0, end_frame: Optional[int] = None,
+               stats: Optional[SamplingStats] = None) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yield sampled frames from an open capture
+
+        Args:
+            cap: Opened cv2.VideoCapture
+            start_frame: Number of frames to skip before sampling (seeks the capture)
+            end_frame: Last frame number to read (None reads to the end of the video)
+            stats: Optional SamplingStats to fill in while sampling
+
+        Yields:
+            (frame_number, frame) tuples with 1-based frame numbers
+        """
+        if stats is None:
+            stats = SamplingStats()
+
+        frame_count = 0
+        if start_frame > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            frame_count = start_frame
+
+        if self.policy == 'keyframe':
+            yield from self._sample_keyframes(cap, frame_count, end_frame, stats)
+            return
+
+        next_due_ms = None
+        last_sampled = frame_count
+        interval = self.frame_interval
+        gate = MotionGate(self.motion_threshold) if self.policy == 'motion' else None
+
+        while end_frame is None or frame_count < end_frame:
+            if not cap.grab():
+                break
+
+            frame_count += 1
+            stats.frames_read += 1
+
+            if self.policy == 'frames':
+                if frame_count % self.frame_interval != 0:
+                    continue
+            elif self.policy == 'time':
+                position_ms = cap.get(cv2.CAP_PROP_POS_MSEC)
+                if next_due_ms is not None and position_ms < next_due_ms:
+                    continue
+                next_due_ms = position_ms + self.interval_ms
+            else:
+                if frame_count - last_sampled < interval:
+                    continue
+                last_sampled = frame_count
+
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            stats.frames_decoded += 1
+
+            if gate is not None:
+                moving, score = gate.check(frame)
+                stats.record_motion(score, moving)
+
+                # Sample faster while things move, back off while the scene is static
+                if moving:
+                    interval = max(self.min_interval, interval // 2)
+                else:
+                    interval = min(self.max_interval, interval * 2)
+                stats.current_interval = interval
+
+                if not moving:
+                    continue
+
+            stats.frames_processed += 1
+            yield frame_count, frame
+
+    def _sample_keyframes(self, cap, frame_count: int, end_frame: Optional[int],
+                          stats: SamplingStats) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Sample every frame_interval-th frame, seeking over whole GOPs
+
+        A seek makes the decoder restart at the keyframe before the target, so it
+        only saves work when that keyframe lies past the current position; shorter
+        gaps are grabbed. The savings therefore depend on the codec's GOP size: with
+        frame_interval a multiple of the GOP, every sample is a keyframe and nothing
+        in between is decoded. Until the GOP is known, frames are grabbed and their
+        keyframe flags recorded.
+        """
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25
+        gop = self.keyframe_interval
+        key_flag = getattr(cv2, 'CAP_PROP_LRF_HAS_KEY_FRAME', None)
+        keyframes = []
+        probe_start = frame_count
+        probe_limit = max(1, int(round(fps * 10)))  # Longest GOP measured before giving up
+
+        def observe(index):
+            """Record whether the frame just grabbed was a keyframe, until the GOP is known"""
+            nonlocal gop
+            if gop:
+                return
+            if key_flag is not None and cap.get(key_flag):
+                keyframes.append(index)
+                if len(keyframes) == 2:
+                    gop = keyframes[1] - keyframes[0]
+                    logger.info(f"Keyframe sampling: GOP of {gop} frames")
+            elif index - probe_start >= probe_limit:
+                if keyframes:
+                    gop = probe_limit
+                    logger.info(f"Keyframe sampling: GOP longer than {probe_limit} frames")
+                else:
+                    gop = max(1, int(round(fps)))
+                    logger.warning(f"Keyframe sampling: backend does not report keyframes, assuming a GOP of {gop} frames")
+
+        # Next sample position (0-based) at or after the current one
+        target = -(-frame_count // self.frame_interval) * self.frame_interval
+
+        while end_frame is None or target < end_frame:
+            if gop and (target // gop) * gop > frame_count:
+                if cap.set(cv2.CAP_PROP_POS_FRAMES, target):
+                    frame_count = target
+            while frame_count < target:
+                # Gap within one GOP, unknown GOP, or a backend that can't seek
+                if not cap.grab():
+                    return
+                stats.frames_read += 1
+                observe(frame_count)
+                frame_count += 1
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+            stats.frames_read += 1
+            observe(frame_count)
+            stats.frames_decoded += 1
+            stats.frames_processed += 1
+
+            frame_count = target + 1
+            yield frame_count, frame
+            target += self.frame_interval
+
+def iter_frames(video_path: str, frame_interval: int = 1, start_frame: int = 0,
+                end_frame: Optional[int] = None, sampler: Optional[FrameSampler] = None,
+                stats: Optional[SamplingStats] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Stream decoded frames from a video file straight into the detectors
+
+    Frames are yielded as in-memory BGR arrays, so callers can hand them to
+    process_image without a temporary JPEG round-trip through the disk.
+
+    Args:
+        video_path: Path to the video file
+        frame_interval: Only yield every n-th frame (1-based frame numbering);
+            ignored when a sampler is given
+        start_frame: Number of frames to skip before reading (seeks the capture)
+        end_frame: Last frame number to read (None reads to the end of the video)
+        sampler: FrameSampler deciding which frames to decode
+        stats: Optional SamplingStats to fill in while sampling
+
+    Yields:
+        (frame_number, frame) tuples
+    """
+    if sampler is None:
+        sampler = FrameSampler('frames', frame_interval)
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        logger.error(f"Failed to open video {video_path}")
+        return
+
+    try:
+        yield from sampler.sample(cap, start_frame, end_frame, stats)
+    finally:
+        cap.release()
+
+def sampler_from_config(frame_interval: Optional[int] = None) -> FrameSampler:
+    """
+    Build a FrameSampler from the FRAME_SAMPLING_* settings in config.py
+
+    Args:
+        frame_interval: Override for FRAME_SAMPLING_INTERVAL
+
+    Returns:
+        FrameSampler instance
+    """
+    return FrameSampler(
+        policy=config.FRAME_SAMPLING_POLICY,
+        frame_interval=frame_interval or config.FRAME_SAMPLING_INTERVAL,
+        interval_ms=config.FRAME_SAMPLING_INTERVAL_MS,
+        keyframe_interval=config.FRAME_SAMPLING_KEYFRAME_INTERVAL,
+        min_interval=config.MOTION_MIN_INTERVAL,
+        max_interval=config.MOTION_MAX_INTERVAL,
+        motion_threshold=config.MOTION_THRESHOLD
+    )
+
+def read_frame(video_path: str, frame_number: int = 1) -> Optional[np.ndarray]:
+    """
+    Read a single frame from a video file
+
+    Args:
+        video_path: Path to the video file
+        frame_number: 1-based frame number
+
+    Returns:
+        The frame, or None if it could not be read
+    """
+    for _, frame in iter_frames(video_path, start_frame=frame_number - 1, end_frame=frame_number):
+        return frame
+    return None
+
+def get_video_info(video_path: str) -> dict:
+    """
+    Read basic stream properties of a video file
+
+    Args:
+        video_path: Path to the video file
+
+    Returns:
+        Dictionary with total_frames, fps, width and height
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return {
+            'total_frames': int(cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        }
+    finally:
+        cap.release()
+
+class AnnotatedVideoWriter:
+    # (extension, fourcc) pairs in order of preference; H.264 and VP8 play in browsers
+    CODECS = (('.mp4', 'avc1'), ('.webm', 'VP80'), ('.mp4', 'mp4v'))
+
+    def __init__(self, output_base: str, fps: float):
+        """
+        Encode annotated frames into one output video with a sidecar index
+
+        The index maps source frame numbers to timestamps in the output video,
+        so clients can seek to a detection instead of loading one image per frame.
+
+        Args:
+            output_base: Output path without extension
+            fps: Frame rate of the output video (e.g. FrameSampler.output_fps)
+        """
+        self.output_base = output_base
+        self.fps = fps
+        self.writer = None
+        self.video_path = None
+        self.codec = None
+        self.frame_size = None
+        self.index = []
+        self.frames_written = 0  # Including repeated frames that fill sampling gaps
+        self.start_time = None  # Source time of the first frame
+        self.last_image = None
+
+    def _open(self, frame_size: Tuple[int, int]):
+        for ext, fourcc in self.CODECS:
+            path = self.output_base + ext
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), self.fps, frame_size)
+            if writer.isOpened():
+                self.writer, self.video_path, self.codec = writer, path, fourcc
+                self.frame_size = frame_size
+                return
+            writer.release()
+
+        raise RuntimeError(f"No usable video codec for {self.output_base}")
+
+    def write(self, frame_number: int, image: np.ndarray, source_time: Optional[float] = None) -> float:
+        """
+        Append an annotated frame
+
+        With a source_time, the frame is placed at that time (relative to the
+        first frame) so the video plays at source speed under any sampling
+        policy: the previous frame is repeated over gaps longer than 1/fps.
+        Frames that come faster than fps are appended right after each other.
+
+        Args:
+            frame_number: Frame number in the source video
+            image: Annotated BGR frame
+            source_time: Position of the frame in the source video, in seconds
+
+        Returns:
+            Timestamp of the frame in the output video, in seconds
+        """
+        h, w = image.shape[:2]
+        if self.writer is None:
+            self._open((w, h))
+        elif (w, h) != self.frame_size:
+            image = cv2.resize(image, self.frame_size)
+
+        if source_time is not None:
+            if self.start_time is None:
+                self.start_time = source_time
+            slot = int(round((source_time - self.start_time) * self.fps))
+            while self.last_image is not None and self.frames_written < slot:
+                self.writer.write(self.last_image)
+                self.frames_written += 1
+
+        video_time = self.frames_written / self.fps
+        self.writer.write(image)
+        self.frames_written += 1
+        self.last_image = image
+        self.index.append({
+            'frame': frame_number,
+            'time': round(video_time, 3),
+            'source_time': round(source_time, 3) if source_time is not None else None
+        })
+        return round(video_time, 3)
+
+    def close(self) -> Optional[Dict[str, str]]:
+        """
+        Finish the video and write the sidecar index
+
+        Returns:
+            Dictionary with 'video_path' and 'index_path', or None if nothing was written
+        """
+        if self.writer is None:
+            return None
+
+        self.writer.release()
+        self.writer = None
+
+        index_path = self.output_base + '.index.json'
+        with open(index_path, 'w') as f:
+            json.dump({
+                'video': os.path.basename(self.video_path),
+                'codec': self.codec,
+                'fps': self.fps,
+                'frames': self.index
+            }, f)
+
+        return {'video_path': self.video_path, 'index_path': index_path}